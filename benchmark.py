@@ -0,0 +1,276 @@
+#! /usr/bin/env python
+
+"""
+Usage: ./benchmark.py [--end-years 2030,2050,2100] [--tiers 0,10,40] [--kinds 0,4,16] [--analysis 3,10,30]
+                      [--repeat 5] [--output benchmark.json]
+
+Time the phases of the models (configure, performance_by_year, the event model, the storage
+model, the shutdown catch-up campaigns, the analysis weights and the CPU model) on synthetic
+configurations. Starting from BaseModel.json and
+RealisticModel.json with end_year 2030, no extra tiers or MC kinds and analysis sets of three
+years, one dimension at a time is scaled to each of the values given:
+
+ --end-years  the last year modeled
+ --tiers      the number of tiers added to tier_sizes and storage_model, copied from AOD
+ --kinds      the number of MC kinds added to mc_evolution
+ --analysis   the number of years in each AnalysisSet list
+
+The minimum, median and mean time of each phase for each configuration are written as JSON.
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import copy
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+import configure
+import event_model
+import performance
+from campaigns import campaign_schedule, catch_up
+from configure import configure as configure_model, load_base, mc_event_model
+from cpu_model import _read, analysis_weights, run_cpu, seconds_per_year
+from data_model import run_storage, storage_arrays, storage_capacity, storage_result
+
+DEFAULT_END_YEAR = 2030
+DEFAULT_ANALYSIS_LENGTH = 3
+
+ANALYSIS_PARAMETERS = {'AnalysisCPUPerEvent': 2,
+                       'AnalysisCPUScaledByReco': 0.2,
+                       'AnalysisReadsPerYearData': {'2016': 80, '2050': 80},
+                       'AnalysisReadsPerYearMC': {'2016': 40, '2050': 40}}
+
+
+def extend_ramp(ramp, endYear):
+    """
+    :return: a copy of ramp, holding its last value until endYear so that it can be interpolated up to then
+    """
+
+    ramp = dict(ramp)
+    lastYear = max(ramp.keys(), key=int)
+    if int(lastYear) < endYear:
+        ramp[str(endYear)] = ramp[lastYear]
+    return ramp
+
+
+def synthetic_overlay(base, endYear=DEFAULT_END_YEAR, tiers=0, kinds=0, analysisLength=DEFAULT_ANALYSIS_LENGTH):
+    """
+    Make a configuration overlay which scales the size of the problem
+
+    :param base: the merged BaseModel.json and RealisticModel.json
+    :param endYear: the last year modeled
+    :param tiers: number of tiers to add, copies of AOD
+    :param kinds: number of MC kinds to add, each ramping up two years before its year
+    :param analysisLength: number of years in each of the AnalysisSet lists
+    :return: dictionary to be written as JSON and passed to configure
+    """
+
+    startYear = base['start_year']
+    overlay = {'end_year': endYear,
+               'mc_evolution': {},
+               'improvement_factors': {'software_by_kind': {}},
+               'tier_sizes': {},
+               'storage_model': {'versions': {}, 'disk_replicas': {}, 'tape_replicas': {}}}
+
+    # Interpolated values have to reach the last year
+    for kind, ramp in base['mc_evolution'].items():
+        overlay['mc_evolution'][kind] = extend_ramp(ramp, endYear)
+    for kind, ramp in base['improvement_factors']['software_by_kind'].items():
+        overlay['improvement_factors']['software_by_kind'][kind] = extend_ramp(ramp, endYear)
+
+    for i in range(tiers):
+        tier = 'SYNTH%03d' % i
+        overlay['tier_sizes'][tier] = dict(base['tier_sizes']['AOD'])
+        for replicas in ['versions', 'disk_replicas', 'tape_replicas']:
+            overlay['storage_model'][replicas][tier] = list(base['storage_model'][replicas]['AOD'])
+
+    lastRampYear = max([endYear] + [int(year) for ramp in base['mc_evolution'].values() for year in ramp])
+    for i in range(kinds):
+        kindYear = 2027 + 3 * i
+        overlay['mc_evolution'][str(kindYear)] = {str(startYear - 1): 0.0, str(kindYear - 2): 0.0,
+                                                  str(kindYear - 1): 0.5, str(kindYear): 1.0,
+                                                  str(max(lastRampYear, kindYear + 1)): 1.0}
+
+    overlay['AnalysisSet'] = {str(year): list(range(max(startYear, year - analysisLength + 1), year + 1))
+                              for year in range(startYear, endYear + 1)}
+    overlay.update(copy.deepcopy(ANALYSIS_PARAMETERS))
+    return overlay
+
+
+def clear_caches():
+    """
+    Forget the performance tables and event models kept between calls
+    """
+
+    performance._tables.clear()
+    event_model._eventModels.clear()
+
+
+def time_phase(function, repeat, setup=None):
+    """
+    :param function: the phase to time, called without arguments
+    :param repeat: number of times to run it
+    :param setup: called without arguments before each run, not timed
+    :return: dictionary of the min, median and mean time in seconds and the number of runs
+    """
+
+    times = []
+    for dummy in range(repeat):
+        if setup is not None:
+            setup()
+        start = timeit.default_timer()
+        function()
+        times.append(timeit.default_timer() - start)
+    return {'min': min(times), 'median': float(np.median(times)), 'mean': float(np.mean(times)), 'repeat': repeat}
+
+
+def performance_lookups(model):
+    """
+    Call performance_by_year for every year, tier, data type and MC kind of model
+    """
+
+    for year in range(model['start_year'], model['end_year'] + 1):
+        for tier in model['tier_sizes']:
+            performance.performance_by_year(model, year, tier, data_type='data')
+            for kind in model['mc_evolution']:
+                performance.performance_by_year(model, year, tier, data_type='mc', kind=kind)
+
+
+def benchmark_config(overlayFile, repeat):
+    """
+    :param overlayFile: JSON file with a synthetic overlay
+    :param repeat: number of times to run each phase
+    :return: dictionary of {phase: timing} (see time_phase)
+    """
+
+    phases = {}
+    phases['configure'] = time_phase(lambda: configure_model([overlayFile], verbose=False, cache=False), repeat)
+    configure_model([overlayFile], verbose=False)
+    phases['configure_cached'] = time_phase(lambda: configure_model([overlayFile], verbose=False), repeat)
+
+    model = configure_model([overlayFile], verbose=False)
+    YEARS = list(range(model['start_year'], model['end_year'] + 1))
+    TIERS = list(model['tier_sizes'].keys())
+
+    phases['performance_by_year'] = time_phase(lambda: performance_lookups(model), repeat, setup=clear_caches)
+    phases['performance_by_year_cached'] = time_phase(lambda: performance_lookups(model), repeat)
+    phases['mc_event_model'] = time_phase(lambda: [mc_event_model(model, year) for year in YEARS], repeat)
+    phases['event_model'] = time_phase(lambda: event_model.event_model(model), repeat, setup=clear_caches)
+
+    phases['storage_capacity'] = time_phase(lambda: storage_capacity(model, YEARS), repeat)
+    phases['storage_arrays'] = time_phase(lambda: storage_arrays(model, YEARS, TIERS), repeat)
+    arrays = storage_arrays(model, YEARS, TIERS)
+    capacity = storage_capacity(model, YEARS)
+    phases['storage_result'] = time_phase(lambda: storage_result(model, YEARS, TIERS, arrays, capacity), repeat)
+    phases['run_storage'] = time_phase(lambda: run_storage(model), repeat, setup=clear_caches)
+
+    # The catch-up campaigns and the analysis of the CPU model, on the data events of the event model
+    events = np.array([event_model.event_model(model).data_events(year) for year in YEARS])
+    perEvent = np.ones(len(YEARS))
+    phases['campaign_schedule'] = time_phase(lambda: campaign_schedule(model, YEARS), repeat)
+    schedule = campaign_schedule(model, YEARS)
+    phases['catch_up'] = time_phase(lambda: catch_up(schedule.rereco, events, events, events, perEvent,
+                                                     model['cpu_efficiency'], seconds_per_year), repeat)
+    phases['analysis_weights'] = time_phase(lambda: analysis_weights(model['AnalysisSet'], YEARS), repeat)
+    weights = analysis_weights(model['AnalysisSet'], YEARS)
+    phases['analysis_read'] = time_phase(lambda: _read(weights, events), repeat)
+    phases['run_cpu'] = time_phase(lambda: run_cpu(model), repeat, setup=clear_caches)
+
+    return phases
+
+
+def scaling_points(endYears, tiers, kinds, analysisLengths):
+    """
+    :return: list of dictionaries of synthetic_overlay arguments, varying one of them at a time
+    """
+
+    default = {'endYear': DEFAULT_END_YEAR, 'tiers': 0, 'kinds': 0, 'analysisLength': DEFAULT_ANALYSIS_LENGTH}
+    points = [default]
+    for name, values in [('endYear', endYears), ('tiers', tiers), ('kinds', kinds), ('analysisLength', analysisLengths)]:
+        for value in values:
+            point = dict(default)
+            point[name] = value
+            if point not in points:
+                points.append(point)
+    return points
+
+
+def git_commit():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=devnull).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(points, repeat=5):
+    """
+    :param points: list of synthetic_overlay arguments (see scaling_points)
+    :param repeat: number of times to run each phase
+    :return: dictionary with the environment and the timings of each point, ready to be written as JSON
+    """
+
+    base = load_base(verbose=False)
+    tempDir = tempfile.mkdtemp(prefix='benchmark')
+    cacheDir = configure.CACHE_DIR
+    configure.CACHE_DIR = os.path.join(tempDir, 'cache')
+    results = []
+    try:
+        for i, point in enumerate(points):
+            overlayFile = os.path.join(tempDir, 'synthetic%d.json' % i)
+            with open(overlayFile, 'w') as jsonFile:
+                json.dump(synthetic_overlay(base, **point), jsonFile)
+            results.append({'config': point, 'phases': benchmark_config(overlayFile, repeat)})
+    finally:
+        configure.CACHE_DIR = cacheDir
+        shutil.rmtree(tempDir)
+
+    return {'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'commit': git_commit(),
+            'results': results}
+
+
+def print_benchmarks(report):
+    phases = list(report['results'][0]['phases'].keys())
+    print('endYear tiers kinds analysis ' + ' '.join(sorted(phases)))
+    for result in report['results']:
+        config = result['config']
+        print(config['endYear'], config['tiers'], config['kinds'], config['analysisLength'],
+              ' '.join('{:.5f}'.format(result['phases'][phase]['min']) for phase in sorted(phases)))
+
+
+def int_list(values):
+    return [int(value) for value in values.split(',') if value]
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Time the phases of the models on synthetic configurations')
+    parser.add_argument('--end-years', type=int_list, default=[2050, 2100], help='comma separated end years')
+    parser.add_argument('--tiers', type=int_list, default=[10, 40], help='comma separated numbers of added tiers')
+    parser.add_argument('--kinds', type=int_list, default=[4, 16], help='comma separated numbers of added MC kinds')
+    parser.add_argument('--analysis', type=int_list, default=[10, 30],
+                        help='comma separated lengths of the AnalysisSet lists')
+    parser.add_argument('--repeat', type=int, default=5, help='number of times each phase is run')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file for the results')
+    options = parser.parse_args(args)
+
+    report = run_benchmarks(scaling_points(options.end_years, options.tiers, options.kinds, options.analysis),
+                            repeat=options.repeat)
+    with open(options.output, 'w') as jsonFile:
+        json.dump(report, jsonFile, sort_keys=True, indent=1)
+    print_benchmarks(report)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,141 @@
+#! /usr/bin/env python
+
+"""
+Schedule of the catch-up campaigns of the CPU model.
+
+In the first year of a shutdown the data of the previous years is reconstructed again and the
+MC of the current era is made again, CATCH_UP_YEARS times the events of the year before, in one
+campaign. From first_year_to_spread_rereco_over_two_years on, a campaign is half as large and
+is done in its first year and again in the next one, which it replaces if that is still in the
+shutdown. The MC of new_detector_years has to be made in NEW_DETECTOR_FRACTION of the year.
+
+campaign_schedule turns shutdown_years, new_detector_years, hl_start_year and
+first_year_to_spread_rereco_over_two_years into matrices, with one campaign for each year (only
+the years starting a shutdown have any work):
+
+ source[campaign, year]               events of each campaign from the events of each year
+ allocation[year, campaign]           years in which each campaign is done
+ requiredAllocation[year, campaign]   the same for the CPU required
+ replaced[year]                       years whose own work is replaced by a campaign
+
+catch_up then evaluates the events, CPU time and CPU required of every year with matrix
+products. All the matrices have the shape [year, year], so the schedules of many scenarios
+with the same years can be stacked (see stack_schedules) and evaluated together.
+"""
+
+from __future__ import division, print_function
+
+from collections import namedtuple
+
+import numpy as np
+
+from event_model import event_model
+
+CATCH_UP_YEARS = 3  # Years of events redone in the first year of a shutdown
+NEW_DETECTOR_FRACTION = 0.5  # Fraction of the year to make the MC of a new detector
+
+Schedule = namedtuple('Schedule', 'source, allocation, requiredAllocation, replaced')
+CampaignSchedule = namedtuple('CampaignSchedule', 'years, rereco, lhc_mc, hllhc_mc, lhc_mc_year, hllhc_mc_year')
+
+
+def _schedule(YEARS, starts, inShutdown, spreadYear, doubleRequired=False):
+    """
+    :param YEARS: list of years
+    :param starts: indices in YEARS of the first years of the shutdowns with a campaign
+    :param inShutdown: boolean array of the years in a shutdown
+    :param spreadYear: first year in which campaigns are spread over two years
+    :param doubleRequired: the CPU required of a spread campaign is counted twice in its first year and not in
+                           its second, as the LHC MC always has been
+    :return: Schedule
+    """
+
+    n = len(YEARS)
+    source = np.zeros((n, n))
+    allocation = np.zeros((n, n))
+    requiredAllocation = np.zeros((n, n))
+    replaced = np.zeros(n, dtype=bool)
+
+    for c in starts:
+        if c == 0:
+            raise KeyError('The shutdown starting in %d needs the events of %d' % (YEARS[0], YEARS[0] - 1))
+        factor = CATCH_UP_YEARS * (0.5 if YEARS[c] >= spreadYear else 1)
+
+        # The events of the year before, including what an earlier campaign was spread into
+        source[c] = factor * allocation[c - 1].dot(source)
+        source[c, c - 1] += factor
+
+        replaced[c] = True
+        allocation[c, c] = 1
+        requiredAllocation[c, c] = 1
+        if YEARS[c] >= spreadYear and c + 1 < n:
+            replaced[c + 1] = inShutdown[c + 1]
+            allocation[c + 1, c] = 1
+            if doubleRequired:
+                requiredAllocation[c, c] = 2
+            else:
+                requiredAllocation[c + 1, c] = 1
+
+    return Schedule(source=source, allocation=allocation, requiredAllocation=requiredAllocation, replaced=replaced)
+
+
+def campaign_schedule(model, YEARS):
+    """
+    :param model: The configuration dictionary
+    :param YEARS: list of years
+    :return: CampaignSchedule with a Schedule for the rereco, the LHC MC and the HL-LHC MC and the fraction of
+             each year in which the LHC and the HL-LHC MC are made
+    """
+
+    shutdown = event_model(model).in_shutdown_years(range(YEARS[0] - 1, YEARS[-1] + 2))
+    inShutdown = shutdown[1:-1]
+    starts = [y for y in range(len(YEARS)) if inShutdown[y] and not shutdown[y]]
+
+    # A shutdown starting the year before the HL-LHC remakes HL-LHC MC
+    hlStart = model['hl_start_year']
+    lhcStarts = [y for y in starts if YEARS[y] < hlStart - 1]
+    hllhcStarts = [y for y in starts if YEARS[y] >= hlStart - 1]
+    spreadYear = model['first_year_to_spread_rereco_over_two_years']
+
+    years = np.array(YEARS)
+    newDetector = np.array([year in model['new_detector_years'] for year in YEARS])
+    return CampaignSchedule(years=YEARS,
+                            rereco=_schedule(YEARS, starts, inShutdown, spreadYear),
+                            lhc_mc=_schedule(YEARS, lhcStarts, inShutdown, spreadYear, doubleRequired=True),
+                            hllhc_mc=_schedule(YEARS, hllhcStarts, inShutdown, spreadYear),
+                            lhc_mc_year=np.where(newDetector & (years < hlStart), NEW_DETECTOR_FRACTION, 1.0),
+                            hllhc_mc_year=np.where(newDetector & (years >= hlStart), NEW_DETECTOR_FRACTION, 1.0))
+
+
+def stack_schedules(schedules):
+    """
+    :param schedules: list of Schedule with the same years
+    :return: Schedule of arrays with a first axis for the schedules
+    """
+
+    return Schedule(*[np.array(arrays) for arrays in zip(*schedules)])
+
+
+def catch_up(schedule, events, time, required, perEvent, cpuEfficiency, secondsPerYear):
+    """
+    Replace and add the work of the campaigns
+
+    :param schedule: Schedule, or stacked Schedules
+    :param events: array [..., year] of the events of each year
+    :param time: array [..., year] of the CPU time of each year
+    :param required: array [..., year] of the CPU required of each year
+    :param perEvent: array [..., year] of the CPU time per event of a campaign starting in each year
+    :param cpuEfficiency: CPU efficiency of the campaigns
+    :param secondsPerYear: time to do a campaign
+    :return: arrays [..., year] of the events, CPU time and CPU required with the campaigns
+    """
+
+    campaignEvents = np.einsum('...ij,...j->...i', schedule.source, events)
+    campaignTime = campaignEvents * perEvent / cpuEfficiency
+    campaignRequired = campaignTime / secondsPerYear
+
+    events = np.where(schedule.replaced, 0.0, events) + np.einsum('...ij,...j->...i', schedule.allocation,
+                                                                 campaignEvents)
+    time = np.where(schedule.replaced, 0.0, time) + np.einsum('...ij,...j->...i', schedule.allocation, campaignTime)
+    required = np.where(schedule.replaced, 0.0, required) + np.einsum('...ij,...j->...i',
+                                                                     schedule.requiredAllocation, campaignRequired)
+    return events, time, required
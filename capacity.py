@@ -0,0 +1,145 @@
+#! /usr/bin/env python
+
+"""
+Capacity model shared by the CPU, disk and tape.
+
+Each resource starts from a known capacity in one year. That capacity is assumed to have been
+bought in equal chunks over the lifetime of the hardware. From then on, delta (a step function
+of the year, from capacity_model) is bought every year, improved by the improvement factor to
+the power of the years since the delta took effect, and what was bought lifetime years earlier
+is retired. The legacy CPU model in cpu_model.py instead retires a fixed fraction every year.
+
+Purchases are kept as an array [resource, year] and retirement is the same array lagged by
+each resource's lifetime, so that any number of resources from any number of scenarios are
+evaluated at once:
+
+ capacity_array([model1, model2], ['cpu', 'disk', 'tape'], YEARS)  # array [scenario, resource, year]
+"""
+
+from __future__ import division, print_function
+
+from collections import namedtuple
+
+import numpy as np
+
+from utils import as_ramp
+
+RESOURCES = ['cpu', 'disk', 'tape']
+IMPROVEMENT_FACTORS = {'cpu': 'hardware', 'disk': 'disk', 'tape': 'tape'}
+
+# start: capacity in startYear. lifetime: years before a purchase is retired, or None to retire
+# retirementRate of the capacity every year instead. deltas: ramp of the yearly purchases.
+# baseYear: year from which factor is applied, or None for the year of each delta.
+CapacitySpec = namedtuple('CapacitySpec', 'startYear, start, lifetime, deltas, factor, baseYear, retirementRate')
+
+
+def resource_spec(model, resource):
+    """
+    :param model: The configuration dictionary
+    :param resource: 'cpu', 'disk' or 'tape'
+    :return: CapacitySpec of the resource from capacity_model and improvement_factors
+    """
+
+    capacityModel = model['capacity_model']
+    return CapacitySpec(startYear=int(capacityModel[resource + '_year']),
+                        start=capacityModel[resource + '_start'],
+                        lifetime=int(capacityModel[resource + '_lifetime']),
+                        deltas=capacityModel[resource + '_delta'],
+                        factor=model['improvement_factors'][IMPROVEMENT_FACTORS[resource]],
+                        baseYear=None, retirementRate=0.0)
+
+
+def purchases(specs, years):
+    """
+    :param specs: list of CapacitySpec
+    :param years: array of consecutive years
+    :return: array [spec, year] of the capacity bought in each year, including the equal chunks
+             assumed to have been bought up to startYear
+    """
+
+    years = np.asarray(years)
+    added = np.zeros((len(specs), len(years)))
+    for s, spec in enumerate(specs):
+        deltas, deltaYears = as_ramp(spec.deltas).step_array(years)
+        baseYears = deltaYears if spec.baseYear is None else spec.baseYear
+        # Python's float power, which numpy's vectorised power does not always match to the last bit. Before the
+        # first delta there is no delta year to improve from (and nothing is bought)
+        exponents = np.where(np.isnan(deltas), 0, years - baseYears)
+        improvement = np.array([spec.factor ** int(exponent) for exponent in exponents])
+        bought = np.where(np.isnan(deltas), 0.0, deltas) * improvement
+        added[s] = np.where(years > spec.startYear, bought, 0.0)
+        if spec.lifetime is not None:
+            seeded = (years > spec.startYear - spec.lifetime) & (years <= spec.startYear)
+            added[s, seeded] = spec.start / spec.lifetime
+    return added
+
+
+def capacity_curves(specs, years):
+    """
+    :param specs: list of CapacitySpec
+    :param years: list of consecutive years
+    :return: array [spec, year] of the capacity available in each year, NaN before startYear
+    """
+
+    years = np.asarray(years)
+    first = min([years[0]] + [spec.startYear - (spec.lifetime or 0) for spec in specs])
+    history = np.arange(first, years[-1] + 1)
+    added = purchases(specs, history)
+
+    # Retirement is the purchases lagged by the lifetime
+    lags = np.array([spec.lifetime or 0 for spec in specs])
+    lagged = np.arange(len(history))[None, :] - lags[:, None]
+    retired = np.where(lagged >= 0, added[np.arange(len(specs))[:, None], np.maximum(lagged, 0)], 0.0)
+    retired[lags == 0] = 0.0
+
+    startIndex = np.array([spec.startYear - first for spec in specs])
+    after = np.arange(len(history))[None, :] > startIndex[:, None]
+    added = np.where(after, added, 0.0)
+    retired = np.where(after, retired, 0.0)
+    added[np.arange(len(specs)), startIndex] = [spec.start for spec in specs]
+
+    # Capacity is then the running sum of the purchases and retirements, adding and subtracting
+    # year by year as each is made
+    steps = np.empty((len(specs), 2 * len(history)))
+    steps[:, 0::2] = added
+    steps[:, 1::2] = -retired
+    capacity = np.cumsum(steps, axis=1)[:, 1::2]
+
+    # Unless a fraction is retired every year instead
+    for s, spec in enumerate(specs):
+        if spec.retirementRate:
+            for t in range(startIndex[s] + 1, len(history)):
+                capacity[s, t] = capacity[s, t - 1] * (1 - spec.retirementRate) + added[s, t]
+
+    capacity[np.arange(len(history))[None, :] < startIndex[:, None]] = np.nan
+    return capacity[:, years[0] - first:]
+
+
+def capacity_array(models, resources=RESOURCES, years=None):
+    """
+    :param models: list of configuration dictionaries, one per scenario
+    :param resources: list of resources ('cpu', 'disk' or 'tape')
+    :param years: list of consecutive years, default from the start_year to the end_year of the first model
+    :return: array [scenario, resource, year] of the capacity available in each year, NaN before the start
+    """
+
+    if years is None:
+        years = list(range(models[0]['start_year'], models[0]['end_year'] + 1))
+    specs = [resource_spec(model, resource) for model in models for resource in resources]
+    return capacity_curves(specs, years).reshape(len(models), len(resources), len(years))
+
+
+def capacity_by_year(spec, YEARS):
+    """
+    :param spec: CapacitySpec
+    :param YEARS: list of years
+    :return: dictionary of the capacity keyed by str(year), for startYear and the years in YEARS after it
+    """
+
+    years = list(range(min(YEARS[0], spec.startYear), YEARS[-1] + 1))
+    curve = capacity_curves([spec], years)[0]
+    capacity = {str(spec.startYear): spec.start}
+    for year in YEARS:
+        if year > spec.startYear:
+            capacity[str(year)] = float(curve[year - years[0]])
+    return capacity
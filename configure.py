@@ -9,12 +9,35 @@ Load the model parameters from two JSON files
  Return all of this as a nested dictionary
 """
 
+import copy
+import hashlib
 import json
+import os
+import sys
+import tempfile
 from collections import namedtuple
 
-from utils import time_dependent_value
+try:
+    import cPickle as pickle
+except ImportError:  # python 3
+    import pickle
+
+from utils import compile_ramps, interpolate_value, time_dependent_value
+
+try:
+    basestring
+except NameError:  # python 3
+    basestring = str
 
 SECONDS_PER_YEAR = 365.25 * 24 * 3600
+BASE_MODELS = ['BaseModel.json', 'RealisticModel.json']
+
+# Merged models are cached here, keyed by the contents of the files they were read from.
+# Set MODEL_CACHE_DIR to an empty string to turn the cache off.
+CACHE_DIR = os.environ.get('MODEL_CACHE_DIR', '.model_cache')
+CACHE_VERSION = 1
+
+RunModel = namedtuple('RunModel', 'events, in_shutdown')
 
 def updateDict(target,changes):
     for k,v in changes.items():
@@ -24,25 +47,161 @@ def updateDict(target,changes):
             target[k]=v
 
 
-def configure(modelName):
-    modelNames = ['BaseModel.json', 'RealisticModel.json']
+def model_names_from_args(args):
+    """
+    :param args: command line arguments, each a comma separated list of configuration files
+    :return: list of configuration files or None if there are none
+    """
+
+    modelNames = None
+    if args:
+        modelNames = []
+        for a in args:
+            modelNames = modelNames + a.split(',')
+    return modelNames
+
+
+def png_key_name(modelNames):
+    """
+    :param modelNames: list of configuration files or None
+    :return: suffix for PNG file names built from the configuration file names
+    """
+
+    keyName = ''
+    if modelNames is not None:
+        for m in modelNames:
+            keyName = keyName + '_' + m.split('/')[-1].split('.')[0]
+    return keyName
+
+
+def years_from_arg(arg, model):
+    """
+    :param arg: comma separated list of years and ranges of years, e.g. 2026-2028,2030
+    :param model: The configuration dictionary
+    :return: sorted list of the years, which must be between start_year and end_year
+    """
+
+    years = set()
+    for item in arg.split(','):
+        first, dash, last = item.partition('-')
+        years.update(range(int(first), int(last or first) + 1))
+    if not years or min(years) < model['start_year'] or max(years) > model['end_year']:
+        raise ValueError('The years must be between %d and %d' % (model['start_year'], model['end_year']))
+    return sorted(years)
+
+
+def tiers_from_arg(arg, model):
+    """
+    :param arg: comma separated list of tiers
+    :param model: The configuration dictionary
+    :return: list of the tiers, which must be tiers of the model or static tiers
+    """
+
+    known = list(model['tier_sizes'].keys()) + list(model['static_disk'].keys()) + list(model['static_tape'].keys())
+    tiers = arg.split(',')
+    unknown = [tier for tier in tiers if tier not in known]
+    if unknown:
+        raise ValueError('Unknown tiers %s, not among %s' % (', '.join(unknown), ', '.join(sorted(set(known)))))
+    return tiers
+
+
+def cache_key(modelNames):
+    """
+    :param modelNames: list of configuration files, in the order they are applied
+    :return: hash of the contents of the files (and of the python version, which pickle depends on)
+    """
+
+    key = hashlib.sha1(('%s %s' % (CACHE_VERSION, sys.version_info[0])).encode('ascii'))
+    for modelName in modelNames:
+        with open(modelName, 'rb') as modelFile:
+            key.update(hashlib.sha1(modelFile.read()).digest())
+    return key.hexdigest()
+
+
+def read_cache(key):
+    """
+    :return: the cached model for key, or None if there is none or it can't be read
+    """
+
+    try:
+        with open(os.path.join(CACHE_DIR, key + '.pkl'), 'rb') as cacheFile:
+            return pickle.load(cacheFile)
+    except Exception:  # Missing, truncated or from an older version of the code
+        return None
+
+
+def write_cache(key, model):
+    """
+    Save the model for key. The file is written under a temporary name and then renamed so that
+    processes running at the same time never read a partial file. Failures are ignored.
+    """
+
+    tempName = None
+    try:
+        if not os.path.isdir(CACHE_DIR):
+            os.makedirs(CACHE_DIR)
+        handle, tempName = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as cacheFile:
+            pickle.dump(model, cacheFile, pickle.HIGHEST_PROTOCOL)
+        os.rename(tempName, os.path.join(CACHE_DIR, key + '.pkl'))
+    except (IOError, OSError, pickle.PicklingError):
+        if tempName and os.path.exists(tempName):
+            os.remove(tempName)
+
+
+def configure(modelName, base=None, verbose=True, cache=True):
+    """
+    :param modelName: configuration file or list of them, applied in order on top of the base model
+    :param base: the already merged BaseModel.json and RealisticModel.json (see load_base), which is not modified
+    :param verbose: print the name of each file as it is read
+    :param cache: without a base, use the merged model cached in CACHE_DIR if the files have not changed
+    :return: the merged model dictionary, where the year dependent values are Ramps (see utils.py)
+    """
+
+    if base is None:
+        modelNames = list(BASE_MODELS)
+        model = {}
+    else:
+        modelNames = []
+        model = copy.deepcopy(base)
 
     if isinstance(modelName, basestring):
         modelNames.append(modelName)
     elif isinstance(modelName, list):
         modelNames.extend(modelName)
 
-    model = {}
+    key = None
+    if cache and base is None and CACHE_DIR:
+        key = cache_key(modelNames)
+        cached = read_cache(key)
+        if cached is not None:
+            if verbose:
+                for modelName in modelNames:
+                    print(modelName)
+            return cached
+
     for modelName in modelNames:
-        print(modelName)
+        if verbose:
+            print(modelName)
         with open(modelName, 'r') as modelFile:
             modelChanges = json.load(modelFile)
             updateDict(model,modelChanges)
 #            model.update(modelChanges)
 
+    model = compile_ramps(model)
+    if key is not None:
+        write_cache(key, model)
     return model
 
 
+def load_base(verbose=True):
+    """
+    :return: the merged BaseModel.json and RealisticModel.json, to be passed to configure as base
+    """
+
+    return configure(None, verbose=verbose)
+
+
 def in_shutdown(model, year):
     """
     :param model: The configuration dictionary
@@ -66,8 +225,6 @@ def run_model(model, year, data_type='data'):
     :return: data events, in_shutdown
     """
 
-    RunModel = namedtuple('RunModel', 'events, in_shutdown')
-
     inShutdown, lastRunningYear = in_shutdown(model, year)
     events = 0
     if not inShutdown:
@@ -91,43 +248,26 @@ def mc_event_model(model, year):
     """
 
     mcEvolution = model['mc_evolution']
+
+    # First figure out what to base the number of MC events
+    currEvents = run_model(model, year).events
+    inShutdown, lastYear = in_shutdown(model, year)
+    if inShutdown:
+        lastEvents = run_model(model, lastYear).events
+    else:
+        lastEvents = 0
+
     mcEvents = {}
     for mcType, ramp in mcEvolution.items():
         mcYear = int(mcType)
 
-        # First figure out what to base the number of MC events
-        currEvents = run_model(model, year).events
-        if in_shutdown(model, year)[0]:
-            lastYear = in_shutdown(model, year)[1]
-            lastEvents = run_model(model, lastYear).events
-        else:
-            lastEvents = 0
-
         if mcYear > year:
             futureEvents = run_model(model, mcYear).events
         else:
             futureEvents = 0
         dataEvents = max(currEvents, lastEvents, futureEvents)
 
-        # TODO: Replace this bit of code with interpolate_value from utils.py
-        pastYear = 0
-        futureYear = 3000
-        mc_fraction = None
-        for otherType in sorted(ramp):
-            otherYear = int(otherType)
-            if year == otherYear:  # We found the exact value
-                mc_fraction = ramp[otherType]
-                break
-            if year - otherYear < year - pastYear and year > otherYear:
-                pastYear = otherYear
-            if otherYear > year:
-                futureYear = otherYear
-                break
-
-        if mc_fraction is None:  # We didn't get an exact value, interpolate between two values
-            mc_fraction = (ramp[str(pastYear)] + (year - pastYear) *
-                           (ramp[str(futureYear)] - ramp[str(pastYear)]) / (futureYear - pastYear))
-
+        mc_fraction = interpolate_value(ramp, year)
         mcEvents[mcType] = mc_fraction * dataEvents
 
     return mcEvents
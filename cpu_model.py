@@ -0,0 +1,479 @@
+#! /usr/bin/env python
+
+"""
+The CPU model as an importable function.
+
+run_cpu(model) evaluates the CPU requirements and the capacity models for a configured model
+(see configure.py) and returns the results without printing or plotting anything, so many
+scenarios can be evaluated in one process. cpu.py is the command line wrapper.
+
+run_cpu(model, years=[2026, 2027, 2028]) only returns some years. As the catch-up campaigns and
+the analysis read the years before, the CPU is still evaluated from start_year, but only up to
+the last year asked for.
+"""
+
+from __future__ import division, print_function
+
+from collections import namedtuple
+
+import numpy as np
+
+from campaigns import campaign_schedule, catch_up
+from capacity import CapacitySpec, capacity_by_year, capacity_curves, resource_spec
+from event_model import event_model
+from performance import performance_by_year
+from utils import as_ramp
+
+# Basic parameters
+kilo = 1000
+mega = 1000 * kilo
+giga = 1000 * mega
+tera = 1000 * giga
+peta = 1000 * tera
+seconds_per_year = 86400 * 365
+seconds_per_month = 86400 * 30
+running_time = 7.8E06
+
+# The legacy CPU capacity model (cpu_capacity in CpuResult)
+LEGACY_CPU_START = 1.4 * mega  # in the year before the first year
+LEGACY_CPU_DELTAS = {'1900': 300 * kilo, '2020': 600 * kilo}
+LEGACY_IMPROVEMENT_YEAR = 2017
+LEGACY_RETIREMENT_RATE = 0.05
+
+# general pattern:
+# _required: HS06
+# _time: HS06s
+CpuResult = namedtuple('CpuResult', [
+    'years',
+    'reco_time', 'lhc_sim_time', 'hllhc_sim_time',
+    'data_events', 'lhc_mc_events', 'hllhc_mc_events',
+    'data_cpu_required', 'rereco_cpu_required', 'lhc_mc_cpu_required', 'hllhc_mc_cpu_required',
+    'analysis_cpu_required', 'total_cpu_required', 'hpc_cpu_required',
+    'data_cpu_time', 'rereco_cpu_time', 'lhc_mc_cpu_time', 'hllhc_mc_cpu_time',
+    'analysis_cpu_time', 'total_cpu_time', 'hpc_cpu_time',
+    'cpu_capacity', 'cpu_time_capacity', 'cpuCapacity', 'cpuTimeCapacity',
+    't1t2_fractions',
+])
+
+# The activities of run_cpu as arrays [..., year], see cpu_activities
+CpuActivities = namedtuple('CpuActivities', [
+    'data_events', 'lhc_mc_events', 'hllhc_mc_events',
+    'data_cpu_required', 'rereco_cpu_required', 'lhc_mc_cpu_required', 'hllhc_mc_cpu_required',
+    'analysis_cpu_required', 'total_cpu_required', 'hpc_cpu_required',
+    'data_cpu_time', 'rereco_cpu_time', 'lhc_mc_cpu_time', 'hllhc_mc_cpu_time',
+    'analysis_cpu_time', 'total_cpu_time', 'hpc_cpu_time',
+])
+
+T1T2Fractions = namedtuple('T1T2Fractions', 'prompt, rereco, gen, sim, digi_reco, analysis, us_cpu_time')
+
+
+def analysis_weights(analysisSet, YEARS):
+    """
+    :param analysisSet: dictionary of the list of years analysed in each year, keyed by str(year)
+    :param YEARS: list of years
+    :return: array [year, sourceYear] of the number of times the events of sourceYear are read in each year
+    """
+
+    sourceYears = [analysisSet[str(year)] for year in YEARS]
+    rows = np.repeat(np.arange(len(YEARS)), [len(years) for years in sourceYears])
+    columns = np.array([year for years in sourceYears for year in years], dtype=int) - YEARS[0]
+    if len(columns) and (columns.min() < 0 or columns.max() >= len(YEARS)):
+        raise KeyError('AnalysisSet reads years outside of %d-%d' % (YEARS[0], YEARS[-1]))
+
+    weights = np.zeros((len(YEARS), len(YEARS)))
+    np.add.at(weights, (rows, columns), 1.0)
+    return weights
+
+
+def _read(weights, events):
+    """
+    :return: array [..., year] of the events read in each year, for weights [year, sourceYear] from analysis_weights
+    """
+
+    if events.ndim == 1:
+        return weights.dot(events)
+    return events.dot(weights.T)
+
+
+def cpu_activities(model, YEARS, reco_time, lhc_sim_time, hllhc_sim_time, data_events, lhc_mc_events,
+                   hllhc_mc_events):
+    """
+    Evaluate the CPU required and the CPU time of each activity
+
+    :param model: The configuration dictionary
+    :param YEARS: list of years
+    :param reco_time: array [..., year] of the data reconstruction time per event
+    :param lhc_sim_time: array [..., year] of the LHC MC time per event (GENSIM, DIGI and RECO)
+    :param hllhc_sim_time: array [..., year] of the HL-LHC MC time per event
+    :param data_events: array [..., year] of the data events recorded
+    :param lhc_mc_events: array [..., year] of the LHC MC events
+    :param hllhc_mc_events: array [..., year] of the HL-LHC MC events
+    :return: CpuActivities of arrays [..., year]. Any leading axes of the inputs (e.g. the samples of
+             uncertainty.py) are kept
+    """
+
+    cpu_efficiency = model['cpu_efficiency']
+
+    # Note the quantity below is for prompt reco only.
+    data_cpu_time = data_events * reco_time / cpu_efficiency
+    lhc_mc_cpu_time = lhc_mc_events * lhc_sim_time / cpu_efficiency
+    hllhc_mc_cpu_time = hllhc_mc_events * hllhc_sim_time / cpu_efficiency
+
+    # The data need to be reconstructed about as quickly as we record them.  In
+    # addition, we need to factor in express, repacking, AlCa, CAF
+    # functionality and skimming.  Presumably these all scale like the data.
+    # Per the latest CRSG document, these total to 123 kHS06 compared to 240
+    # kHS016 for the prompt reconstruction, which we can round to 50%, so
+    # multiply by 50%.  (Ignoring the 10 kHS06 needed for VO boxes, which
+    # won't scale up and is also pretty small.)
+
+    data_cpu_required = 1.5 * data_cpu_time / running_time
+
+    # Also keep using the _time variables to sum up the total HS06 * s needed,
+    # which frees us from assumptions on time needed to complete the work.
+
+    data_cpu_time = 1.5 * data_cpu_time
+
+    # In-year reprocessing model: assume we will re-reco 25% of the data each
+    # year, but we want to complete it in one month.  We also re-reco 25% of
+    # the previous year's data (assumed to be the same number of events as this
+    # year) but we want to do that in three months.
+
+    rereco_cpu_required = (1.0 / cpu_efficiency) * np.maximum(0.25 * data_events * reco_time / seconds_per_month,
+                                                              data_events * reco_time / (3 * seconds_per_month))
+
+    # But the total time needed is the sum of both activities.
+
+    rereco_cpu_time = 1.25 * data_events * reco_time
+
+    # The corresponding MC, on the other hand, can be reconstructed over an
+    # entire year.  We can use this to calculate the HS06 needed to do those
+    # tasks.
+
+    # Unless it is a year with new detectors in, in which case we will have
+    # less time to make MC (say half as much).  Only applies to the current
+    # era, i.e. no need to compress HL-LHC MC when we are still in LHC era.
+
+    schedule = campaign_schedule(model, YEARS)
+    lhc_mc_cpu_required = lhc_mc_cpu_time / (seconds_per_year * schedule.lhc_mc_year)
+    hllhc_mc_cpu_required = hllhc_mc_cpu_time / (seconds_per_year * schedule.hllhc_mc_year)
+
+    # Analysis!  Following something like the 2018 resource request, we make this
+    # 75% of everything else (for a moment).
+
+    # new json driven model
+    # conconstant time to read - just driven by analysis sets
+
+    if 'AnalysisSet' in model:
+        # The events read in each year are matrix products with the years in its analysis set.
+        # HL-LHC MC is only read from the analysis set after 2025, before then only that of the year.
+        weights = analysis_weights(model['AnalysisSet'], YEARS)
+        hllhcWeights = np.where((np.array(YEARS) > 2025)[:, None], weights, np.identity(len(YEARS)))
+        dataReads = as_ramp(model['AnalysisReadsPerYearData']).step_array(YEARS)[0]
+        mcReads = as_ramp(model['AnalysisReadsPerYearMC']).step_array(YEARS)[0]
+
+        # 2.25 is 1 for prompt + 1.25 of rereco
+        analysisTime = model['AnalysisCPUPerEvent'] * (dataReads * 2.25 * _read(weights, data_events) +
+                                                       mcReads * _read(weights, lhc_mc_events) +
+                                                       mcReads * _read(hllhcWeights, hllhc_mc_events))
+        analysis_cpu_time = analysisTime / cpu_efficiency
+
+        # allow a component that scales with reconstruction
+        analysisScaledByReco = model['AnalysisCPUScaledByReco']
+        if analysisScaledByReco > 0:
+            analysis_cpu_time = analysis_cpu_time + analysisScaledByReco * (lhc_mc_cpu_time + hllhc_mc_cpu_time +
+                                                                            data_cpu_time + rereco_cpu_time)
+        # now sum up everything
+        analysis_cpu_required = analysis_cpu_time / seconds_per_year
+
+    else:
+        analysis_cpu_required = 0.75 * (lhc_mc_cpu_required + hllhc_mc_cpu_required +
+                                        data_cpu_required + rereco_cpu_required)
+
+        analysis_cpu_time = 0.75 * (data_cpu_time + rereco_cpu_time + lhc_mc_cpu_time + hllhc_mc_cpu_time)
+
+        # But do something a little funkier for the time up to HL-LHC.  We are
+        # accumulating data, so analysis should keep taking longer.  Assume 2018 is
+        # "right".  In 2019 we will analyze 2018 data in addition to 2016 and 2017,
+        # so make 2019 1/3 bigger.  Keep the same amount through the shutdown when
+        # we don't accumulate data.  Then after the shutdown we keep adding in data
+        # years that are the same size as the previous ones, and then keep that
+        # flat until we ramp up HL-LHC studies in 2025 and we revert back to the
+        # 75% model.  Implemented here as a complete kludge.  Note that by kludging
+        # this way we don't absorb the software improvement factors...but that's
+        # OK, the analysis is I/O bound anyway and doesn't benefit from such
+        # improvements.
+
+        kludged = {i: analysis_cpu_time[..., y] for y, i in enumerate(YEARS)}
+        for year, factor in [(2019, 4 / 3), (2020, 1), (2021, 1), (2022, 5 / 4), (2023, 6 / 5), (2024, 7 / 6)]:
+            if year in kludged and year - 1 in kludged:
+                kludged[year] = factor * kludged[year - 1]
+        analysis_cpu_time = np.stack([kludged[i] for i in YEARS], axis=-1)
+
+        # More kludging: assume analysis takes place all year to calculate the HS06
+        # required for the above analysis CPU time.  Eric will hate this, I do too,
+        # we should fix it up later.
+
+        years = np.array(YEARS)
+        analysis_cpu_required = np.where((years >= 2019) & (years < 2025), analysis_cpu_time / seconds_per_year,
+                                         analysis_cpu_required)
+
+    # Shutdown year model:
+
+    # If in the first year of a shutdown, need to reconstruct the previous
+    # three years of data, but you have all year to do it.  No need for all the
+    # ancillary stuff.  We need to do the MC also...assume similarly that we
+    # have three times as many events as we had the previous year.
+
+    # From first_year_to_spread_rereco_over_two_years on, half of that is done
+    # in each of the first two years.  The campaigns are laid out by
+    # campaign_schedule, see campaigns.py.
+
+    data_events, rereco_cpu_time, rereco_cpu_required = catch_up(
+        schedule.rereco, data_events, rereco_cpu_time, rereco_cpu_required, reco_time,
+        cpu_efficiency, seconds_per_year)
+    lhc_mc_events, lhc_mc_cpu_time, lhc_mc_cpu_required = catch_up(
+        schedule.lhc_mc, lhc_mc_events, lhc_mc_cpu_time, lhc_mc_cpu_required, lhc_sim_time,
+        cpu_efficiency, seconds_per_year)
+    hllhc_mc_events, hllhc_mc_cpu_time, hllhc_mc_cpu_required = catch_up(
+        schedule.hllhc_mc, hllhc_mc_events, hllhc_mc_cpu_time, hllhc_mc_cpu_required, hllhc_sim_time,
+        cpu_efficiency, seconds_per_year)
+
+    # Sum up everything
+
+    total_cpu_required = (data_cpu_required + rereco_cpu_required +
+                          lhc_mc_cpu_required +
+                          hllhc_mc_cpu_required +
+                          analysis_cpu_required)
+
+    total_cpu_time = (data_cpu_time + rereco_cpu_time +
+                      lhc_mc_cpu_time +
+                      hllhc_mc_cpu_time + analysis_cpu_time)
+
+    hpc_cpu_required = (rereco_cpu_required +
+                        lhc_mc_cpu_required +
+                        hllhc_mc_cpu_required)
+
+    hpc_cpu_time = (rereco_cpu_time +
+                    lhc_mc_cpu_time +
+                    hllhc_mc_cpu_time)
+
+    return CpuActivities(data_events=data_events, lhc_mc_events=lhc_mc_events, hllhc_mc_events=hllhc_mc_events,
+                         data_cpu_required=data_cpu_required, rereco_cpu_required=rereco_cpu_required,
+                         lhc_mc_cpu_required=lhc_mc_cpu_required, hllhc_mc_cpu_required=hllhc_mc_cpu_required,
+                         analysis_cpu_required=analysis_cpu_required, total_cpu_required=total_cpu_required,
+                         hpc_cpu_required=hpc_cpu_required,
+                         data_cpu_time=data_cpu_time, rereco_cpu_time=rereco_cpu_time,
+                         lhc_mc_cpu_time=lhc_mc_cpu_time, hllhc_mc_cpu_time=hllhc_mc_cpu_time,
+                         analysis_cpu_time=analysis_cpu_time, total_cpu_time=total_cpu_time,
+                         hpc_cpu_time=hpc_cpu_time)
+
+
+def _rate(time, seconds):
+    """
+    :return: time / seconds, 0 where there are no seconds
+    """
+
+    return np.divide(time, seconds, out=np.zeros(np.shape(time)), where=seconds > 0)
+
+
+def cpu_periods(model, cpuResult, weights):
+    """
+    Evaluate the CPU of each activity in the periods of every year (see timeline.py)
+
+    The CPU time of a year is that of run_cpu, done in the periods following weights. The CPU
+    required in a period is the rate at which its work is done in the time the activity has in it:
+    prompt reconstruction keeps up with the data in the running_time of the year, spread like the
+    data, and MC and analysis use all of the period (MC only the first part of a year with new
+    detectors). The rereco of the running years is done in the rereco periods, which take the place
+    of the one and three month windows of the yearly model, and the catch-up campaigns are done
+    at their yearly rate scaled by the campaign weights. The analysis of the model without an
+    AnalysisSet is 75% of the rest in each period, as it is in each year.
+
+    :param model: The configuration dictionary
+    :param cpuResult: CpuResult of run_cpu for every year of the model
+    :param weights: dictionary of arrays [year, period] of the fraction of each year's 'run' (data), 'rereco',
+                    'mc', 'analysis' and 'campaign' work in each period
+    :return: dictionaries of arrays [year, period] of the CPU time (HS06 * s) and the CPU required (HS06) of
+             each activity ('data', 'rereco', 'lhc_mc', 'hllhc_mc' and 'analysis')
+    """
+
+    YEARS = cpuResult.years
+    periods = weights['run'].shape[1]
+    periodSeconds = seconds_per_year / periods
+    cpu_efficiency = model['cpu_efficiency']
+    eventModel = event_model(model)
+    schedule = campaign_schedule(model, YEARS)
+
+    def by_year(values):
+        return np.array([values[i] for i in YEARS])
+
+    def mc_weights(yearFraction):
+        # MC made in the first yearFraction of the year, in the periods or the parts of them that are in it
+        share = np.clip(yearFraction[:, None] * periods - np.arange(periods)[None, :], 0.0, 1.0)
+        mcWeights = weights['mc'] * share
+        total = mcWeights.sum(axis=1, keepdims=True)
+        mcWeights = np.where(total > 0, mcWeights / np.where(total > 0, total, 1.0),
+                             share / share.sum(axis=1, keepdims=True))
+        return mcWeights, periodSeconds * share
+
+    reco_time = by_year(cpuResult.reco_time)
+    data_events = eventModel.period_data_events(YEARS, weights['run'])
+
+    cpu_time = {'data': 1.5 * data_events * reco_time[:, None] / cpu_efficiency}
+    cpu_required = {'data': _rate(cpu_time['data'], running_time * weights['run'])}
+    regular_required = {'data': cpu_required['data']}
+
+    yearEvents = np.where(eventModel.in_shutdown_years(YEARS), 0.0, [eventModel.data_events(i) for i in YEARS])
+    lhcEvents = np.array([eventModel.mc_events(i)['2017'] for i in YEARS])
+    hllhcEvents = np.array([eventModel.mc_events(i)['2026'] for i in YEARS])
+    activities = [
+        ('rereco', schedule.rereco, reco_time, yearEvents, 1.25 * yearEvents * reco_time, weights['rereco'],
+         cpu_efficiency * periodSeconds),
+        ('lhc_mc', schedule.lhc_mc, by_year(cpuResult.lhc_sim_time), lhcEvents, None) +
+        mc_weights(schedule.lhc_mc_year),
+        ('hllhc_mc', schedule.hllhc_mc, by_year(cpuResult.hllhc_sim_time), hllhcEvents, None) +
+        mc_weights(schedule.hllhc_mc_year),
+    ]
+    zeros = np.zeros(len(YEARS))
+    for name, campaigns, perEvent, events, time, activityWeights, seconds in activities:
+        if time is None:
+            time = events * perEvent / cpu_efficiency
+        regular = time[:, None] * activityWeights
+        regular_required[name] = _rate(regular, seconds)
+
+        dummy, campaignTime, campaignRequired = catch_up(campaigns, events, zeros, zeros, perEvent, cpu_efficiency,
+                                                         seconds_per_year)
+        replaced = campaigns.replaced[:, None]
+        cpu_time[name] = np.where(replaced, 0.0, regular) + campaignTime[:, None] * weights['campaign']
+        cpu_required[name] = (np.where(replaced, 0.0, regular_required[name]) +
+                              campaignRequired[:, None] * weights['campaign'] * periods)
+
+    cpu_time['analysis'] = by_year(cpuResult.analysis_cpu_time)[:, None] * weights['analysis']
+    cpu_required['analysis'] = cpu_time['analysis'] / periodSeconds
+    if 'AnalysisSet' not in model:
+        years = np.array(YEARS)[:, None]
+        cpu_required['analysis'] = np.where((years >= 2019) & (years < 2025), cpu_required['analysis'],
+                                            0.75 * sum(regular_required.values()))
+
+    return cpu_time, cpu_required
+
+
+def run_cpu(model, years=None):
+    """
+    Evaluate the CPU model
+
+    :param model: The configuration dictionary
+    :param years: sorted list of the years to return, default from start_year to end_year
+    :return: CpuResult with dictionaries keyed by year (cpuCapacity and cpuTimeCapacity are keyed by str(year))
+    """
+
+    # The very important list of years
+    YEARS = list(range(model['start_year'], (model['end_year'] if years is None else years[-1]) + 1))
+
+    # Get the performance year by year which includes the software improvement factor
+    reco_time = {year: performance_by_year(model, year, 'RECO', data_type='data')[0] for year in YEARS}
+
+    lhc_sim_time = {year: performance_by_year(model, year, 'GENSIM', data_type='mc', kind='2017')[0] +
+                          performance_by_year(model, year, 'DIGI', data_type='mc', kind='2017')[0] +
+                          performance_by_year(model, year, 'RECO', data_type='mc', kind='2017')[0] for year in YEARS}
+
+    hllhc_sim_time = {year: performance_by_year(model, year, 'GENSIM', data_type='mc', kind='2026')[0] +
+                            performance_by_year(model, year, 'DIGI', data_type='mc', kind='2026')[0] +
+                            performance_by_year(model, year, 'RECO', data_type='mc', kind='2026')[0] for year in YEARS}
+
+    # CPU time requirement calculations, in HS06 * s
+    # Take the running time and event rate from the model
+
+    eventModel = event_model(model)
+    data_events = {i: eventModel.data_events(i) for i in YEARS}
+    lhc_mc_events = {i: eventModel.mc_events(i)['2017'] for i in YEARS}
+    hllhc_mc_events = {i: eventModel.mc_events(i)['2026'] for i in YEARS}
+
+    def by_year(values):
+        return np.array([values[i] for i in YEARS])
+
+    activities = cpu_activities(model, YEARS, by_year(reco_time), by_year(lhc_sim_time), by_year(hllhc_sim_time),
+                                by_year(data_events), by_year(lhc_mc_events), by_year(hllhc_mc_events))
+    activities = {name: {i: float(values[y]) for y, i in enumerate(YEARS)}
+                  for name, values in zip(activities._fields, activities)}
+    data_cpu_time, rereco_cpu_time = activities['data_cpu_time'], activities['rereco_cpu_time']
+    lhc_mc_cpu_time, hllhc_mc_cpu_time = activities['lhc_mc_cpu_time'], activities['hllhc_mc_cpu_time']
+    analysis_cpu_time, total_cpu_time = activities['analysis_cpu_time'], activities['total_cpu_time']
+
+    # Then, CPU availability calculations.  This follows the "Available CPU
+    # power" spreadsheet.  Take a baseline value of 1.4 MHS06 in 2016, in
+    # future years subtract 5% of the previous for retirements, and add 300
+    # kHS06 which gets improved by the hardware improvement in each year, until
+    # 2020, during LS2, when we shift the computing model to start buying an
+    # improved 600 kHS06 per year.
+
+    legacy = CapacitySpec(startYear=YEARS[0] - 1, start=LEGACY_CPU_START, lifetime=None, deltas=LEGACY_CPU_DELTAS,
+                          factor=model['improvement_factors']['hardware'], baseYear=LEGACY_IMPROVEMENT_YEAR,
+                          retirementRate=LEGACY_RETIREMENT_RATE)
+    legacyCapacity = capacity_curves([legacy], YEARS)[0]
+    cpu_capacity = {i: float(legacyCapacity[y]) for y, i in enumerate(YEARS)}
+
+    # This variable assumes that you can have the cpu_capacity for an entire
+    # year and thus calculates the HS06 * s available (in principle).
+
+    cpu_time_capacity = {i: cpu_capacity[i] * seconds_per_year for i in YEARS}
+
+    # CPU capacity model ala data.py, retiring what was bought cpu_lifetime years before
+
+    cpuCapacity = capacity_by_year(resource_spec(model, 'cpu'), YEARS if years is None else years)
+    cpuTimeCapacity = {year: capacity * seconds_per_year for year, capacity in cpuCapacity.items()}
+
+    # Fraction of CPU required for T1/T2 activities. The per-event times are
+    # those of the last year of the model, as they always have been in cpu.py.
+
+    genFractionOfTotal = 0.03
+    us_fraction = model['us_fraction_T1T2']
+    lastYear = model['end_year']
+
+    lhcSim = performance_by_year(model, lastYear, 'GENSIM', data_type='mc', kind='2017')[0]
+    lhcDigi = performance_by_year(model, lastYear, 'DIGI', data_type='mc', kind='2017')[0]
+    lhcReco = performance_by_year(model, lastYear, 'RECO', data_type='mc', kind='2017')[0]
+    hllhcSim = performance_by_year(model, lastYear, 'GENSIM', data_type='mc', kind='2026')[0]
+    hllhcDigi = performance_by_year(model, lastYear, 'DIGI', data_type='mc', kind='2026')[0]
+    hllhcReco = performance_by_year(model, lastYear, 'RECO', data_type='mc', kind='2026')[0]
+
+    lhcDigiFraction = lhcDigi / (lhcSim + lhcDigi + lhcReco)
+    lhcRecoFraction = lhcReco / (lhcSim + lhcDigi + lhcReco)
+    lhcSimFraction = lhcSim / (lhcSim + lhcDigi + lhcReco)
+
+    hllhcDigiFraction = hllhcDigi / (hllhcSim + hllhcDigi + hllhcReco)
+    hllhcRecoFraction = hllhcReco / (hllhcSim + hllhcDigi + hllhcReco)
+    hllhcSimFraction = hllhcSim / (hllhcSim + hllhcDigi + hllhcReco)
+
+    t1t2_fractions = {}
+    for i in YEARS:
+        lhcFraction = lhc_mc_cpu_time[i] / (lhc_mc_cpu_time[i] + hllhc_mc_cpu_time[i])
+
+        totalT1T2 = (total_cpu_time[i] - data_cpu_time[i]) * (1.0 + genFractionOfTotal)
+
+        mcTime = lhc_mc_cpu_time[i] + hllhc_mc_cpu_time[i]
+        totSimFraction = (lhcSimFraction * lhcFraction + hllhcSimFraction * (1.0 - lhcFraction)) * mcTime / totalT1T2
+        totDigiFraction = (lhcDigiFraction * lhcFraction + hllhcDigiFraction * (1.0 - lhcFraction)) * mcTime / totalT1T2
+        totRecoFraction = (lhcRecoFraction * lhcFraction + hllhcRecoFraction * (1.0 - lhcFraction)) * mcTime / totalT1T2
+
+        t1t2_fractions[i] = T1T2Fractions(prompt=0.,
+                                          rereco=rereco_cpu_time[i] / totalT1T2,
+                                          gen=genFractionOfTotal,
+                                          sim=totSimFraction,
+                                          digi_reco=totDigiFraction + totRecoFraction,
+                                          analysis=analysis_cpu_time[i] / totalT1T2,
+                                          us_cpu_time=totalT1T2 * us_fraction)
+
+    result = CpuResult(years=YEARS,
+                       reco_time=reco_time, lhc_sim_time=lhc_sim_time, hllhc_sim_time=hllhc_sim_time,
+                       cpu_capacity=cpu_capacity, cpu_time_capacity=cpu_time_capacity,
+                       cpuCapacity=cpuCapacity, cpuTimeCapacity=cpuTimeCapacity,
+                       t1t2_fractions=t1t2_fractions, **activities)
+    if years is None:
+        return result
+
+    # Only the years asked for
+    byYear = [field for field in CpuResult._fields if field not in ['years', 'cpuCapacity', 'cpuTimeCapacity']]
+    return result._replace(years=list(years), **{field: {year: getattr(result, field)[year] for year in years}
+                                                 for field in byYear})
@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+
+"""
+Labeled result array of the disk and tape model.
+
+A ResultCube holds every volume of a storage evaluation in one dense array of bytes
+
+ values[year, producedYear, dataType, tier, medium]
+
+with a list of labels for each axis. The tables printed and plotted by data.py are sums and
+slices of it, e.g.
+
+ cube.take(medium='disk', tier='AOD')  # array [year, producedYear, dataType] of AOD on disk
+ cube.by_tier('tape', unit=PETA)       # array [year, tier] of tape in PB
+
+The cube holds only arrays and lists, so it can be pickled and sent between processes.
+"""
+
+from __future__ import division, print_function
+
+import numpy as np
+
+AXES = ['year', 'producedYear', 'dataType', 'tier', 'medium']
+
+# Data produced is kept on the diagonal year == producedYear. The samples and the tape by year
+# produced include the tape fill factor, the tape by tier does not
+MEDIA = ['produced', 'disk', 'tape', 'tape_unfilled']
+
+STATIC_TYPE = 'Other'  # Data type of the static disk and tape
+LEGACY_YEAR = 'Run1 & 2015'  # Year produced of the legacy data on disk
+
+
+def sum_in_order(values, axis):
+    """
+    :return: values summed over axis one entry at a time, so that the result does not depend on numpy's summation
+    """
+
+    total = np.zeros(values.shape[:axis] + values.shape[axis + 1:])
+    for i in range(values.shape[axis]):
+        total += np.take(values, i, axis=axis)
+    return total
+
+
+class ResultCube(object):
+    """
+    Volumes in bytes as an array [year, producedYear, dataType, tier, medium] with the labels of each axis
+    """
+
+    def __init__(self, years, producedYears, dataTypes, tiers, media=MEDIA, values=None):
+        self.labels = [list(years), list(producedYears), list(dataTypes), list(tiers), list(media)]
+        self.positions = [{label: i for i, label in enumerate(labels)} for labels in self.labels]
+        shape = tuple(len(labels) for labels in self.labels)
+        self.values = np.zeros(shape) if values is None else values
+        assert self.values.shape == shape
+
+    @property
+    def years(self):
+        return self.labels[0]
+
+    @property
+    def produced_years(self):
+        return self.labels[1]
+
+    @property
+    def data_types(self):
+        return self.labels[2]
+
+    @property
+    def tiers(self):
+        return self.labels[3]
+
+    def index(self, axis, label):
+        """
+        :param axis: name of the axis, one of AXES
+        :param label: label on that axis, or a list of labels
+        :return: position of the label on the axis, or a list of positions
+        """
+
+        positions = self.positions[AXES.index(axis)]
+        if isinstance(label, list):
+            return [positions[oneLabel] for oneLabel in label]
+        return positions[label]
+
+    def take(self, **labels):
+        """
+        Select by label on any of the axes, e.g. take(medium='disk', tier=['AOD', 'MINIAOD'])
+
+        :param labels: a label (which removes the axis) or a list of labels, by name of the axis
+        :return: array of the selected values, with the remaining axes in the order of AXES
+        """
+
+        unknown = set(labels) - set(AXES)
+        if unknown:
+            raise ValueError('Unknown axes %s, the axes are %s' % (', '.join(sorted(unknown)), ', '.join(AXES)))
+
+        values = self.values
+        for a in reversed(range(len(AXES))):  # Last axis first, so removing an axis does not move the others
+            if AXES[a] in labels:
+                values = values.take(self.index(AXES[a], labels[AXES[a]]), axis=a)
+        return values
+
+    def add(self, value, **labels):
+        """
+        Add value to the values selected by label, e.g. add(size, year=2020, tier='RAW', medium='tape')
+
+        :param labels: a label by name of the axis, all of an axis not given are selected
+        """
+
+        index = tuple(slice(None) if axis not in labels else self.index(axis, labels[axis]) for axis in AXES)
+        self.values[index] += value
+
+    def produced(self, unit=1.0):
+        """
+        :return: array [producedYear, tier] of the volume produced in each year, over years only
+        """
+
+        produced = self.values[np.arange(len(self.years)), self.index('producedYear', self.years), :, :,
+                               self.index('medium', 'produced')]
+        return (produced / unit).sum(axis=1)
+
+    def by_tier(self, medium, unit=1.0):
+        """
+        :return: array [year, tier] of the volume in medium
+        """
+
+        totals = sum_in_order(self.take(medium=medium), axis=1)  # [year, dataType, tier]
+        byTier = np.zeros((len(self.years), len(self.tiers)))
+        for k in range(len(self.data_types)):
+            byTier += totals[:, k] / unit
+        return byTier
+
+    def by_produced_year(self, medium, unit=1.0):
+        """
+        :return: array [year, producedYear] of the volume in medium
+        """
+
+        stored = self.take(medium=medium)
+        byYear = np.zeros(stored.shape[:2])
+        for k in range(len(self.data_types)):
+            for t in range(len(self.tiers)):
+                byYear += stored[:, :, k, t] / unit
+        return byYear
+
+    def total(self, medium, unit=1.0):
+        """
+        :return: list of the total volume in medium in each year, summed over the tiers in order
+        """
+
+        return [sum(row) for row in self.by_tier(medium, unit).tolist()]
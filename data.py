@@ -1,322 +1,234 @@
 #! /usr/bin/env python
 
 """
-Usage: ./cpu.py config1.json,config2.json,...,configN.json
+Usage: ./data.py [--no-plots] [--years 2026-2028] [--tiers NANOAOD,AOD] config1.json,config2.json,...,configN.json
 
 Determine the disk and tape models by running under various configuration changes. BaseModel.json and RealisticModel.json
 provide defaults and configN.json overrides values in those configs or earlier ones in the list
+
+With --no-plots only the tables are printed, and neither pandas nor matplotlib is imported. Otherwise the
+plots are drawn in parallel worker processes (see plotting.queued)
+
+With --profile the time spent in each phase and the number of calls to the lookup functions
+are written to data_profile.json (or the file given) and summarized at the end (see instrument.py)
+
+The disk and tape samples are written to disk_samples.json and tape_samples.json, or with
+--samples csv, csv.gz or npy to columnar files written as each year is computed (see samples.py)
+
+With --years (years and ranges of years) or --tiers only those years and tiers are evaluated,
+from the data produced in the years they can still keep (see data_model.run_storage), and only
+the tables are printed, without samples or plots
 """
 
 from __future__ import division, print_function
 
 import json
+import argparse
 import sys
-from collections import defaultdict
-
-from configure import configure, in_shutdown, mc_event_model, run_model
-from plotting import plotStorage, plotStorageWithCapacity
-from utils import time_dependent_value
-from performance import performance_by_year
-
-PETA = 1e15
-
-modelNames = None
-if len(sys.argv) > 1:
-    modelNames=[]
-    for a in sys.argv[1:]:
-        modelNames = modelNames+ a.split(',')
-model = configure(modelNames)
-
-YEARS = list(range(model['start_year'], model['end_year'] + 1))
-TIERS = list(model['tier_sizes'].keys())
-STATIC_TIERS = list(sorted(set(model['static_disk'].keys() + model['static_tape'].keys())))
-
-# Build the capacity model
-
-# Set the initial points
-diskCapacity = {str(model['capacity_model']['disk_year']): model['capacity_model']['disk_start']}
-tapeCapacity = {str(model['capacity_model']['tape_year']): model['capacity_model']['tape_start']}
-
-# A bit of a kludge. Assume what we have now was bought and will be retired in equal chunks over its lifetime
-diskAdded = {}
-tapeAdded = {}
-for year in range(model['capacity_model']['disk_year'] - model['capacity_model']['disk_lifetime'] + 1,
-                  model['capacity_model']['disk_year'] + 1):
-    retired = model['capacity_model']['disk_start'] / model['capacity_model']['disk_lifetime']
-    diskAdded[str(year)] = retired
-for year in range(model['capacity_model']['tape_year'] - model['capacity_model']['tape_lifetime'] + 1,
-                  model['capacity_model']['tape_year'] + 1):
-    retired = model['capacity_model']['tape_start'] / model['capacity_model']['tape_lifetime']
-    tapeAdded[str(year)] = retired
-
-diskFactor = model['improvement_factors']['disk']
-tapeFactor = model['improvement_factors']['tape']
-
-for year in YEARS:
-    if str(year) not in diskCapacity:
-        diskDelta = 0  # Find the delta which can be time dependant
-        tapeDelta = 0  # Find the delta which can be time dependant
-        diskDeltas = model['capacity_model']['disk_delta']
-        tapeDeltas = model['capacity_model']['tape_delta']
-        for deltaYear in sorted(diskDeltas.keys()):
-            if int(year) >= int(deltaYear):
-                lastDiskYear = int(deltaYear)
-                diskDelta = model['capacity_model']['disk_delta'][deltaYear]
-        for deltaYear in sorted(tapeDeltas.keys()):
-            if int(year) >= int(deltaYear):
-                lastTapeYear = int(deltaYear)
-                tapeDelta = model['capacity_model']['tape_delta'][deltaYear]
-
-        diskAdded[str(year)] = diskDelta * diskFactor**(int(year) - int(lastDiskYear))
-        tapeAdded[str(year)] = tapeDelta * tapeFactor**(int(year) - int(lastTapeYear))
-        # Retire disk/tape added N years ago or retire 0
-
-        diskRetired = diskAdded.get(str(int(year) - model['capacity_model']['disk_lifetime']), 0)
-        tapeRetired = tapeAdded.get(str(int(year) - model['capacity_model']['tape_lifetime']), 0)
-        diskCapacity[str(year)] = diskCapacity[str(int(year) - 1)] + diskAdded[str(year)] - diskRetired
-        tapeCapacity[str(year)] = tapeCapacity[str(int(year) - 1)] + tapeAdded[str(year)] - tapeRetired
-
-# Disk space used
-dataProduced = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))  # dataProduced[year][type][tier]
-dataOnDisk = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))  # dataOnDisk[year][type][tier]
-dataOnTape = defaultdict(lambda: defaultdict(lambda: defaultdict(float)))  # dataOnTape[year][type][tier]
-diskSamples = defaultdict(list)
-tapeSamples = defaultdict(list)
-
-diskCopies = {}
-tapeCopies = {}
-diskScaleFactorByYear={"Run1 & 2015" : {"2000": 1.0, "2050" : 1.0} }
-tapeScaleFactorByYear={"Run1 & 2015" : {"2000": 1.0, "2050" : 1.0} }
-for tier in TIERS:
-    diskCopies[tier] = [versions * replicas for versions, replicas in
-                        zip(model['storage_model']['versions'][tier], model['storage_model']['disk_replicas'][tier])]
-    tapeCopies[tier] = [versions * replicas for versions, replicas in
-                        zip(model['storage_model']['versions'][tier], model['storage_model']['tape_replicas'][tier])]
-    if not tapeCopies[tier]: tapeCopies[tier] = [0, 0, 0]
-    diskScaleFactorByYear[tier] = model['storage_model']['disk_scaling'].get(tier,None)
-    tapeScaleFactorByYear[tier] = model['storage_model']['tape_scaling'].get(tier,None)
-    if diskScaleFactorByYear[tier] is None: diskScaleFactorByYear[tier]={"2000": 1.0, "2050" : 1.0}
-    if tapeScaleFactorByYear[tier] is None: tapeScaleFactorByYear[tier]={"2000": 1.0, "2050" : 1.0}
-
-# Loop over years to determine how much is produced without versions or replicas
-for year in YEARS:
-    for tier in TIERS:
-        if tier not in model['mc_only_tiers']:
-            dummyCPU, tierSize = performance_by_year(model, year, tier, data_type='data')
-            dataProduced[year]['data'][tier] += tierSize * run_model(model, year, data_type='data').events
-        if tier not in model['data_only_tiers']:
-            mcEvents = mc_event_model(model, year)
-            for kind, events in mcEvents.items():
-                dummyCPU, tierSize = performance_by_year(model, year, tier, data_type='mc', kind=kind)
-                dataProduced[year]['mc'][tier] += tierSize * events 
-
-producedByTier = [[0 for _i in range(len(TIERS))] for _j in YEARS]
-for year, dataDict in dataProduced.items():
-    for dataType, tierDict in dataDict.items():
-        for tier, size in tierDict.items():
-            producedByTier[YEARS.index(year)][TIERS.index(tier)] += size / PETA
-
-# Initialize a matrix with tiers and years
-YearColumns = YEARS + ['Capacity', 'Year', 'Run1 & 2015']  # Add capacity, years as columns for data frame
-
-# Initialize a matrix with years and years
-diskByYear = [[0 for _i in YearColumns] for _j in YEARS]
-tapeByYear = [[0 for _i in YearColumns] for _j in YEARS]
-
-
-#Simple factors inspired by spreadsheet for how "efficiently" we use disk and tape
-#two components - 1 a simple "filling" factor - eg, DDM fills X% of the disk
-#                 2 buffer space at the Tier1s (tier-2s are handled below) 
-disk_fill_factor = (1.0 / model['disk_fill_factor']) * ( model['tier1_disk_fraction']*(1.0 + model['tier1_disk_buffer_fraction']) +  (1.0 - model['tier1_disk_fraction'] ) )
-tape_fill_factor = 1.0/ model['tape_fill_factor']
-
-# Loop over years to determine how much is saved
-copies_on_disk={}
-tiers_on_disk={}
-for year in YEARS:
-    # Add static (or nearly) data
-    for tier, spaces in model['static_disk'].items():
-        size, producedYear = time_dependent_value(year=year, values=spaces)
-#        print(tier,size,producedYear)
-        if producedYear < YEARS[0]: producedYear=YEARS[0]
-        dataOnDisk[year]['Other'][tier] += size
-        diskSamples[year].append([producedYear, 'Other', tier, size])
-        diskByYear[YEARS.index(year)][YEARS.index(producedYear)] += size / PETA
-    for tier, spaces in model['static_tape'].items():
-        size, producedYear = time_dependent_value(year=year, values=spaces)
-        if producedYear < YEARS[0]: producedYear=YEARS[0]
-        dataOnTape[year]['Other'][tier] += size
-        tapeSamples[year].append([producedYear, 'Other', tier, size])
-        tapeByYear[YEARS.index(year)][YEARS.index(producedYear)] += size / PETA
-
-    # Figure out data from this year and previous
-    for producedYear, dataDict in dataProduced.items():
-        for dataType, tierDict in dataDict.items():
-            for tier, size in tierDict.items():
-                # allow there to be some time dependence in the replicas
-                scaleDisk,ty = time_dependent_value(year=producedYear,values=diskScaleFactorByYear[tier])
-                scaleTape,ty = time_dependent_value(year=producedYear,values=tapeScaleFactorByYear[tier])
-                diskCopiesByDelta = diskCopies[tier]
-                tapeCopiesByDelta = tapeCopies[tier]
-                if int(producedYear) <= int(year):  # Can't save data for future years
-                    if int(producedYear) == int(year):
-                        if tier != "USER" and tier!="GENSIM" and tier!="RAW":
-                            tiers_on_disk[year]=tiers_on_disk.get(year,0)+1
-                            copies_on_disk[year]=copies_on_disk.get(year,0)+diskCopiesByDelta[0]*scaleDisk
-                    if year - producedYear >= len(diskCopiesByDelta):
-                        revOnDisk = diskCopiesByDelta[-1]  # Revisions = versions * copies
-                    elif in_shutdown(model, year):
-                        inShutdown, lastRunningYear = in_shutdown(model, year)
-                        revOnDisk = diskCopiesByDelta[lastRunningYear - producedYear]
-                    else:
-                        revOnDisk = diskCopiesByDelta[year - producedYear]
-                    if year - producedYear >= len(tapeCopiesByDelta):
-                        revOnTape = tapeCopiesByDelta[-1]  # Assume what we have for the last year is good for out years
-                    elif in_shutdown(model, year):
-                        inShutdown, lastRunningYear = in_shutdown(model, year)
-                        revOnTape = tapeCopiesByDelta[lastRunningYear - producedYear]
-                    else:
-                        revOnTape = tapeCopiesByDelta[year - producedYear]
-                    if size and revOnDisk:
-                        dataOnDisk[year][dataType][tier] += size * revOnDisk * disk_fill_factor *scaleDisk
-                        diskSamples[year].append([producedYear, dataType, tier, size * revOnDisk * disk_fill_factor * scaleDisk, revOnDisk])
-                        diskByYear[YEARS.index(year)][YEARS.index(producedYear)] += size * revOnDisk * disk_fill_factor * scaleDisk/ PETA
-                    if size and revOnTape:
-                        dataOnTape[year][dataType][tier] += size * revOnTape * scaleTape
-                        tapeSamples[year].append([producedYear, dataType, tier, size * revOnTape * tape_fill_factor * scaleTape, revOnTape])
-                        tapeByYear[YEARS.index(year)][YEARS.index(producedYear)] += size * revOnTape * tape_fill_factor * scaleTape/ PETA
-    # Add capacity numbers
-    diskByYear[YEARS.index(year)][YearColumns.index('Capacity')] = diskCapacity[str(year)] / PETA
-    diskByYear[YEARS.index(year)][YearColumns.index('Year')] = str(year)
-    tapeByYear[YEARS.index(year)][YearColumns.index('Capacity')] = tapeCapacity[str(year)] / PETA
-    tapeByYear[YEARS.index(year)][YearColumns.index('Year')] = str(year)
-
-# Initialize a matrix with tiers and years
-# Add capacity, years, and fake tiers as columns for the data frame
-TierColumns = TIERS + ['Capacity', 'Year'] + STATIC_TIERS
-
-diskByTier = [[0 for _i in range(len(TierColumns))] for _j in YEARS]
-tapeByTier = [[0 for _i in range(len(TierColumns))] for _j in YEARS]
-for year, dataDict in dataOnDisk.items():
-    for dataType, tierDict in dataDict.items():
-        for tier, size in tierDict.items():
-            diskByTier[YEARS.index(year)][TierColumns.index(tier)] += size / PETA
-    diskByTier[YEARS.index(year)][TierColumns.index('Capacity')] = diskCapacity[str(year)] / PETA
-    diskByTier[YEARS.index(year)][TierColumns.index('Year')] = str(year)
-for year, dataDict in dataOnTape.items():
-    for dataType, tierDict in dataDict.items():
-        for tier, size in tierDict.items():
-            tapeByTier[YEARS.index(year)][TierColumns.index(tier)] += size / PETA
-    tapeByTier[YEARS.index(year)][TierColumns.index('Capacity')] = tapeCapacity[str(year)] / PETA
-    tapeByTier[YEARS.index(year)][TierColumns.index('Year')] = str(year)
-
-
-if 'legacyInfoDict' in model:
-    for year,val in model['legacyInfoDict'].items():
-        diskByTier[YEARS.index(int(year))][TierColumns.index('Run1 & 2015')] = val
-        diskByYear[YEARS.index(int(year))][YearColumns.index('Run1 & 2015')] = val
-else:
-    if 2016 in YEARS:
-        diskByTier[YEARS.index(2016)][TierColumns.index('Run1 & 2015')] = 25
-    diskByTier[YEARS.index(2017)][TierColumns.index('Run1 & 2015')] = 25
-    diskByTier[YEARS.index(2018)][TierColumns.index('Run1 & 2015')] = 10
-    diskByTier[YEARS.index(2019)][TierColumns.index('Run1 & 2015')] = 5
-    diskByTier[YEARS.index(2020)][TierColumns.index('Run1 & 2015')] = 0
-    
-    if 2016 in YEARS:
-        diskByYear[YEARS.index(2016)][YearColumns.index('Run1 & 2015')] = 25
-    diskByYear[YEARS.index(2017)][YearColumns.index('Run1 & 2015')] = 25
-    diskByYear[YEARS.index(2018)][YearColumns.index('Run1 & 2015')] = 10
-    diskByYear[YEARS.index(2019)][YearColumns.index('Run1 & 2015')] = 5
-    diskByYear[YEARS.index(2020)][YearColumns.index('Run1 & 2015')] = 0
-
-keyName=''
-if modelNames is not None:
-    for m in modelNames:
-        keyName=keyName+'_'+m.split('/')[-1].split('.')[0]
-plotMaxs=model['plotMaximums']
-
-minYearVal=max(0,model['minYearToPlot']-YEARS[0])-0.5 #pandas...
-
-plotStorage(producedByTier, name='ProducedbyTier'+keyName+'.png', title='Data produced by tier', columns=TIERS, index=YEARS, maximum=plotMaxs['ProducedbyTier'],minYear=minYearVal)
-
-
-plotStorageWithCapacity(tapeByTier, name='TapebyTier'+keyName+'.png', title='Data on tape by tier', columns=TierColumns,
-                        bars=TIERS + STATIC_TIERS, maximum=plotMaxs['TapebyTier'],minYear=minYearVal)
-plotStorageWithCapacity(diskByTier, name='DiskbyTier'+keyName+'.png', title='Data on disk by tier', columns=TierColumns,
-                        bars=TIERS + STATIC_TIERS, maximum=plotMaxs['DiskbyTier'],minYear=minYearVal)
-plotStorageWithCapacity(tapeByYear, name='TapebyYear'+keyName+'.png', title='Data on tape by year produced', columns=YearColumns,
-                        bars=YEARS + ['Run1 & 2015'], maximum=plotMaxs['TapebyTier'],minYear=minYearVal)
-plotStorageWithCapacity(diskByYear, name='DiskbyYear'+keyName+'.png', title='Data on disk by year produced', columns=YearColumns,
-                        bars=YEARS + ['Run1 & 2015'], maximum=plotMaxs['DiskbyYear'],minYear=minYearVal)
-
-# Dump out tuples of all the data on tape and disk in a given year
-with open('disk_samples.json', 'w') as diskUsage, open('tape_samples.json', 'w') as tapeUsage:
-    json.dump(diskSamples, diskUsage, sort_keys=True, indent=1)
-    json.dump(tapeSamples, tapeUsage, sort_keys=True, indent=1)
-
-
-# disk printout
-print('\nDisk by tier printout in PB\n')
-header = "year"
-for column in TIERS + STATIC_TIERS:
-    header += ";"
-    header += str(column)
-header +=";total;40%"
-print(header)
-
-for year in YEARS:
-    line = str(year)
-    total = 0
-    for column in TIERS + STATIC_TIERS:
-        line += " " 
-        line += '{:8.2f}'.format(diskByTier[YEARS.index(year)][TierColumns.index(column)])
-        total += diskByTier[YEARS.index(year)][TierColumns.index(column)]
-    line += '{:8.2f}'.format(total)
-    line += '{:8.2f}'.format(total*0.4)
-    print(line)
-
-
-# tape printout
-print('\nTape by tier printout in PB\n')
-header = "year"
-for column in TIERS + STATIC_TIERS:
-    header += ";"
-    header += str(column)
-header +=";total;40%"
-print(header)
-
-for year in YEARS:
-    line = str(year)
-    total = 0
+
+import instrument
+from configure import configure, model_names_from_args, png_key_name, tiers_from_arg, years_from_arg
+from cube import LEGACY_YEAR
+from data_model import PETA, run_storage
+from plotting import plotStorage, plotStorageWithCapacity, queued
+from samples import SAMPLE_FORMATS, sample_writer
+
+
+def capacity_rows(YEARS, values, columns, capacity):
+    """
+    :param YEARS: list of years
+    :param values: array [year, column] in PB
+    :param columns: list of the labels of the columns of values
+    :param capacity: capacity in bytes keyed by str(year)
+    :return: the columns and the rows of values with the capacity and the year added, as the plots take them
+    """
+
+    rows = [row + [capacity[str(year)] / PETA, str(year)] for year, row in zip(YEARS, values.tolist())]
+    return columns + ['Capacity', 'Year'], rows
+
+
+def plot_storage(model, result, keyName=''):
+    """
+    Make the five storage plots (produced, disk and tape by tier and by year produced)
+
+    :param model: The configuration dictionary
+    :param result: StorageResult from run_storage
+    :param keyName: suffix for the PNG file names
+    """
+
+    YEARS = result.years
+    TIERS = result.tiers
+    STATIC_TIERS = result.static_tiers
+    cube = result.cube
+    plotMaxs = model['plotMaximums']
+
+    minYearVal = max(0, model['minYearToPlot'] - YEARS[0]) - 0.5  # pandas...
+
+    producedByTier = cube.produced(unit=PETA)[:, cube.index('tier', TIERS)].tolist()
+    plotStorage(producedByTier, name='ProducedbyTier' + keyName + '.png', title='Data produced by tier',
+                columns=TIERS, index=YEARS, maximum=plotMaxs['ProducedbyTier'], minYear=minYearVal)
+
+    for medium, title, capacity, maxName in [('tape_unfilled', 'Tape', result.tapeCapacity, 'TapebyTier'),
+                                             ('disk', 'Disk', result.diskCapacity, 'DiskbyTier')]:
+        columns, rows = capacity_rows(YEARS, cube.by_tier(medium, unit=PETA), cube.tiers, capacity)
+        plotStorageWithCapacity(rows, name=title + 'byTier' + keyName + '.png',
+                                title='Data on %s by tier' % title.lower(), columns=columns,
+                                bars=TIERS + STATIC_TIERS, maximum=plotMaxs[maxName], minYear=minYearVal)
+    for medium, title, capacity, maxName in [('tape', 'Tape', result.tapeCapacity, 'TapebyTier'),
+                                             ('disk', 'Disk', result.diskCapacity, 'DiskbyYear')]:
+        columns, rows = capacity_rows(YEARS, cube.by_produced_year(medium, unit=PETA), cube.produced_years,
+                                      capacity)
+        plotStorageWithCapacity(rows, name=title + 'byYear' + keyName + '.png',
+                                title='Data on %s by year produced' % title.lower(), columns=columns,
+                                bars=YEARS + [LEGACY_YEAR], maximum=plotMaxs[maxName], minYear=minYearVal)
+
+
+def write_samples(result, diskFile='disk_samples.json', tapeFile='tape_samples.json'):
+    """
+    Dump out tuples of all the data on tape and disk in a given year
+    """
+
+    with open(diskFile, 'w') as diskUsage, open(tapeFile, 'w') as tapeUsage:
+        json.dump(result.diskSamples, diskUsage, sort_keys=True, indent=1)
+        json.dump(result.tapeSamples, tapeUsage, sort_keys=True, indent=1)
+
+
+def storage_with_samples(model, samples='json', prefix=''):
+    """
+    Run the storage model and write the disk and tape samples
+
+    :param model: The configuration dictionary
+    :param samples: format of the samples files, one of SAMPLE_FORMATS
+    :param prefix: prefix of the samples file names
+    :return: StorageResult from run_storage
+    """
+
+    diskFile = prefix + 'disk_samples.' + samples
+    tapeFile = prefix + 'tape_samples.' + samples
+    if samples == 'json':
+        result = run_storage(model)
+        with instrument.phase('write samples'):
+            write_samples(result, diskFile, tapeFile)
+        return result
+
+    tiers = list(model['tier_sizes'].keys()) + list(model['static_disk'].keys()) + list(model['static_tape'].keys())
+    with sample_writer(diskFile, tiers) as diskWriter, sample_writer(tapeFile, tiers) as tapeWriter:
+        return run_storage(model, sampleWriters=(diskWriter, tapeWriter))
+
+
+def print_storage(model, result):
+    """
+    Print the disk and tape tables
+
+    :param model: The configuration dictionary
+    :param result: StorageResult from run_storage
+    """
+
+    YEARS = result.years
+    TIERS = result.tiers
+    STATIC_TIERS = result.static_tiers
+    columns = result.cube.index('tier', TIERS + STATIC_TIERS)
+    diskByTier = result.cube.by_tier('disk', unit=PETA).tolist()
+    tapeByTier = result.cube.by_tier('tape_unfilled', unit=PETA).tolist()
+
+    # disk printout
+    print('\nDisk by tier printout in PB\n')
+    header = "year"
     for column in TIERS + STATIC_TIERS:
-        line += " " 
-        line += '{:8.2f}'.format(tapeByTier[YEARS.index(year)][TierColumns.index(column)])
-        total += tapeByTier[YEARS.index(year)][TierColumns.index(column)]
-    line += '{:8.2f}'.format(total)
-    line += '{:8.2f}'.format(total*0.4)
-    print(line)
-
-# two new lines needed for 2018
-us_fraction=model['us_fraction_T1T2']
-tape_fraction_T0=model['tape_fraction_T0']
-disk_fraction_T0=model['disk_fraction_T0']
-
-print("Year","\t"," US Disk","\t"," US Tape\tCopies")
-for year in YEARS:
-    totalDisk=0
-    totalTape=0
-    nCopies=copies_on_disk[year]/float(tiers_on_disk[year])
+        header += ";"
+        header += str(column)
+    header += ";total;40%"
+    print(header)
+
+    for y, year in enumerate(YEARS):
+        line = str(year)
+        total = 0
+        for column in columns:
+            line += " "
+            line += '{:8.2f}'.format(diskByTier[y][column])
+            total += diskByTier[y][column]
+        line += '{:8.2f}'.format(total)
+        line += '{:8.2f}'.format(total * 0.4)
+        print(line)
+
+    # tape printout
+    print('\nTape by tier printout in PB\n')
+    header = "year"
     for column in TIERS + STATIC_TIERS:
-        totalDisk += diskByTier[YEARS.index(year)][TierColumns.index(column)]
-        totalTape += tapeByTier[YEARS.index(year)][TierColumns.index(column)]
-
-    print(year,'\t','{:8.2f}'.format(totalDisk*us_fraction*(1.0-disk_fraction_T0)),'\t',
-               '{:8.2f}'.format(totalTape*us_fraction*(1.0-tape_fraction_T0)),'\t',
-          '{:4.2f}'.format(nCopies),'\t',
-          '{:4.2f}'.format(us_fraction*nCopies)
-
-          )
+        header += ";"
+        header += str(column)
+    header += ";total;40%"
+    print(header)
+
+    for y, year in enumerate(YEARS):
+        line = str(year)
+        total = 0
+        for column in columns:
+            line += " "
+            line += '{:8.2f}'.format(tapeByTier[y][column])
+            total += tapeByTier[y][column]
+        line += '{:8.2f}'.format(total)
+        line += '{:8.2f}'.format(total * 0.4)
+        print(line)
+
+    # two new lines needed for 2018
+    us_fraction = model['us_fraction_T1T2']
+    tape_fraction_T0 = model['tape_fraction_T0']
+    disk_fraction_T0 = model['disk_fraction_T0']
+
+    print("Year", "\t", " US Disk", "\t", " US Tape\tCopies")
+    for y, year in enumerate(YEARS):
+        totalDisk = 0
+        totalTape = 0
+        nCopies = result.copies_on_disk.get(year, 0) / float(result.tiers_on_disk.get(year, 1))
+        for column in columns:
+            totalDisk += diskByTier[y][column]
+            totalTape += tapeByTier[y][column]
+
+        print(year, '\t', '{:8.2f}'.format(totalDisk * us_fraction * (1.0 - disk_fraction_T0)), '\t',
+              '{:8.2f}'.format(totalTape * us_fraction * (1.0 - tape_fraction_T0)), '\t',
+              '{:4.2f}'.format(nCopies), '\t',
+              '{:4.2f}'.format(us_fraction * nCopies)
+              )
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Determine the disk and tape models')
+    parser.add_argument('models', nargs='*', help='comma separated list of configuration files')
+    parser.add_argument('--no-plots', dest='plots', action='store_false', help='print the tables only')
+    parser.add_argument('--profile', nargs='?', const='data_profile.json', default=None,
+                        help='write timing and call counts to this file')
+    parser.add_argument('--samples', choices=SAMPLE_FORMATS, default='json', help='format of the samples files')
+    parser.add_argument('--years', default=None, help='only evaluate these years, e.g. 2026-2028,2030')
+    parser.add_argument('--tiers', default=None, help='only evaluate these comma separated tiers')
+    options = parser.parse_args(args)
+    if options.profile:
+        instrument.enable()
+
+    modelNames = model_names_from_args(options.models)
+    model = configure(modelNames)
+    try:
+        years = years_from_arg(options.years, model) if options.years else None
+        tiers = tiers_from_arg(options.tiers, model) if options.tiers else None
+    except ValueError as error:
+        parser.error(str(error))
+
+    if years is None and tiers is None:
+        result = storage_with_samples(model, options.samples)
+        if options.plots:
+            with instrument.phase('plots'), queued():
+                plot_storage(model, result, keyName=png_key_name(modelNames))
+    else:
+        result = run_storage(model, years=years, tiers=tiers)
+    with instrument.phase('print'):
+        print_storage(model, result)
+
+    if options.profile:
+        instrument.finish(options.profile)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
 
 
 '''
@@ -0,0 +1,282 @@
+#! /usr/bin/env python
+
+"""
+The disk and tape model as an importable function.
+
+run_storage(model) evaluates the data produced, stored on disk and on tape, and the capacity
+model for a configured model (see configure.py) and returns the results without printing,
+plotting or writing files, so many scenarios can be evaluated in one process. data.py is the
+command line wrapper.
+
+run_storage is made of three steps which can also be called on their own: storage_capacity,
+storage_arrays (which can update only some tiers of an earlier evaluation, see incremental.py)
+and storage_result, which collects the volumes into a ResultCube (see cube.py).
+
+run_storage(model, years=[2026, 2027, 2028], tiers=['NANOAOD']) only evaluates some years and
+tiers. The data is then produced only from the first year whose data can still be kept in
+those years (see history_years), and the capacity and the copies by age of the data stored are
+evaluated for the years asked for alone.
+"""
+
+from __future__ import division, print_function
+
+from collections import namedtuple
+
+import numpy as np
+
+from capacity import capacity_by_year, resource_spec
+from cube import LEGACY_YEAR, STATIC_TYPE, ResultCube
+from storage_engine import (DATA_TYPES, copies_by_age, last_running_years, produced_types, produced_volume,
+                            revision_index, revisions, scale_by_year, stored_volume, sum_over_produced)
+from utils import time_dependent_value
+
+PETA = 1e15
+
+StorageArrays = namedtuple('StorageArrays', [
+    'producedYears', 'present', 'produced', 'diskCopiesByTier', 'tapeCopiesByTier', 'diskIndex', 'tapeIndex',
+    'diskScale', 'onDisk', 'keptOnDisk', 'onTape', 'onTapeFilled', 'keptOnTape', 'diskTotal', 'tapeTotal',
+])
+
+StorageResult = namedtuple('StorageResult', [
+    'years', 'tiers', 'static_tiers', 'diskCapacity', 'tapeCapacity', 'cube', 'diskSamples', 'tapeSamples',
+    'copies_on_disk', 'tiers_on_disk',
+])
+
+
+def run_storage(model, sampleWriters=None, years=None, tiers=None):
+    """
+    Evaluate the disk and tape model
+
+    :param model: The configuration dictionary
+    :param sampleWriters: writers for the disk and tape samples (see samples.py), which are then
+                          written year by year and not kept in the result
+    :param years: sorted list of the years to evaluate, default from start_year to end_year
+    :param tiers: list of the tiers (including static ones) to evaluate, default all of them
+    :return: StorageResult. The volumes are in the ResultCube cube, in bytes.
+             diskSamples and tapeSamples are None if sampleWriters are given
+    """
+
+    YEARS = list(range(model['start_year'], model['end_year'] + 1)) if years is None else list(years)
+    TIERS = [tier for tier in model['tier_sizes'].keys() if tiers is None or tier in tiers]
+
+    producedYears = None
+    if years is not None or tiers is not None:
+        producedYears = history_years(model, YEARS, TIERS)
+    return storage_result(model, YEARS, TIERS, storage_arrays(model, YEARS, TIERS, producedYears=producedYears),
+                          storage_capacity(model, YEARS), sampleWriters=sampleWriters, staticTiers=tiers)
+
+
+def history_years(model, YEARS, TIERS):
+    """
+    :param model: The configuration dictionary
+    :param YEARS: sorted list of years
+    :param TIERS: list of tiers
+    :return: list of the years whose data can be stored in YEARS, from start_year to the last of YEARS. If no
+             tier keeps copies of data older than the copies by age given, from the oldest data still kept in
+             the first of YEARS
+    """
+
+    first = YEARS[0]
+    for replicas in ['disk_replicas', 'tape_replicas']:
+        copies, lengths = copies_by_age(model, TIERS, replicas)[:2]
+        if copies[-1].any():
+            first = model['start_year']
+        else:
+            first = min(first, YEARS[0] - lengths.max() + 1)
+    return list(range(max(first, model['start_year']), YEARS[-1] + 1))
+
+
+def storage_capacity(model, YEARS):
+    """
+    Build the capacity model
+
+    :param model: The configuration dictionary
+    :param YEARS: list of years
+    :return: dictionaries of the disk and the tape capacity in bytes, keyed by str(year)
+    """
+
+    diskCapacity = capacity_by_year(resource_spec(model, 'disk'), YEARS)
+    tapeCapacity = capacity_by_year(resource_spec(model, 'tape'), YEARS)
+    return diskCapacity, tapeCapacity
+
+
+def storage_arrays(model, YEARS, TIERS, previous=None, tiers=None, producedYears=None):
+    """
+    Evaluate the volume produced and kept on disk and tape, as arrays [year, producedYear, dataType, tier]
+
+    :param model: The configuration dictionary
+    :param YEARS: list of years
+    :param TIERS: list of tiers
+    :param previous: StorageArrays from an earlier call with the same years and tiers
+    :param tiers: indices in TIERS of the tiers to evaluate. The others are taken from previous
+    :param producedYears: consecutive years in which the data is produced, including YEARS, default YEARS
+    :return: StorageArrays
+    """
+
+    if producedYears is None:
+        producedYears = YEARS
+    years = np.array(YEARS)
+    produceds = np.array(producedYears)
+    lastRunning = last_running_years(model, YEARS)
+    present = produced_types(model, TIERS)
+
+    # Simple factors inspired by spreadsheet for how "efficiently" we use disk and tape
+    # two components - 1 a simple "filling" factor - eg, DDM fills X% of the disk
+    #                  2 buffer space at the Tier1s (tier-2s are handled below)
+    disk_fill_factor = (1.0 / model['disk_fill_factor']) * (model['tier1_disk_fraction'] * (1.0 + model['tier1_disk_buffer_fraction']) + (1.0 - model['tier1_disk_fraction']))
+    tape_fill_factor = 1.0 / model['tape_fill_factor']
+
+    # Determine how much is saved, allowing for some time dependence in the replicas
+    diskCopies, diskLengths, diskCopiesByTier = copies_by_age(model, TIERS, 'disk_replicas')
+    tapeCopies, tapeLengths, tapeCopiesByTier = copies_by_age(model, TIERS, 'tape_replicas')
+    diskScale = scale_by_year(model, producedYears, TIERS, 'disk_scaling')
+    tapeScale = scale_by_year(model, producedYears, TIERS, 'tape_scaling')
+    diskIndex = revision_index(years, produceds, lastRunning, diskLengths)
+    tapeIndex = revision_index(years, produceds, lastRunning, tapeLengths)
+
+    if previous is None or tiers is None:
+        tiers = list(range(len(TIERS)))
+        shape = (len(YEARS), len(producedYears), len(DATA_TYPES), len(TIERS))
+        produced = np.zeros(shape[1:])
+        onDisk, keptOnDisk = np.zeros(shape), np.zeros(shape, dtype=bool)
+        onTape, keptOnTape = np.zeros(shape), np.zeros(shape, dtype=bool)
+        onTapeFilled = np.zeros(shape)
+        diskTotal, tapeTotal = np.zeros(shape[:1] + shape[2:]), np.zeros(shape[:1] + shape[2:])
+    else:
+        produced = previous.produced.copy()
+        onDisk, keptOnDisk = previous.onDisk.copy(), previous.keptOnDisk.copy()
+        onTape, keptOnTape = previous.onTape.copy(), previous.keptOnTape.copy()
+        onTapeFilled = previous.onTapeFilled.copy()
+        diskTotal, tapeTotal = previous.diskTotal.copy(), previous.tapeTotal.copy()
+
+    # Determine how much is produced without versions or replicas
+    produced[:, :, tiers] = produced_volume(model, producedYears, [TIERS[t] for t in tiers])
+
+    onDisk[..., tiers], keptOnDisk[..., tiers] = stored_volume(
+        produced[:, :, tiers], revisions(diskCopies, diskIndex)[:, :, tiers], diskScale[:, tiers], disk_fill_factor,
+        years=years, producedYears=produceds)
+    onTape[..., tiers], keptOnTape[..., tiers] = stored_volume(
+        produced[:, :, tiers], revisions(tapeCopies, tapeIndex)[:, :, tiers], tapeScale[:, tiers],
+        years=years, producedYears=produceds)
+    # The samples and the tape by year include the tape fill factor, the tape by tier does not
+    if tape_fill_factor != 1.0:
+        onTapeFilled[..., tiers] = stored_volume(
+            produced[:, :, tiers], revisions(tapeCopies, tapeIndex)[:, :, tiers], tapeScale[:, tiers],
+            tape_fill_factor, years=years, producedYears=produceds)[0]
+    else:
+        onTapeFilled = onTape
+    diskTotal[..., tiers] = sum_over_produced(onDisk[..., tiers])  # [year, dataType, tier]
+    tapeTotal[..., tiers] = sum_over_produced(onTape[..., tiers])
+
+    return StorageArrays(producedYears=producedYears, present=present, produced=produced,
+                         diskCopiesByTier=diskCopiesByTier, tapeCopiesByTier=tapeCopiesByTier,
+                         diskIndex=diskIndex, tapeIndex=tapeIndex, diskScale=diskScale,
+                         onDisk=onDisk, keptOnDisk=keptOnDisk, onTape=onTape, onTapeFilled=onTapeFilled,
+                         keptOnTape=keptOnTape, diskTotal=diskTotal, tapeTotal=tapeTotal)
+
+
+def storage_result(model, YEARS, TIERS, arrays, capacity, sampleWriters=None, staticTiers=None):
+    """
+    Collect the volumes of the disk and tape model, adding the static and legacy data
+
+    :param model: The configuration dictionary
+    :param YEARS: list of years
+    :param TIERS: list of tiers
+    :param arrays: StorageArrays from storage_arrays
+    :param capacity: disk and tape capacity from storage_capacity
+    :param sampleWriters: as for run_storage
+    :param staticTiers: list of the static tiers to add, default all of them
+    :return: StorageResult
+    """
+
+    STATIC_TIERS = list(sorted(set(list(model['static_disk'].keys()) + list(model['static_tape'].keys()))))
+    if staticTiers is not None:
+        STATIC_TIERS = [tier for tier in STATIC_TIERS if tier in staticTiers]
+    producedYears = arrays.producedYears
+    producedIndex = [producedYears.index(year) for year in YEARS]
+    diskCapacity, tapeCapacity = capacity
+    present = arrays.present
+    onDisk, keptOnDisk = arrays.onDisk, arrays.keptOnDisk
+    onTapeFilled, keptOnTape = arrays.onTapeFilled, arrays.keptOnTape
+    diskCopiesByTier, tapeCopiesByTier = arrays.diskCopiesByTier, arrays.tapeCopiesByTier
+    diskIndex, tapeIndex = arrays.diskIndex, arrays.tapeIndex
+    diskScale = arrays.diskScale
+
+    # The static data is first along the data types, as it is added first to the totals
+    cube = ResultCube(years=YEARS, producedYears=producedYears + [LEGACY_YEAR], dataTypes=[STATIC_TYPE] + DATA_TYPES,
+                      tiers=TIERS + [tier for tier in STATIC_TIERS if tier not in TIERS])
+    n, types = len(producedYears), slice(1, 1 + len(DATA_TYPES))
+    cube.values[np.arange(len(YEARS)), producedIndex, types, :len(TIERS), cube.index('medium', 'produced')] = \
+        arrays.produced[producedIndex]
+    for medium, stored in [('disk', onDisk), ('tape', onTapeFilled), ('tape_unfilled', arrays.onTape)]:
+        cube.values[:, :n, types, :len(TIERS), cube.index('medium', medium)] = stored
+
+    diskSamples = {} if sampleWriters is None else None
+    tapeSamples = {} if sampleWriters is None else None
+    for y, year in enumerate(YEARS):
+        diskYearSamples = []
+        tapeYearSamples = []
+
+        # Add static (or nearly) data
+        for tier, spaces in model['static_disk'].items():
+            if tier not in STATIC_TIERS:
+                continue
+            size, producedYear = time_dependent_value(year=year, values=spaces)
+            if producedYear < producedYears[0]: producedYear = producedYears[0]
+            diskYearSamples.append([producedYear, 'Other', tier, size])
+            cube.add(size, year=year, producedYear=producedYear, dataType=STATIC_TYPE, tier=tier, medium='disk')
+        for tier, spaces in model['static_tape'].items():
+            if tier not in STATIC_TIERS:
+                continue
+            size, producedYear = time_dependent_value(year=year, values=spaces)
+            if producedYear < producedYears[0]: producedYear = producedYears[0]
+            tapeYearSamples.append([producedYear, 'Other', tier, size])
+            for medium in ['tape', 'tape_unfilled']:
+                cube.add(size, year=year, producedYear=producedYear, dataType=STATIC_TYPE, tier=tier, medium=medium)
+
+        # Figure out data from this year and previous
+        for p, k, t in zip(*np.nonzero(keptOnDisk[y])):
+            diskYearSamples.append([producedYears[p], DATA_TYPES[k], TIERS[t], float(onDisk[y, p, k, t]),
+                                      diskCopiesByTier[t][diskIndex[y, p, t]]])
+        for p, k, t in zip(*np.nonzero(keptOnTape[y])):
+            tapeYearSamples.append([producedYears[p], DATA_TYPES[k], TIERS[t], float(onTapeFilled[y, p, k, t]),
+                                      tapeCopiesByTier[t][tapeIndex[y, p, t]]])
+
+        if sampleWriters is None:
+            diskSamples[year] = diskYearSamples
+            tapeSamples[year] = tapeYearSamples
+        else:
+            sampleWriters[0].write(year, diskYearSamples)
+            sampleWriters[1].write(year, tapeYearSamples)
+
+    # Copies on disk of the data produced in each year
+    copies_on_disk = {}
+    tiers_on_disk = {}
+    for y, year in enumerate(YEARS):
+        for k, dataType in enumerate(DATA_TYPES):
+            for t, tier in enumerate(TIERS):
+                if present[k, t] and tier != "USER" and tier != "GENSIM" and tier != "RAW":
+                    tiers_on_disk[year] = tiers_on_disk.get(year, 0) + 1
+                    copies_on_disk[year] = copies_on_disk.get(year, 0) + \
+                        diskCopiesByTier[t][0] * diskScale[producedIndex[y], t]
+
+    # Legacy data on disk in PB, which replaces the static data of the same name
+    if 'legacyInfoDict' in model:
+        legacy = [(int(year), val) for year, val in model['legacyInfoDict'].items()]
+    else:
+        legacy = [(2016, 25)] if 2016 in YEARS else []
+        legacy += [(2017, 25), (2018, 10), (2019, 5), (2020, 0)]
+    if LEGACY_YEAR not in cube.tiers:
+        legacy = []
+    for year, val in legacy:
+        if year not in YEARS:
+            continue
+        y, t, disk = YEARS.index(year), cube.index('tier', LEGACY_YEAR), cube.index('medium', 'disk')
+        cube.values[y, :, :, t, disk] = 0.0
+        cube.values[y, cube.index('producedYear', LEGACY_YEAR), cube.index('dataType', STATIC_TYPE), t, disk] = \
+            val * PETA
+
+    return StorageResult(years=YEARS, tiers=TIERS, static_tiers=STATIC_TIERS,
+                         diskCapacity=diskCapacity, tapeCapacity=tapeCapacity, cube=cube,
+                         diskSamples=diskSamples, tapeSamples=tapeSamples,
+                         copies_on_disk=copies_on_disk, tiers_on_disk=tiers_on_disk)
@@ -0,0 +1,147 @@
+#! /usr/bin/env python
+
+"""
+Usage: ./driver.py [--no-plots] [--samples json] [--output-dir DIR] [--processes N] [--profile]
+                   manifest.json [scenario1 scenario2 ...]
+
+Run the CPU, storage and event models for many scenarios in one process, as cpu.py, data.py
+and events.py do for one. The manifest is a JSON file naming each scenario and listing the
+configuration files applied on top of BaseModel.json and RealisticModel.json, e.g.
+
+ {
+  "Run2030": ["RelyOnMiniAOD.json", "Run2030.json"],
+  "Run2024": ["RelyOnMiniAOD.json", "Run2024.json"]
+ }
+
+Only the scenarios named after the manifest are run, or all of them in the order of the
+manifest. The base model is read once and each scenario's model is configured once and shared
+by the three models, so the event tables are computed once per scenario. The plots of all the
+scenarios are queued and drawn at the end by a pool of --processes processes.
+
+For every scenario the printed tables go to <scenario>_cpu.txt and <scenario>_data.txt, the
+samples to <scenario>_disk_samples.json and <scenario>_tape_samples.json (or the --samples
+format), and the plots to the usual PNG names with _<scenario> appended.
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+from collections import OrderedDict
+
+import instrument
+from configure import configure, load_base
+from cpu import plot_cpu, print_cpu
+from cpu_model import run_cpu
+from data import plot_storage, print_storage, storage_with_samples
+from events import plot_events
+from plotting import queued
+from samples import SAMPLE_FORMATS
+
+
+def read_manifest(fileName):
+    """
+    :param fileName: JSON file of {scenario: list of configuration files}
+    :return: OrderedDict of the scenarios in the order of the file
+    """
+
+    with open(fileName, 'r') as manifestFile:
+        manifest = json.load(manifestFile, object_pairs_hook=OrderedDict)
+    for name, overlays in manifest.items():
+        if not isinstance(overlays, list):
+            raise ValueError('Scenario %s in %s is not a list of configuration files' % (name, fileName))
+    return manifest
+
+
+@contextlib.contextmanager
+def printed_to(fileName):
+    """
+    Send what is printed to fileName instead of the standard output
+    """
+
+    stdout = sys.stdout
+    with open(fileName, 'w') as outputFile:
+        sys.stdout = outputFile
+        try:
+            yield outputFile
+        finally:
+            sys.stdout = stdout
+
+
+def run_scenario(name, overlays, base, outputDir='.', plots=True, samples='json'):
+    """
+    Run the CPU, storage and event models for one scenario and write its files
+
+    :param name: name of the scenario, used in all the file names
+    :param overlays: list of configuration files
+    :param base: the merged base model (see configure.load_base)
+    :param outputDir: directory for the files
+    :param plots: make the plots
+    :param samples: format of the samples files, one of SAMPLE_FORMATS
+    """
+
+    prefix = os.path.join(outputDir, name + '_')
+    keyName = '_' + name
+    model = configure(overlays, base=base, verbose=False)
+
+    with instrument.phase('cpu'):
+        cpuResult = run_cpu(model)
+        with printed_to(prefix + 'cpu.txt'):
+            print_cpu(model, cpuResult)
+
+    with instrument.phase('data'):
+        storageResult = storage_with_samples(model, samples, prefix=prefix)
+        with printed_to(prefix + 'data.txt'):
+            print_storage(model, storageResult)
+
+    if plots:
+        with instrument.phase('queue plots'):
+            # The plotting functions write to the current directory
+            cwd = os.getcwd()
+            os.chdir(outputDir)
+            try:
+                with printed_to(os.devnull):
+                    plot_cpu(model, cpuResult, keyName=keyName)
+                    plot_storage(model, storageResult, keyName=keyName)
+                    plot_events(model, name='ProducedbyKind' + keyName + '.png')
+            finally:
+                os.chdir(cwd)
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Run the CPU, storage and event models for many scenarios')
+    parser.add_argument('manifest', help='JSON file of {scenario: list of configuration files}')
+    parser.add_argument('scenarios', nargs='*', help='scenarios to run, default is all of them')
+    parser.add_argument('--no-plots', dest='plots', action='store_false', help='write the tables only')
+    parser.add_argument('--samples', choices=SAMPLE_FORMATS, default='json', help='format of the samples files')
+    parser.add_argument('--output-dir', default='.', help='directory for the output files')
+    parser.add_argument('--processes', type=int, default=None, help='number of processes drawing the plots')
+    parser.add_argument('--profile', nargs='?', const='driver_profile.json', default=None,
+                        help='write timing and call counts to this file')
+    options = parser.parse_args(args)
+
+    manifest = read_manifest(options.manifest)
+    unknown = [name for name in options.scenarios if name not in manifest]
+    if unknown:
+        parser.error('Scenarios not in %s: %s' % (options.manifest, ', '.join(unknown)))
+    if options.profile:
+        instrument.enable()
+
+    if not os.path.isdir(options.output_dir):
+        os.makedirs(options.output_dir)
+    base = load_base(verbose=False)
+    with open(os.devnull, 'w') as devnull, queued(options.processes, output=devnull):
+        for name in options.scenarios or list(manifest.keys()):
+            print(name, ' '.join(manifest[name]))
+            run_scenario(name, manifest[name], base, outputDir=options.output_dir, plots=options.plots,
+                         samples=options.samples)
+
+    if options.profile:
+        instrument.finish(options.profile)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,171 @@
+#! /usr/bin/env python
+
+"""
+Event model evaluated once for all years.
+
+run_model, in_shutdown and mc_event_model in configure.py answer for one year at a time and call
+each other many times over. EventModel evaluates them in one pass over every year the CPU and
+storage models can ask about and keeps the results in arrays indexed by year, so that all the
+callers share them. Years outside of that span fall back to the functions in configure.py.
+
+For the sub-annual timeline (timeline.py) the data of each year is split over its periods by the
+run schedule, and a period is in a shutdown if its year is or if nothing is recorded in it.
+"""
+
+from __future__ import division, print_function
+
+from collections import OrderedDict
+
+import numpy as np
+
+from configure import in_shutdown, mc_event_model, run_model
+from utils import as_ramp, ramp_token
+
+# Number of models for which event models are kept
+EVENT_MODEL_CACHE_SIZE = 16
+
+_eventModels = OrderedDict()
+
+
+def model_token(model):
+    """
+    :return: an object which compares equal as long as the parts of model used by EventModel have not changed
+    """
+
+    return (model['start_year'], model['end_year'], tuple(model['shutdown_years']), model['mc_event_factor'],
+            ramp_token(model['trigger_rate']), ramp_token(model['live_fraction']),
+            tuple((kind, ramp_token(ramp)) for kind, ramp in sorted(model['mc_evolution'].items())))
+
+
+class EventModel(object):
+    """
+    Data events, shutdowns and MC events by kind for every year of a model.
+
+    Data events are known from start_year (or the last running year before it, if start_year is in
+    a shutdown) to end_year or the last MC kind, whichever is later, since MC for a future kind is
+    based on the data of that year. Shutdowns are known for one more year on either side and MC
+    events from start_year to end_year.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.token = model_token(model)
+        self.kinds = list(model['mc_evolution'].keys())
+
+        startYear = int(model['start_year'])
+        endYear = int(model['end_year'])
+        lastYear = max([endYear] + [int(kind) for kind in self.kinds])
+
+        firstYear = startYear
+        while firstYear in model['shutdown_years']:
+            firstYear -= 1
+        self.firstYear = firstYear - 1
+        self.years = np.arange(self.firstYear, lastYear + 2)
+
+        shutdowns = [in_shutdown(model, year) for year in self.years.tolist()]
+        self.inShutdown = np.array([shutdown for shutdown, dummy in shutdowns])
+        self.lastRunning = np.array([lastRunning for dummy, lastRunning in shutdowns])
+
+        self.dataEvents = np.full(len(self.years), np.nan)
+        for year in range(firstYear, lastYear + 1):
+            self.dataEvents[year - self.firstYear] = run_model(model, year, data_type='data').events
+
+        # MC events are based on the most data from this year, the last running year if in a
+        # shutdown, or the year of the MC kind if it is in the future
+        self.mcYears = np.arange(startYear, endYear + 1)
+        index = self.mcYears - self.firstYear
+        currEvents = self.dataEvents[index]
+        lastEvents = np.where(self.inShutdown[index], self.dataEvents[self.lastRunning[index] - self.firstYear], 0)
+        self.mcEvents = np.zeros((len(self.kinds), len(self.mcYears)))
+        for k, kind in enumerate(self.kinds):
+            mcYear = int(kind)
+            futureEvents = np.where(mcYear > self.mcYears, self.dataEvents[mcYear - self.firstYear], 0)
+            dataEvents = np.maximum(np.maximum(currEvents, lastEvents), futureEvents)
+            mcFraction = as_ramp(model['mc_evolution'][kind]).interpolate_array(self.mcYears)
+            self.mcEvents[k] = mcFraction * dataEvents
+
+    def _index(self, year):
+        index = int(year) - self.firstYear
+        if 0 <= index < len(self.years):
+            return index
+        return None
+
+    def in_shutdown(self, year):
+        """
+        :return: boolean for in shutdown, integer for last year not in shutdown, as configure.in_shutdown
+        """
+
+        index = self._index(year)
+        if index is None:
+            return in_shutdown(self.model, year)
+        return bool(self.inShutdown[index]), int(self.lastRunning[index])
+
+    def data_events(self, year):
+        """
+        :return: number of data events recorded in year, as run_model(...).events
+        """
+
+        index = self._index(year)
+        if index is None or np.isnan(self.dataEvents[index]):
+            return run_model(self.model, year, data_type='data').events
+        return float(self.dataEvents[index])
+
+    def mc_events(self, year):
+        """
+        :return: dictionary of {kind: events} of MC to be simulated in year, as mc_event_model
+        """
+
+        index = int(year) - int(self.mcYears[0])
+        if not 0 <= index < len(self.mcYears):
+            return mc_event_model(self.model, year)
+        return {kind: float(self.mcEvents[k, index]) for k, kind in enumerate(self.kinds)}
+
+    def in_shutdown_years(self, years):
+        """
+        :return: boolean array of whether each of years is in a shutdown
+        """
+
+        index = np.asarray(years) - self.firstYear
+        if len(index) and index.min() >= 0 and index.max() < len(self.years):
+            return self.inShutdown[index]
+        return np.array([self.in_shutdown(year)[0] for year in years], dtype=bool)
+
+    def last_running_years(self, years):
+        """
+        :return: array of the last year not in shutdown for each of years
+        """
+
+        return np.array([self.in_shutdown(year)[1] for year in years])
+
+    def period_data_events(self, years, runWeights):
+        """
+        :param years: list of years
+        :param runWeights: array [year, period] of the fraction of each year's running in each period
+        :return: array [year, period] of the data events recorded in each period, none in a shutdown year
+        """
+
+        events = np.array([self.data_events(year) for year in years])
+        return np.where(self.in_shutdown_years(years)[:, None], 0.0, events[:, None] * runWeights)
+
+    def in_shutdown_periods(self, years, runWeights):
+        """
+        :return: boolean array [year, period] of whether each period is in a shutdown year or has no running
+        """
+
+        return self.in_shutdown_years(years)[:, None] | (np.asarray(runWeights) == 0)
+
+
+def event_model(model):
+    """
+    :param model: The model parameters
+    :return: the EventModel of the model, kept between calls and rebuilt if the model has changed
+    """
+
+    key = id(model)
+    eventModel = _eventModels.pop(key, None)
+    if eventModel is None or eventModel.model is not model or eventModel.token != model_token(model):
+        eventModel = EventModel(model)
+    _eventModels[key] = eventModel
+    while len(_eventModels) > EVENT_MODEL_CACHE_SIZE:
+        _eventModels.popitem(last=False)
+    return eventModel
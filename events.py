@@ -1,38 +1,75 @@
 #! /usr/bin/env python
 
 """
-Usage: ./cpu.py config1.json,config2.json,...,configN.json
+Usage: ./events.py [--profile [FILE]] config1.json,config2.json,...,configN.json
 
 Determine the disk and tape models by running under various configuration changes. BaseModel.json and RealisticModel.json
 provide defaults and configN.json overrides values in those configs or earlier ones in the list
+
+With --profile the time spent in each phase and the number of calls to the lookup functions
+are written to events_profile.json (or the file given) and summarized at the end (see instrument.py)
 """
 
 from __future__ import division, print_function
 
+import argparse
 import sys
 
-from configure import configure, mc_event_model, run_model
+import instrument
+from configure import configure, model_names_from_args
+from event_model import event_model
 from plotting import plotEvents
 
 GIGA = 1e9
 
-modelNames = None
-if len(sys.argv) > 1:
-    modelNames = sys.argv[1].split(',')
-model = configure(modelNames)
 
-YEARS = list(range(model['start_year'], model['end_year'] + 1))
+def events_by_year(model):
+    """
+    :param model: The configuration dictionary
+    :return: list of the kinds of events ('<kind> MC' and 'Data'), the years and the matrix
+             [year][kind] of the billions of events produced
+    """
+
+    YEARS = list(range(model['start_year'], model['end_year'] + 1))
+    events = event_model(model)
+
+    # Call the data model with a random year to get the fields
+    dataKinds = [key + ' MC' for key in events.mc_events(2020).keys()]
+    dataKinds.append('Data')
+
+    eventsByYear = [[0 for _i in range(len(dataKinds))] for _j in YEARS]
+
+    for year in YEARS:
+        eventsByYear[YEARS.index(year)][dataKinds.index('Data')] = events.data_events(year) / GIGA
+        mcEvents = events.mc_events(year)
+        for mcKind, count in mcEvents.items():
+            eventsByYear[YEARS.index(year)][dataKinds.index(mcKind + ' MC')] = count / GIGA
+
+    return dataKinds, YEARS, eventsByYear
+
+
+def plot_events(model, name='Produced by Kind.png'):
+    dataKinds, YEARS, eventsByYear = events_by_year(model)
+    plotEvents(eventsByYear, name=name, title='Events produced by type', columns=dataKinds, index=YEARS)
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Plot the events produced by kind')
+    parser.add_argument('models', nargs='*', help='comma separated list of configuration files')
+    parser.add_argument('--profile', nargs='?', const='events_profile.json', default=None,
+                        help='write timing and call counts to this file')
+    options = parser.parse_args(args)
+    if options.profile:
+        instrument.enable()
+
+    model = configure(model_names_from_args(options.models))
 
-# Call the data model with a random year to get the fields
-dataKinds = [key + ' MC' for key in mc_event_model(model, 2020).keys()]
-dataKinds.append('Data')
+    with instrument.phase('plots'):
+        plot_events(model)
 
-eventsByYear = [[0 for _i in range(len(dataKinds))] for _j in YEARS]
+    if options.profile:
+        instrument.finish(options.profile)
 
-for year in YEARS:
-    eventsByYear[YEARS.index(year)][dataKinds.index('Data')] = run_model(model, year).events / GIGA
-    mcEvents = mc_event_model(model, year)
-    for mcKind, count in mcEvents.items():
-        eventsByYear[YEARS.index(year)][dataKinds.index(mcKind + ' MC')] = count / GIGA
 
-plotEvents(eventsByYear, name='Produced by Kind.png', title='Events produced by type', columns=dataKinds, index=YEARS)
+if __name__ == '__main__':
+    main(sys.argv[1:])
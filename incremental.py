@@ -0,0 +1,198 @@
+#! /usr/bin/env python
+
+"""
+Incremental evaluation of the CPU and storage models.
+
+An Evaluator keeps the last model it evaluated together with the intermediate quantities of
+the storage model (see data_model.py) and the CPU result. When it is given a new model, it
+compares it with the last one key by key and recomputes only the stages which read a changed
+key. Changes to per tier entries (tier_sizes, versions, replicas and scaling in storage_model)
+only recompute the volume produced and stored for those tiers.
+
+ model = configure(['RelyOnMiniAOD.json'])
+ evaluator = Evaluator()
+ cpuResult, storageResult = evaluator.evaluate(model)
+ model['tier_sizes']['NANOAOD']['2026'] = 2000
+ cpuResult, storageResult = evaluator.evaluate(model)  # Only NANOAOD is recomputed
+"""
+
+from __future__ import division, print_function
+
+import copy
+
+from cpu_model import run_cpu
+from data_model import storage_arrays, storage_capacity, storage_result
+
+# Stages which are recomputed when a key changes:
+#  years    - everything
+#  events   - the CPU model and the storage for all tiers
+#  produced - the storage for one tier (the key after the prefix) or all tiers
+#  stored   - the storage for all tiers
+#  capacity - the storage capacity
+#  tables   - only the storage tables
+#  cpu      - the CPU model
+# Keys matching none of the prefixes below recompute everything.
+STAGE_KEYS = [
+    (('start_year',), 'years'),
+    (('end_year',), 'years'),
+    (('shutdown_years',), 'events'),
+    (('trigger_rate',), 'events'),
+    (('live_fraction',), 'events'),
+    (('mc_evolution',), 'events'),
+    (('mc_event_factor',), 'events'),
+    (('tier_sizes',), 'produced'),
+    (('storage_model', 'versions'), 'produced'),
+    (('storage_model', 'disk_replicas'), 'produced'),
+    (('storage_model', 'tape_replicas'), 'produced'),
+    (('storage_model', 'disk_scaling'), 'produced'),
+    (('storage_model', 'tape_scaling'), 'produced'),
+    (('storage_model',), 'stored'),
+    (('mc_only_tiers',), 'stored'),
+    (('data_only_tiers',), 'stored'),
+    (('disk_fill_factor',), 'stored'),
+    (('tape_fill_factor',), 'stored'),
+    (('tier1_disk_fraction',), 'stored'),
+    (('tier1_disk_buffer_fraction',), 'stored'),
+    (('capacity_model', 'disk_year'), 'capacity'),
+    (('capacity_model', 'disk_start'), 'capacity'),
+    (('capacity_model', 'disk_lifetime'), 'capacity'),
+    (('capacity_model', 'disk_delta'), 'capacity'),
+    (('capacity_model', 'tape_year'), 'capacity'),
+    (('capacity_model', 'tape_start'), 'capacity'),
+    (('capacity_model', 'tape_lifetime'), 'capacity'),
+    (('capacity_model', 'tape_delta'), 'capacity'),
+    (('improvement_factors', 'disk'), 'capacity'),
+    (('improvement_factors', 'tape'), 'capacity'),
+    (('static_disk',), 'tables'),
+    (('static_tape',), 'tables'),
+    (('legacyInfoDict',), 'tables'),
+    (('capacity_model',), 'cpu'),
+    (('improvement_factors',), 'cpu'),
+    (('cpu_time',), 'cpu'),
+    (('cpu_efficiency',), 'cpu'),
+    (('new_detector_years',), 'cpu'),
+    (('first_year_to_spread_rereco_over_two_years',), 'cpu'),
+    (('hl_start_year',), 'cpu'),
+    (('us_fraction_T1T2',), 'cpu'),
+    (('AnalysisSet',), 'cpu'),
+    (('AnalysisCPUPerEvent',), 'cpu'),
+    (('AnalysisCPUScaledByReco',), 'cpu'),
+    (('AnalysisReadsPerYearData',), 'cpu'),
+    (('AnalysisReadsPerYearMC',), 'cpu'),
+    # Only used for plots and printing
+    (('plotMaximums',), None),
+    (('minYearToPlot',), None),
+    (('disk_fraction_T0',), None),
+    (('tape_fraction_T0',), None),
+    (('sites',), None),
+    # Only used by uncertainty.py
+    (('uncertainties',), None),
+]
+
+
+def changed_keys(old, new, path=()):
+    """
+    :param old: a model dictionary
+    :param new: another model dictionary
+    :return: set of the paths (tuples of keys) of the values which differ between old and new
+    """
+
+    changes = set()
+    for key in set(old.keys()) | set(new.keys()):
+        if key not in old or key not in new:
+            changes.add(path + (key,))
+        elif isinstance(old[key], dict) and isinstance(new[key], dict):
+            changes |= changed_keys(old[key], new[key], path + (key,))
+        elif old[key] != new[key]:
+            changes.add(path + (key,))
+    return changes
+
+
+def stage_of(key):
+    """
+    :param key: path of a changed value
+    :return: the stage it belongs to and, for per tier keys, the tier (None for all tiers)
+    """
+
+    for prefix, stage in STAGE_KEYS:
+        if key[:len(prefix)] == prefix:
+            tier = None
+            if stage == 'produced' and len(key) > len(prefix):
+                tier = key[len(prefix)]
+            return stage, tier
+    return 'years', None
+
+
+class Evaluator(object):
+    """
+    Evaluate the CPU and storage models, reusing what can be reused from the last evaluation.
+
+    recomputed lists what the last call to evaluate recomputed: 'cpu', 'capacity', 'tables'
+    and the names of the tiers whose volumes were recomputed.
+    """
+
+    def __init__(self):
+        self.model = None
+        self.years = None
+        self.tiers = None
+        self.cpuResult = None
+        self.arrays = None
+        self.capacity = None
+        self.storageResult = None
+        self.recomputed = []
+
+    def plan(self, model, YEARS, TIERS):
+        """
+        :return: set of the stages to recompute and the set of tiers to recompute (None for all)
+        """
+
+        if self.model is None or YEARS != self.years or TIERS != self.tiers:
+            return {'years'}, None
+
+        stages = set()
+        tiers = set()
+        for key in changed_keys(self.model, model):
+            stage, tier = stage_of(key)
+            if stage == 'produced' and tier is not None and tier in TIERS:
+                tiers.add(tier)
+            elif stage == 'produced':
+                stage = 'stored'
+            if stage is not None:
+                stages.add(stage)
+
+        if stages & {'years', 'events', 'stored'}:
+            tiers = None
+        return stages, tiers
+
+    def evaluate(self, model):
+        """
+        :param model: The configuration dictionary
+        :return: CpuResult and StorageResult, as run_cpu and run_storage
+        """
+
+        YEARS = list(range(model['start_year'], model['end_year'] + 1))
+        TIERS = list(model['tier_sizes'].keys())
+        stages, tiers = self.plan(model, YEARS, TIERS)
+        everything = 'years' in stages
+        self.recomputed = []
+
+        if everything or stages & {'events', 'cpu'}:
+            self.cpuResult = run_cpu(model)
+            self.recomputed.append('cpu')
+        if everything or 'capacity' in stages:
+            self.capacity = storage_capacity(model, YEARS)
+            self.recomputed.append('capacity')
+        if everything or tiers is None or tiers:
+            previous, indices = self.arrays, None
+            if not everything and tiers is not None:
+                indices = [TIERS.index(tier) for tier in sorted(tiers)]
+            self.arrays = storage_arrays(model, YEARS, TIERS, previous=previous, tiers=indices)
+            self.recomputed.extend(sorted(tiers) if indices is not None else TIERS)
+        if everything or stages - {'cpu'}:
+            self.storageResult = storage_result(model, YEARS, TIERS, self.arrays, self.capacity)
+            self.recomputed.append('tables')
+
+        self.model = copy.deepcopy(model)
+        self.years = YEARS
+        self.tiers = TIERS
+        return self.cpuResult, self.storageResult
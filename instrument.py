@@ -0,0 +1,232 @@
+#! /usr/bin/env python
+
+"""
+Opt-in timing and call counting for model runs.
+
+Nothing is measured until enable() is called. It then replaces the functions in TIMED and
+COUNTED, in every module which has imported them, by wrappers which time or count their
+calls; disable() puts the originals back. Code can also mark phases of its own with
+
+ with phase('plots'):
+     ...
+
+which costs one function call when instrumentation is off. report() collects everything as a
+dictionary, which write_report() saves as JSON and print_summary() prints as a table.
+
+Inside plotting.queued() the plotting functions only queue their plots, so their calls are
+reported as 'plotting.plotCPU (queued)' and so on, and the drawing of the queued plots at the
+end of the block is the 'draw plots' phase.
+"""
+
+from __future__ import division, print_function
+
+import functools
+import importlib
+import json
+import sys
+import timeit
+
+# Functions whose calls are timed (and counted), as (module, function)
+TIMED = [
+    ('configure', 'configure'),
+    ('cpu_model', 'run_cpu'),
+    ('data_model', 'run_storage'),
+    ('data_model', 'storage_capacity'),
+    ('data_model', 'storage_arrays'),
+    ('data_model', 'storage_result'),
+    ('event_model', 'event_model'),
+    ('plotting', '_pandas'),
+]
+
+# Plotting functions, timed as drawn or, inside plotting.queued(), as queued
+PLOTTED = [
+    ('plotting', 'plotCPU'),
+    ('plotting', 'plotEvents'),
+    ('plotting', 'plotStorage'),
+    ('plotting', 'plotStorageWithCapacity'),
+    ('plotting', 'plotTornado'),
+]
+
+# Functions whose calls are only counted, as (module, function)
+COUNTED = [
+    ('utils', 'time_dependent_value'),
+    ('utils', 'interpolate_value'),
+    ('performance', 'performance_by_year'),
+    ('configure', 'run_model'),
+    ('configure', 'in_shutdown'),
+    ('configure', 'mc_event_model'),
+]
+
+_enabled = False
+_start = None
+_patches = []  # (module, attribute, original)
+_times = {}
+_calls = {}
+
+
+def _record(name, seconds):
+    _times[name] = _times.get(name, 0.0) + seconds
+    _calls[name] = _calls.get(name, 0) + 1
+
+
+def _timed(name, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = timeit.default_timer()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _record(name, timeit.default_timer() - start)
+    return wrapper
+
+
+def _timed_plot(name, function):
+    plotting = importlib.import_module('plotting')
+    drawn = _timed(name, function)
+    queued = _timed(name + ' (queued)', function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if plotting.queueing():
+            return queued(*args, **kwargs)
+        return drawn(*args, **kwargs)
+    return wrapper
+
+
+def _counted(name, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        _calls[name] = _calls.get(name, 0) + 1
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def _patch(moduleName, functionName, wrap):
+    """
+    Replace a function by wrap(name, function) in its module and wherever else it was imported
+    """
+
+    original = getattr(importlib.import_module(moduleName), functionName)
+    wrapper = wrap(moduleName + '.' + functionName, original)
+    for module in list(sys.modules.values()):
+        namespace = getattr(module, '__dict__', None)  # python 2 keeps None for failed relative imports
+        if not namespace:
+            continue
+        for attribute, value in list(namespace.items()):
+            if value is original:
+                setattr(module, attribute, wrapper)
+                _patches.append((module, attribute, original))
+
+
+class _Phase(object):
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = timeit.default_timer()
+        return self
+
+    def __exit__(self, *args):
+        _record(self.name, timeit.default_timer() - self.start)
+
+
+class _NoPhase(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(name):
+    """
+    :param name: name of the phase in the report
+    :return: context manager timing the code it encloses, if instrumentation is enabled
+    """
+
+    if not _enabled:
+        return _NO_PHASE
+    return _Phase(name)
+
+
+def enabled():
+    return _enabled
+
+
+def enable():
+    """
+    Start timing and counting, forgetting anything measured before
+    """
+
+    global _enabled, _start
+    if _enabled:
+        disable()
+    _times.clear()
+    _calls.clear()
+    for moduleName, functionName in TIMED:
+        _patch(moduleName, functionName, _timed)
+    for moduleName, functionName in PLOTTED:
+        _patch(moduleName, functionName, _timed_plot)
+    for moduleName, functionName in COUNTED:
+        _patch(moduleName, functionName, _counted)
+    _enabled = True
+    _start = timeit.default_timer()
+
+
+def disable():
+    """
+    Put the original functions back. What was measured is kept for report()
+    """
+
+    global _enabled
+    for module, attribute, original in reversed(_patches):
+        setattr(module, attribute, original)
+    del _patches[:]
+    _enabled = False
+
+
+def report():
+    """
+    :return: dictionary of the time since enable(), the time and calls of each phase or timed
+             function, and the calls of each counted function
+    """
+
+    total = timeit.default_timer() - _start if _start is not None else 0.0
+    return {'total_seconds': total,
+            'phases': {name: {'seconds': seconds, 'calls': _calls.get(name, 0)} for name, seconds in _times.items()},
+            'calls': {name: calls for name, calls in _calls.items() if name not in _times}}
+
+
+def write_report(fileName, data=None):
+    with open(fileName, 'w') as reportFile:
+        json.dump(data or report(), reportFile, sort_keys=True, indent=1)
+
+
+def print_summary(data=None):
+    data = data or report()
+    print('\nPhase                                     Seconds    Calls')
+    for name, values in sorted(data['phases'].items(), key=lambda item: -item[1]['seconds']):
+        print('{:40s} {:8.3f} {:8d}'.format(name, values['seconds'], values['calls']))
+    print('{:40s} {:8.3f}'.format('total', data['total_seconds']))
+    print('\nFunction                                           Calls')
+    for name, calls in sorted(data['calls'].items()):
+        print('{:40s} {:15d}'.format(name, calls))
+
+
+def finish(fileName):
+    """
+    Stop measuring, write the report to fileName and print the summary
+    """
+
+    disable()
+    data = report()
+    write_report(fileName, data)
+    print_summary(data)
@@ -7,68 +7,163 @@ Common code between various models
 
 from __future__ import absolute_import, division, print_function
 
-from utils import interpolate_value
+from collections import OrderedDict
 
+from utils import interpolate_value, ramp_token, time_dependent_value
 
-def performance_by_year(model, year, tier, data_type=None, kind=None):
-    """
-    Return various performance metrics based on the year under consideration
-    (allows for step and continuous variations)
+# Number of models for which performance tables are kept
+TABLE_CACHE_SIZE = 16
 
-    :param model: The model parameters
+_tables = OrderedDict()
+
+
+def normalize_kind(year, kind=None):
+    """
     :param year: The year in which processing is done
-    :param tier: Data tier produced
-    :param data_type: data or mc
     :param kind: The year flavor of MC or data. May differ from actual running year
-
-    :return:  tuple of cpu time (HS06 * s) and data size
+    :return: the flavor ('2017', '2021' or '2026') whose performance is used
     """
 
     # If we don't specify flavors, assume we are talking about the current year
 
     # TODO:  Big old hack for now because we don't have "kind" for data
     if not kind:
-        # print year
         kind = str(year)
-    #print(year)
     if kind not in ['2017', '2026']:
         if int(kind) >= 2025:
             kind = '2026'
         else:
-#            if int(kind) >= 2020:
-#                kind = '2021'
-#            else:
             kind = '2017'
 
-# it gets worse - there is run 3
+    # it gets worse - there is run 3
     if kind == '2017' and year > 2020:
-        kind='2021'
+        kind = '2021'
+
+    return str(kind)
+
+
+class PerformanceTable(object):
+    """
+    Performance lookups for one model.
 
+    The cumulative product of the software improvements is kept per kind, so that each year costs
+    one multiplication once, and the per event sizes and CPU times are kept per (tier, data_type,
+    kind). Every entry remembers the configuration values it was built from (see utils.ramp_token)
+    and is rebuilt only when those change.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self._sizes = {}
+        self._cpuTimes = {}
+        self._improvements = {}
+
+    def size_per_event(self, tier, kind):
+        try:
+            values = self.model['tier_sizes'][tier]
+        except KeyError:  # Storage model does not know this tier
+            return None
+
+        entry = self._sizes.get((tier, kind))
+        token = ramp_token(values)
+        if entry is None or entry[0] != token:
+            entry = (token, time_dependent_value(int(kind), values)[0])
+            self._sizes[(tier, kind)] = entry
+        return entry[1]
+
+    def cpu_per_event(self, tier, data_type, kind):
+        """
+        :return: CPU time per event before any software improvement
+        """
+
+        try:
+            values = self.model['cpu_time'][data_type][tier]
+        except KeyError:  # CPU model does not know this tier
+            return None
+
+        entry = self._cpuTimes.get((tier, data_type, kind))
+        token = ramp_token(values)
+        if entry is None or entry[0] != token:
+            entry = (token, time_dependent_value(int(kind), values)[0])
+            self._cpuTimes[(tier, data_type, kind)] = entry
+        return entry[1]
+
+    def improvement(self, kind, year):
+        """
+        :return: product of the software improvement factors for kind from start_year to year
+        """
+
+        try:
+            ramp = self.model['improvement_factors']['software_by_kind'][kind]
+        except KeyError:
+            return None
+
+        startYear = int(self.model['start_year'])
+        entry = self._improvements.get(kind)
+        token = (startYear, ramp_token(ramp))
+        if entry is None or entry[0] != token:
+            entry = (token, [])
+            self._improvements[kind] = entry
+
+        cumulative = entry[1]
+        year = int(year)
+        if year < startYear:
+            return 1.0
+        try:
+            while len(cumulative) <= year - startYear:
+                previous = cumulative[-1] if cumulative else 1.0
+                cumulative.append(previous * interpolate_value(ramp, startYear + len(cumulative)))
+        except KeyError:  # No improvement factor for this year
+            return None
+        return cumulative[year - startYear]
+
+    def lookup(self, year, tier, data_type=None, kind=None):
+        """
+        :return: tuple of cpu time (HS06 * s) and data size, as performance_by_year
+        """
+
+        kind = normalize_kind(year, kind)
+        sizePerEvent = self.size_per_event(tier, kind)
+
+        cpuPerEvent = self.cpu_per_event(tier, data_type, kind)
+        if cpuPerEvent is not None:
+            improvement_factor = self.improvement(kind, year)
+            if improvement_factor is None:
+                cpuPerEvent = None
+            else:
+                cpuPerEvent = cpuPerEvent / improvement_factor
+
+        return cpuPerEvent, sizePerEvent
+
+
+def performance_table(model):
+    """
+    :param model: The model parameters
+    :return: the PerformanceTable of the model, kept between calls
+    """
 
-    kind = str(kind)
+    key = id(model)
+    table = _tables.pop(key, None)
+    if table is None or table.model is not model:
+        table = PerformanceTable(model)
+    _tables[key] = table
+    while len(_tables) > TABLE_CACHE_SIZE:
+        _tables.popitem(last=False)
+    return table
 
-    try:
-        for modelYear in sorted(model['tier_sizes'][tier].keys()):
-            if int(kind) >= int(modelYear):
-                sizePerEvent = model['tier_sizes'][tier][modelYear]
-    except KeyError:  # Storage model does not know this tier
-        sizePerEvent = None
 
-    try:
-        # Look up the normalized processing time
-        for modelYear in sorted(model['cpu_time'][data_type][tier].keys()):
-            if int(kind) >= int(modelYear):
-                cpuPerEvent = model['cpu_time'][data_type][tier][modelYear]
+def performance_by_year(model, year, tier, data_type=None, kind=None):
+    """
+    Return various performance metrics based on the year under consideration
+    (allows for step and continuous variations)
 
-        # Apply the year by year correction
-        improvement_factor = 1.0
-        ramp = model['improvement_factors']['software_by_kind'][kind]
-        for improve_year in range(int(model['start_year']), int(year) + 1):
-            year_factor = interpolate_value(ramp, improve_year)
-            improvement_factor *= year_factor
+    :param model: The model parameters
+    :param year: The year in which processing is done
+    :param tier: Data tier produced
+    :param data_type: data or mc
+    :param kind: The year flavor of MC or data. May differ from actual running year
 
-        cpuPerEvent = cpuPerEvent / improvement_factor
-    except KeyError:  # CPU model does not know this tier
-        cpuPerEvent = None
+    :return:  tuple of cpu time (HS06 * s) and data size
+    """
 
-    return cpuPerEvent, sizePerEvent
+    return performance_table(model).lookup(year, tier, data_type=data_type, kind=kind)
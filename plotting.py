@@ -6,32 +6,219 @@ Common plotting code
 """
 
 from __future__ import absolute_import, division, print_function
-from matplotlib import cm
 
-import pandas as pd
+import contextlib
+import functools
+import multiprocessing
+import os
+import sys
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import instrument
 
 # Make sort order that includes tiers from unrefined to refined and both string and integer years
 SORT_ORDER = ['Run1 & 2015', 'Ops space', 'RAW', 'GENSIM', 'AOD', 'MINIAOD', 'NANOAOD', 'USER'] + \
              [str(year) for year in range(2006, 2050)] + list(range(2006, 2050))
+SORT_RANK = {key: rank for rank, key in enumerate(SORT_ORDER)}
 
-cmap=cm.get_cmap('Paired')
-colors=[ cmap(i) for i in range(0,10)]
 COLOR_MAP = 'Paired'
 
+CPU_COLUMNS = ['Prompt Data', 'Non-Prompt Data', 'LHC MC', 'HL-LHC MC', 'Analysis']
+
+
+def _pandas():
+    """
+    Import pandas (and with it matplotlib) only once a figure is made, so that runs without plots
+    do not pay for it. Without a display, use a backend that only writes files.
+
+    :return: the pandas module
+    """
+
+    import matplotlib
+    if ('matplotlib.pyplot' not in sys.modules and
+            not os.environ.get('DISPLAY') and not os.environ.get('MPLBACKEND')):
+        matplotlib.use('Agg')
+    import pandas
+    return pandas
+
+
+_colorList = []
+_figures = {}  # Figures kept for reuse, by size
+_plots = {}  # The plotting functions by name, as they draw (see queued)
+_queue = None
+
+
+def _colors():
+    if not _colorList:
+        from matplotlib import cm
+
+        cmap=cm.get_cmap(COLOR_MAP)
+        _colorList.extend([ cmap(i) for i in range(0,10)])
+    return _colorList
+
+
+def _axes(figsize=None):
+    """
+    :return: empty axes on a figure of the given size (default from rcParams), which is reused from plot to plot
+    """
+
+    _pandas()
+    import matplotlib.pyplot as plt
+    from matplotlib.figure import SubplotParams
+
+    figsize = tuple(figsize or plt.rcParams['figure.figsize'])
+    fig = _figures.get(figsize)
+    if fig is None:
+        fig = _figures[figsize] = plt.figure(figsize=figsize)
+    else:
+        fig.clf()
+        fig.subplotpars = SubplotParams()  # Undo tight_layout
+    return fig.add_subplot(111)
+
+
+def _reverseLegend(ax):
+    handles, labels = ax.get_legend_handles_labels()
+    ax.legend(handles[::-1], labels[::-1], loc='best', markerscale=0.25, fontsize=11)
+
+
+class PlotQueue(object):
+    """
+    Plots waiting to be drawn, as (directory, function name, args, kwargs)
+    """
+
+    def __init__(self):
+        self.jobs = []
+
+    def add(self, name, args, kwargs):
+        self.jobs.append((os.getcwd(), name, args, kwargs))
+
+    def render(self, processes=None, output=None):
+        """
+        Draw the plots in a pool of processes (in this process if processes is 1), printing what
+        they print in the order they were queued
+
+        :param processes: number of worker processes (default is the number of cores)
+        :param output: file for what the plots print, default is the standard output
+        """
+
+        jobs, self.jobs = self.jobs, []
+        processes = min(processes or multiprocessing.cpu_count(), len(jobs))
+        if processes <= 1:
+            outputs = [_render(job) for job in jobs]
+        else:
+            sys.stdout.flush()
+            pool = multiprocessing.Pool(processes, initializer=_initRenderer)
+            try:
+                outputs = pool.map(_render, jobs, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        for text in outputs:
+            (output or sys.stdout).write(text)
+
+
+def _initRenderer():
+    """
+    Set up a worker process: draw to files only and make the templates once
+    """
+
+    global _queue
+    _queue = None
+    import matplotlib
+    if 'matplotlib.pyplot' not in sys.modules:
+        matplotlib.use('Agg')
+    _pandas()
+    _colors()
+    _axes()
+
+
+def _render(job):
+    """
+    Draw one queued plot
+
+    :return: what the plotting function printed
+    """
+
+    directory, name, args, kwargs = job
+    stdout, output = sys.stdout, StringIO()
+    cwd = os.getcwd()
+    sys.stdout = output
+    try:
+        os.chdir(directory)
+        _plots[name](*args, **kwargs)
+    finally:
+        sys.stdout = stdout
+        os.chdir(cwd)
+    return output.getvalue()
+
+
+def queueable(function):
+    """
+    Decorate a plotting function so that, inside queued(), calling it only queues the plot
+    """
+
+    _plots[function.__name__] = function
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _queue is not None:
+            _queue.add(function.__name__, args, kwargs)
+            return None
+        return function(*args, **kwargs)
+    return wrapper
+
+
+@contextlib.contextmanager
+def queued(processes=None, output=None):
+    """
+    Collect the plots made inside the with block and draw them all in parallel at its end
+
+     with queued():
+         plotCPU(...)
+         plotStorage(...)
+
+    :param processes: number of worker processes (default is the number of cores, 1 draws in this process)
+    :param output: file for what the plots print, default is the standard output
+    """
 
+    global _queue
+    if _queue is not None:  # Already queueing, the outer block draws
+        yield _queue
+        return
+
+    _queue = PlotQueue()
+    try:
+        yield _queue
+        queue = _queue
+    finally:
+        _queue = None
+    with instrument.phase('draw plots'):
+        queue.render(processes, output)
+
+
+def queueing():
+    """
+    :return: True inside queued(), where the plotting functions only queue their plots
+    """
+
+    return _queue is not None
+
+
+@queueable
 def plotStorageWithCapacity(data, name, title='', columns=None, bars=None,maximum=None,minYear=None):
-    bars = sorted(bars, key=SORT_ORDER.index)
+    bars = sorted(bars, key=SORT_RANK.__getitem__)
+    pd = _pandas()
     frame = pd.DataFrame(data, columns=columns)
     # ax = frame[['Capacity', 'Year']].plot(x='Year', linestyle='-', marker='o', color='Black')
     # ax = frame[bars + ['Year']].plot(x='Year', kind='bar', stacked=True, ax=ax, colormap=COLOR_MAP)
-    ax = frame[bars + ['Year']].plot(x='Year', kind='bar', stacked=True, colormap=COLOR_MAP)
+    ax = frame[bars + ['Year']].plot(x='Year', kind='bar', stacked=True, colormap=COLOR_MAP, ax=_axes())
     ax.set(ylabel='PB', title=title)
 
-    handles, labels = ax.get_legend_handles_labels()
-    handles=handles[::-1]
-    labels=labels[::-1]
-
-    ax.legend(handles,labels,loc='best', markerscale=0.25, fontsize=11)
+    _reverseLegend(ax)
     ax.set_ylim(ymax=maximum)
     ax.set_xlim(xmin=minYear)
 
@@ -42,21 +229,20 @@ def plotStorageWithCapacity(data, name, title='', columns=None, bars=None,maximu
     fig.savefig(name)
 
 
+@queueable
 def plotStorage(data, name, title='', columns=None, index=None, maximum=None, minYear=None):
     # Make the plot of produced data per year (input to other plots)
-    plot_order = sorted(columns, key=SORT_ORDER.index)
-    order_inds = [ SORT_ORDER.index(p) for p in plot_order]
+    plot_order = sorted(columns, key=SORT_RANK.__getitem__)
+    order_inds = [ SORT_RANK[p] for p in plot_order]
     print("min Year",minYear)
+    pd = _pandas()
+    colors = _colors()
     frame = pd.DataFrame(data, columns=columns, index=index)
 #    ax = frame[plot_order].plot(kind='bar', stacked=True, colormap=COLOR_MAP)
-    ax = frame[plot_order].plot(kind='bar', stacked=True, color=[colors[i] for i in order_inds])
+    ax = frame[plot_order].plot(kind='bar', stacked=True, color=[colors[i] for i in order_inds], ax=_axes())
     ax.set(ylabel='PB', title=title)
 
-    handles, labels = ax.get_legend_handles_labels()
-    handles=handles[::-1]
-    labels=labels[::-1]
-
-    ax.legend(handles,labels,loc='best', markerscale=0.25, fontsize=11)
+    _reverseLegend(ax)
     ax.set_ylim(ymax=maximum)
     ax.set_xlim(xmin=minYear)
 
@@ -69,12 +255,13 @@ def plotStorage(data, name, title='', columns=None, index=None, maximum=None, mi
     fig.savefig(name)
 
 
+@queueable
 def plotEvents(data, name, title='', columns=None, index=None, maximum=None,minYear=None):
     # Make the plot of produced events per year by type (input to other plots)
     plot_order = sorted(columns)
-    order_inds = [ SORT_ORDER.index(p) for p in plot_order]
+    pd = _pandas()
     frame = pd.DataFrame(data, columns=columns, index=index)
-    ax = frame[plot_order].plot(kind='bar', stacked=True, colormap=COLOR_MAP)
+    ax = frame[plot_order].plot(kind='bar', stacked=True, colormap=COLOR_MAP, ax=_axes())
     ax.set(ylabel='Billions of events', title=title)
     ax.set_ylim(ymax=maximum)
     ax.set_xlim(xmin=minYear)
@@ -83,3 +270,89 @@ def plotEvents(data, name, title='', columns=None, index=None, maximum=None,minY
         tick.set_rotation(45)
     fig = ax.get_figure()
     fig.savefig(name)
+
+
+@queueable
+def plotTornado(values, labels, name, title='', xlabel='Elasticity'):
+    """
+    Horizontal bars of the effect of each parameter, the largest at the top
+
+    :param values: list of the effect of each parameter, largest first
+    :param labels: list of the parameter names
+    """
+
+    pd = _pandas()
+    colors = _colors()
+    frame = pd.Series(list(values)[::-1], index=list(labels)[::-1])
+    ax = frame.plot(kind='barh', color=[colors[1] if value >= 0 else colors[5] for value in frame],
+                    ax=_axes(figsize=(8, 2 + 0.3 * len(frame))))
+    ax.axvline(0, color='Black', linewidth=0.8)
+    ax.set(xlabel=xlabel, title=title)
+
+    fig = ax.get_figure()
+    fig.tight_layout()
+    fig.savefig(name)
+
+
+@queueable
+def plotCPU(data, name, title='', ylabel='', years=None, maximum=None, minYear=None, capacities=None):
+    """
+    Stacked bars of CPU by type, optionally with capacity curves drawn on top
+
+    :param data: dictionary of {column: list of values by year} for the columns in CPU_COLUMNS
+    :param capacities: list of (label, list of values by year, color) drawn as lines
+    """
+
+    frameData = {'Year': [str(year) for year in years]}
+    frameData.update(data)
+    for label, values, color in capacities or []:
+        frameData[label] = values
+    pd = _pandas()
+    frame = pd.DataFrame(frameData)
+
+    ax = _axes()
+    for label, values, color in capacities or []:
+        ax = frame[['Year', label]].plot(x='Year', linestyle='-', marker='o', color=color, ax=ax)
+    ax = frame[['Year'] + CPU_COLUMNS].plot(x='Year', kind='bar', stacked=True, ax=ax, colormap=COLOR_MAP)
+    ax.set(ylabel=ylabel)
+    ax.set(title=title)
+
+    _reverseLegend(ax)
+    ax.set_ylim(ymax=maximum)
+    ax.set_xlim(xmin=minYear)
+
+    fig = ax.get_figure()
+    fig.tight_layout()
+    fig.savefig(name)
+
+
+@queueable
+def plotBands(years, percentiles, bands, name, title='', ylabel='', capacity=None, minYear=None):
+    """
+    Percentile bands of a quantity by year, the outer percentiles paired with the inner ones,
+    optionally with the capacity drawn on top
+
+    :param years: list of years
+    :param percentiles: list of percentiles in increasing order
+    :param bands: list of the values by year for each of the percentiles
+    :param capacity: list of the capacity by year
+    """
+
+    colors = _colors()
+    ax = _axes()
+    n = len(percentiles)
+    for i in range(n // 2):
+        ax.fill_between(years, bands[i], bands[n - 1 - i], color=colors[0], alpha=0.4 + 0.6 * i / max(1, n // 2),
+                        linewidth=0, label='%g-%g%%' % (percentiles[i], percentiles[n - 1 - i]))
+    if n % 2:
+        ax.plot(years, bands[n // 2], color=colors[1], marker='o', label='%g%%' % percentiles[n // 2])
+    if capacity is not None:
+        ax.plot(years, capacity, color='Black', linestyle='-', marker='o', label='Capacity')
+    ax.set(ylabel=ylabel, title=title)
+
+    _reverseLegend(ax)
+    ax.set_xlim(xmin=minYear)
+
+    fig = ax.get_figure()
+    fig.tight_layout()
+    fig.savefig(name)
@@ -0,0 +1,253 @@
+#! /usr/bin/env python
+
+"""
+Usage: ./purchase_plan.py [--flat] [--headroom 0.0] [--resources cpu,disk,tape] [--output plan.json]
+                          config1.json,config2.json,...,configN.json
+
+Smallest yearly purchases of CPU, disk and tape for which the capacity covers the total
+required (the Ratio of cpu.py is at most 1) in every year.
+
+In the capacity model of capacity.py, the capacity of a year is what is left of the start
+capacity plus what was bought in that year and in the lifetime - 1 years before. A
+PurchaseModel keeps the first as an array [year] and the second as a matrix [year, year
+bought], so that the capacity of any number of purchase plans, arrays [..., year], is one
+matrix product (plan_capacity). Two plans are solved for:
+
+ just in time  what is missing is bought in the year it is needed. A later purchase is retired
+               later and, with the improvement factors, costs less, so no plan covering every
+               year buys less or costs less.
+ flat (--flat) one delta bought from the start year of the capacity model, improved every year
+               by the improvement factor as the deltas of capacity_model are. The capacity is
+               linear in the delta, so the smallest one is the largest ratio of the missing
+               capacity to the capacity bought with a delta of 1.
+
+The cost of a purchase is the capacity divided by the improvement factor to the power of the
+years since the start year of the capacity model, so it is in the units of a delta in that
+year. The capacity up to that year is known and is only reported. --headroom asks for that
+fraction of capacity more than required, so that the Ratio is at most 1 / (1 + headroom).
+The purchases are printed and written with --output as a configuration file with the
+capacity_model deltas of every year, to add after the scenario's files. The capacity model adds
+the deltas up in another order than plan_capacity, so the purchases are raised by the last bit
+where its capacity (overlay_capacity) would round below the requirement.
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import json
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from capacity import RESOURCES, capacity_curves, resource_spec
+from configure import configure, model_names_from_args
+from cpu_model import mega, run_cpu
+from data_model import PETA, run_storage
+
+UNITS = {'cpu': (mega, 'MHS06'), 'disk': (PETA, 'PB'), 'tape': (PETA, 'PB')}
+TITLES = {'cpu': 'CPU', 'disk': 'Disk', 'tape': 'Tape'}
+
+# base: capacity [year] without purchases after startYear. window: [year, year bought], 1 while a purchase is used
+PurchaseModel = namedtuple('PurchaseModel', 'spec, years, base, window')
+# delta is the flat delta, or None for the just in time plan
+PurchasePlan = namedtuple('PurchasePlan', 'resource, spec, years, required, capacity, bought, cost, delta')
+
+
+def purchase_model(spec, YEARS):
+    """
+    :param spec: CapacitySpec with a lifetime
+    :param YEARS: list of consecutive years
+    :return: PurchaseModel for the years from the start year of spec (or YEARS) to the last of YEARS
+    """
+
+    years = np.arange(min(YEARS[0], spec.startYear), YEARS[-1] + 1)
+    base = capacity_curves([spec._replace(deltas={str(spec.startYear): 0.0})], years)[0]
+    held = years[:, None] - years[None, :]
+    window = ((held >= 0) & (held < spec.lifetime) & (years[None, :] > spec.startYear)).astype(float)
+    return PurchaseModel(spec=spec, years=years, base=base, window=window)
+
+
+def plan_capacity(purchaseModel, bought):
+    """
+    :param purchaseModel: PurchaseModel
+    :param bought: array [..., year] of the capacity bought in each year of purchaseModel.years
+    :return: array [..., year] of the capacity, NaN before the start year
+    """
+
+    return purchaseModel.base + np.asarray(bought).dot(purchaseModel.window.T)
+
+
+def overlay_capacity(purchaseModel, bought):
+    """
+    :param purchaseModel: PurchaseModel
+    :param bought: array [year] of the capacity bought in each year of purchaseModel.years
+    :return: array [year] of the capacity as the capacity model evaluates the deltas written by plan_overlay,
+             which can differ from plan_capacity in the last bit as it adds up in another order
+    """
+
+    spec = purchaseModel.spec
+    after = purchaseModel.years > spec.startYear
+    deltas = {str(year): float(value) for year, value in zip(purchaseModel.years[after], np.asarray(bought)[after])}
+    return capacity_curves([spec._replace(deltas=deltas or {str(spec.startYear): 0.0})], purchaseModel.years)[0]
+
+
+def cover(purchaseModel, bought, required):
+    """
+    Raise the purchases by the last bits that overlay_capacity may be short of required
+
+    :return: array [year] of the capacity bought
+    """
+
+    after = purchaseModel.years > purchaseModel.spec.startYear
+    while True:
+        capacity = overlay_capacity(purchaseModel, bought)
+        short = np.nonzero(after & (capacity < required))[0]
+        if not len(short):
+            return bought
+        t = short[0]
+        bought[t] = np.nextafter(bought[t] + (required[t] - capacity[t]), np.inf)
+
+
+def prices(purchaseModel):
+    """
+    :return: array [year] of the cost of buying a unit of capacity in each year
+    """
+
+    spec = purchaseModel.spec
+    return np.array([spec.factor ** -int(year - spec.startYear) for year in purchaseModel.years])
+
+
+def just_in_time(purchaseModel, required):
+    """
+    :param purchaseModel: PurchaseModel
+    :param required: array [year] of the capacity required in each year of purchaseModel.years
+    :return: array [year] of the capacity bought, covering required as the capacity model evaluates it
+    """
+
+    bought = np.zeros(len(purchaseModel.years))
+    for t in np.nonzero(purchaseModel.years > purchaseModel.spec.startYear)[0]:
+        have = purchaseModel.base[t] + purchaseModel.window[t].dot(bought)
+        bought[t] = max(0.0, required[t] - have)
+    return cover(purchaseModel, bought, required)
+
+
+def flat_delta(purchaseModel, required):
+    """
+    :param purchaseModel: PurchaseModel
+    :param required: array [year] of the capacity required in each year of purchaseModel.years
+    :return: the smallest delta from the start year which covers required as the capacity model evaluates it, and
+             array [year] of the capacity bought
+    """
+
+    after = purchaseModel.years > purchaseModel.spec.startYear
+    improved = np.where(after, 1 / prices(purchaseModel), 0.0)
+    if not after.any():
+        return 0.0, improved
+
+    perDelta = improved.dot(purchaseModel.window.T)[after]
+    delta = max(0.0, np.max((required[after] - purchaseModel.base[after]) / perDelta))
+
+    # The division and the capacity model can round down by the last bit
+    while (overlay_capacity(purchaseModel, delta * improved)[after] < required[after]).any():
+        delta = np.nextafter(delta, np.inf)
+    return float(delta), delta * improved
+
+
+def requirements(model):
+    """
+    :param model: The configuration dictionary
+    :return: list of the years and dictionary of arrays [year] of the CPU (HS06), disk and tape (bytes) required
+    """
+
+    cpuResult = run_cpu(model)
+    storageResult = run_storage(model)
+    YEARS = storageResult.years
+    return YEARS, {'cpu': np.array([cpuResult.total_cpu_required[year] for year in YEARS]),
+                   'disk': np.array(storageResult.cube.total('disk')),
+                   'tape': np.array(storageResult.cube.total('tape_unfilled'))}
+
+
+def purchase_plans(model, resources=RESOURCES, flat=False, headroom=0.0):
+    """
+    :param model: The configuration dictionary
+    :param resources: list of resources ('cpu', 'disk' or 'tape')
+    :param flat: solve for the flat delta instead of the just in time purchases
+    :param headroom: fraction of capacity to have on top of the requirement
+    :return: list of PurchasePlan, one per resource, over the years of the model
+    """
+
+    YEARS, totals = requirements(model)
+    plans = []
+    for resource in resources:
+        spec = resource_spec(model, resource)
+        purchaseModel = purchase_model(spec, YEARS)
+        inYears = (purchaseModel.years >= YEARS[0])
+        required = np.zeros(len(purchaseModel.years))
+        required[inYears] = totals[resource]
+
+        if flat:
+            delta, bought = flat_delta(purchaseModel, required * (1 + headroom))
+        else:
+            delta, bought = None, just_in_time(purchaseModel, required * (1 + headroom))
+        plans.append(PurchasePlan(resource=resource, spec=spec, years=YEARS, required=required[inYears],
+                                  capacity=overlay_capacity(purchaseModel, bought)[inYears], bought=bought[inYears],
+                                  cost=(bought * prices(purchaseModel))[inYears], delta=delta))
+    return plans
+
+
+def plan_overlay(plans):
+    """
+    :param plans: list of PurchasePlan
+    :return: configuration dictionary setting the capacity_model deltas to the purchases of every year
+    """
+
+    capacityModel = {}
+    for plan in plans:
+        bought = dict(zip(plan.years, plan.bought.tolist()))
+        capacityModel[plan.resource + '_delta'] = {str(year): bought.get(year, 0.0) for year in
+                                                   range(plan.spec.startYear + 1, plan.years[-1] + 1)}
+    return {'capacity_model': capacityModel}
+
+
+def print_plans(plans):
+    for plan in plans:
+        unit, unitName = UNITS[plan.resource]
+        if plan.delta is None:
+            print('%s purchases in %s, just in time' % (TITLES[plan.resource], unitName))
+        else:
+            print('%s purchases in %s, flat delta of %.3f from %d' %
+                  (TITLES[plan.resource], unitName, plan.delta / unit, plan.spec.startYear))
+        print('Year Required Capacity Bought Cost Ratio')
+        for y, year in enumerate(plan.years):
+            print(year, ' '.join('{:.3f}'.format(value / unit) for value in
+                                 [plan.required[y], plan.capacity[y], plan.bought[y], plan.cost[y]]),
+                  '{:.3f}'.format(plan.required[y] / plan.capacity[y]))
+        print('Total bought {:.3f}, cost {:.3f} in {:d} {}'.format(plan.bought.sum() / unit, plan.cost.sum() / unit,
+                                                                   plan.spec.startYear, unitName))
+        print()
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Smallest purchases for which the capacity covers the requirements')
+    parser.add_argument('models', nargs='*', help='comma separated list of configuration files')
+    parser.add_argument('--flat', action='store_true', help='solve for one delta instead of the yearly purchases')
+    parser.add_argument('--headroom', type=float, default=0.0, help='fraction of capacity on top of the requirement')
+    parser.add_argument('--resources', default=','.join(RESOURCES), help='comma separated list of cpu, disk and tape')
+    parser.add_argument('--output', default=None, help='write the purchases as a configuration file')
+    options = parser.parse_args(args)
+
+    resources = options.resources.split(',')
+    if set(resources) - set(RESOURCES):
+        parser.error('--resources must be some of ' + ', '.join(RESOURCES))
+
+    model = configure(model_names_from_args(options.models))
+    plans = purchase_plans(model, resources, flat=options.flat, headroom=options.headroom)
+    print_plans(plans)
+    if options.output:
+        with open(options.output, 'w') as planFile:
+            json.dump(plan_overlay(plans), planFile, indent=1, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,173 @@
+#! /usr/bin/env python
+
+"""
+Columnar output of the disk and tape samples.
+
+Every sample is one row with the fields in SAMPLE_FIELDS: the year the storage is evaluated
+for, the year the data was produced, the data type ('data', 'mc' or 'Other' for the static
+disk and tape), the tier, the bytes stored and the number of copies (versions * replicas, NaN
+for the static disk and tape).
+
+The rows are written year by year as run_storage computes them (see data_model.py), either as
+CSV (gzipped if the file name ends in .gz) or as a .npy file of a structured array, whose
+header is rewritten with the final length when the file is closed. load_samples reads either
+back as a structured array, memory mapping .npy files.
+"""
+
+from __future__ import division, print_function
+
+import csv
+import gzip
+import sys
+
+import numpy as np
+
+SAMPLE_FIELDS = ['year', 'producedYear', 'dataType', 'tier', 'bytes', 'revisions']
+SAMPLE_FORMATS = ['json', 'csv', 'csv.gz', 'npy']
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+NPY_ALIGNMENT = 64
+NPY_MAX_LENGTH = 10 ** 15
+
+
+def sample_dtype(tiers, dataTypes=('data', 'mc', 'Other')):
+    """
+    :param tiers: all the tier names which may appear in the samples
+    :param dataTypes: all the data types which may appear in the samples
+    :return: numpy dtype of one sample
+    """
+
+    return np.dtype([('year', '<i4'), ('producedYear', '<i4'),
+                     ('dataType', 'S%d' % max([len(dataType) for dataType in dataTypes] + [1])),
+                     ('tier', 'S%d' % max([len(tier) for tier in tiers] + [1])),
+                     ('bytes', '<f8'), ('revisions', '<f8')])
+
+
+def sample_rows(year, samples):
+    """
+    :param year: the year the samples are for
+    :param samples: list of [producedYear, dataType, tier, bytes(, revisions)] as in StorageResult.diskSamples
+    :return: list of tuples with the fields in SAMPLE_FIELDS
+    """
+
+    rows = []
+    for sample in samples:
+        revisions = sample[4] if len(sample) > 4 else float('nan')
+        rows.append((int(year), int(sample[0]), sample[1], sample[2], float(sample[3]), float(revisions)))
+    return rows
+
+
+def _open_csv(fileName, mode):
+    """
+    Open a (gzipped) CSV file for the csv module in python 2 and 3. mode is 'r' or 'w'
+    """
+
+    opener = gzip.open if fileName.endswith('.gz') else open
+    if sys.version_info[0] < 3:
+        return opener(fileName, mode + 'b')
+    return opener(fileName, mode + 't', newline='')
+
+
+class CsvSampleWriter(object):
+    """
+    Write samples to a CSV file, gzipped if the name ends in .gz
+    """
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+        self.file = _open_csv(fileName, 'w')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(SAMPLE_FIELDS)
+
+    def write(self, year, samples):
+        self.writer.writerows(sample_rows(year, samples))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _npy_header(dtype, length, size=None):
+    """
+    :param dtype: dtype of the array
+    :param length: number of rows in the array
+    :param size: pad the header with spaces to this many bytes
+    :return: version 1.0 .npy header, padded to a multiple of NPY_ALIGNMENT bytes if size is not given
+    """
+
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (
+        np.lib.format.dtype_to_descr(dtype), length)
+    header = header.encode('latin1')
+    if size is None:
+        size = len(NPY_MAGIC) + 2 + len(header) + 1
+        size += -size % NPY_ALIGNMENT
+    padding = size - len(NPY_MAGIC) - 2 - len(header) - 1
+    return NPY_MAGIC + np.array(size - len(NPY_MAGIC) - 2, dtype='<u2').tobytes() + header + b' ' * padding + b'\n'
+
+
+class NpySampleWriter(object):
+    """
+    Write samples to a .npy file of a structured array, which np.load can memory map
+    """
+
+    def __init__(self, fileName, dtype):
+        self.fileName = fileName
+        self.dtype = dtype
+        self.length = 0
+        # Leave room for a header with the longest length we may write
+        self.headerSize = len(_npy_header(dtype, NPY_MAX_LENGTH))
+        self.file = open(fileName, 'wb')
+        self.file.write(_npy_header(dtype, 0, self.headerSize))
+
+    def write(self, year, samples):
+        rows = np.array(sample_rows(year, samples), dtype=self.dtype)
+        self.file.write(rows.tobytes())
+        self.length += len(rows)
+
+    def close(self):
+        self.file.seek(0)
+        self.file.write(_npy_header(self.dtype, self.length, self.headerSize))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def sample_writer(fileName, tiers):
+    """
+    :param fileName: name of the file, ending in .csv, .csv.gz or .npy
+    :param tiers: all the tier names which may appear in the samples
+    :return: a writer for that file, with write(year, samples) and close()
+    """
+
+    if fileName.endswith('.npy'):
+        return NpySampleWriter(fileName, sample_dtype(tiers))
+    if fileName.endswith('.csv') or fileName.endswith('.csv.gz'):
+        return CsvSampleWriter(fileName)
+    raise ValueError('Unknown format for samples file %s' % fileName)
+
+
+def load_samples(fileName):
+    """
+    :param fileName: a file written by one of the sample writers
+    :return: structured array with the fields in SAMPLE_FIELDS, memory mapped for .npy files
+    """
+
+    if fileName.endswith('.npy'):
+        return np.load(fileName, mmap_mode='r')
+
+    with _open_csv(fileName, 'r') as csvFile:
+        reader = csv.reader(csvFile)
+        next(reader)  # Header
+        rows = [(int(year), int(producedYear), dataType, tier, float(size), float(revisions))
+                for year, producedYear, dataType, tier, size, revisions in reader]
+    dtype = sample_dtype([row[3] for row in rows], [row[2] for row in rows])
+    return np.array(rows, dtype=dtype)
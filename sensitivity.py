@@ -0,0 +1,242 @@
+#! /usr/bin/env python
+
+"""
+Usage: ./sensitivity.py [--step 0.01] [--processes N] [--year 2026] [--top 20] [--output table.csv] [--no-plots]
+                        config1.json,config2.json,...,configN.json
+
+Sensitivity of the total CPU, disk and tape to every numeric value of the merged model.
+
+Each numeric value (including the entries of the year ramps and of the replica lists) is in
+turn scaled by 1 + step and the CPU and storage models are evaluated again. The elasticity
+
+ (change in total / total) / step
+
+is computed for every year for the total CPU required (HS06), disk (PB) and tape (PB). Years,
+lifetimes, plot settings and values equal to zero are not perturbed.
+
+The perturbations are split between worker processes. Each of them keeps an
+incremental.Evaluator, so that a perturbation only recomputes the stages which read the value
+changed. The elasticities are printed as a table (or written as CSV with --output) and the
+largest ones in one year are drawn as a tornado chart for each of CPU, disk and tape.
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import csv
+import multiprocessing
+import numbers
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from configure import configure, model_names_from_args, png_key_name
+from incremental import STAGE_KEYS, Evaluator
+from sweep import scenario_table
+
+QUANTITIES = ['cpu_required', 'disk', 'tape']
+QUANTITY_TITLES = {'cpu_required': 'CPU', 'disk': 'Disk', 'tape': 'Tape'}
+
+# Values which are years, lifetimes in years or lists of years, and so are not perturbed
+DISCRETE_KEYS = [
+    ('start_year',),
+    ('end_year',),
+    ('hl_start_year',),
+    ('first_year_to_spread_rereco_over_two_years',),
+    ('shutdown_years',),
+    ('new_detector_years',),
+    ('AnalysisSet',),
+    ('capacity_model', 'cpu_year'),
+    ('capacity_model', 'disk_year'),
+    ('capacity_model', 'tape_year'),
+    ('capacity_model', 'cpu_lifetime'),
+    ('capacity_model', 'disk_lifetime'),
+    ('capacity_model', 'tape_lifetime'),
+]
+
+Sensitivity = namedtuple('Sensitivity', 'parameters, years, base, elasticities')
+
+_model = None
+_evaluator = None
+
+
+def numeric_parameters(model, path=()):
+    """
+    :param model: The configuration dictionary (or a part of it)
+    :return: list of the paths (tuples of keys and list indices) of the numeric values which can be perturbed
+    """
+
+    if path[:1] and (any(path[:len(prefix)] == prefix for prefix in DISCRETE_KEYS) or
+                     any(path[:len(prefix)] == prefix for prefix, stage in STAGE_KEYS if stage is None)):
+        return []
+
+    if isinstance(model, dict):
+        items = sorted(model.items(), key=lambda item: str(item[0]))
+    elif isinstance(model, list):
+        items = enumerate(model)
+    elif isinstance(model, numbers.Real) and not isinstance(model, bool) and model != 0:
+        return [path]
+    else:
+        return []
+
+    parameters = []
+    for key, value in items:
+        parameters.extend(numeric_parameters(value, path + (key,)))
+    return parameters
+
+
+def parameter_name(path):
+    return '.'.join(str(key) for key in path)
+
+
+def _container(model, path):
+    for key in path[:-1]:
+        model = model[key]
+    return model
+
+
+def totals(cpuResult, storageResult):
+    """
+    :return: array [quantity, year] of the totals in QUANTITIES
+    """
+
+    rows = scenario_table('', cpuResult, storageResult)
+    return np.array([[row[quantity] for row in rows] for quantity in QUANTITIES])
+
+
+def _init_worker(model):
+    global _model, _evaluator
+    _model = model
+    _evaluator = Evaluator()
+
+
+def _perturbed_totals(args):
+    """
+    :param args: path of the value to perturb and the relative step
+    :return: array [quantity, year] of the totals with that value scaled by 1 + step
+    """
+
+    path, step = args
+    container = _container(_model, path)
+    value = container[path[-1]]
+    container[path[-1]] = value * (1 + step)
+    try:
+        return totals(*_evaluator.evaluate(_model))
+    finally:
+        container[path[-1]] = value
+
+
+def sensitivity(model, step=0.01, processes=None, parameters=None):
+    """
+    Elasticities of the total CPU, disk and tape with respect to the numeric values of a model
+
+    :param model: The configuration dictionary
+    :param step: relative change made to each value
+    :param processes: number of worker processes (default is the number of cores, 1 runs in this process)
+    :param parameters: list of the paths to perturb, default is all of numeric_parameters(model)
+    :return: Sensitivity with the parameter paths, the years, the base totals as an array [quantity, year] and
+             the elasticities as an array [parameter, quantity, year] (NaN where the total is zero)
+    """
+
+    if parameters is None:
+        parameters = numeric_parameters(model)
+    YEARS = list(range(model['start_year'], model['end_year'] + 1))
+    tasks = [(path, step) for path in parameters]
+
+    _init_worker(model)
+    base = totals(*_evaluator.evaluate(model))
+    if processes == 1 or len(tasks) < 2:
+        perturbed = [_perturbed_totals(task) for task in tasks]
+    else:
+        # Contiguous chunks keep related values on the same worker, so less is recomputed
+        pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(model,))
+        try:
+            chunksize = max(1, len(tasks) // (4 * (processes or multiprocessing.cpu_count())))
+            perturbed = pool.map(_perturbed_totals, tasks, chunksize=chunksize)
+        finally:
+            pool.close()
+            pool.join()
+
+    perturbed = np.array(perturbed).reshape((len(tasks),) + base.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        elasticities = np.where(base != 0, (perturbed - base) / base / step, np.nan)
+    return Sensitivity(parameters=parameters, years=YEARS, base=base, elasticities=elasticities)
+
+
+def ranked(result, year=None):
+    """
+    :param result: Sensitivity
+    :param year: rank by the elasticities in this year, default is the largest over all years
+    :return: list of parameter indices, the largest (absolute) elasticity first
+    """
+
+    values = np.abs(result.elasticities)
+    if year is not None:
+        values = values[:, :, result.years.index(year)]
+    values = np.nan_to_num(values).reshape(len(result.parameters), -1).max(axis=1)
+    return [int(i) for i in np.argsort(-values, kind='mergesort')]
+
+
+def print_sensitivity(result, top=None):
+    print('Parameter Quantity ' + ' '.join(str(year) for year in result.years))
+    for i in ranked(result)[:top]:
+        if not np.nan_to_num(result.elasticities[i]).any():
+            break
+        for q, quantity in enumerate(QUANTITIES):
+            print(parameter_name(result.parameters[i]), quantity,
+                  ' '.join('{:.3f}'.format(value) for value in result.elasticities[i, q]))
+
+
+def write_sensitivity(result, fileName):
+    with open(fileName, 'w') as tableFile:
+        writer = csv.writer(tableFile)
+        writer.writerow(['parameter', 'quantity'] + result.years)
+        for i, path in enumerate(result.parameters):
+            for q, quantity in enumerate(QUANTITIES):
+                writer.writerow([parameter_name(path), quantity] + list(result.elasticities[i, q]))
+
+
+def plot_sensitivity(result, year, top=20, keyName=''):
+    from plotting import plotTornado, queued
+
+    y = result.years.index(year)
+    with queued():
+        for q, quantity in enumerate(QUANTITIES):
+            values = np.nan_to_num(result.elasticities[:, q, y])
+            order = [i for i in np.argsort(-np.abs(values), kind='mergesort')[:top] if values[i]]
+            if not order:
+                continue
+            plotTornado([float(values[i]) for i in order], [parameter_name(result.parameters[i]) for i in order],
+                        name='Sensitivity' + QUANTITY_TITLES[quantity] + keyName + '.png',
+                        title='Elasticity of %s in %d' % (QUANTITY_TITLES[quantity], year))
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Elasticities of the CPU, disk and tape to every model value')
+    parser.add_argument('models', nargs='*', help='comma separated list of configuration files')
+    parser.add_argument('--step', type=float, default=0.01, help='relative change made to each value')
+    parser.add_argument('--processes', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--year', type=int, default=None, help='year of the tornado charts, default is the last')
+    parser.add_argument('--top', type=int, default=20, help='number of parameters printed and drawn')
+    parser.add_argument('--output', default=None, help='write all the elasticities as CSV to this file')
+    parser.add_argument('--no-plots', dest='plots', action='store_false', help='print the table only')
+    options = parser.parse_args(args)
+
+    modelNames = model_names_from_args(options.models)
+    model = configure(modelNames)
+    year = options.year or model['end_year']
+    if not model['start_year'] <= year <= model['end_year']:
+        parser.error('--year must be between %d and %d' % (model['start_year'], model['end_year']))
+
+    result = sensitivity(model, step=options.step, processes=options.processes)
+    if options.output:
+        write_sensitivity(result, options.output)
+    else:
+        print_sensitivity(result, top=options.top)
+    if options.plots:
+        plot_sensitivity(result, year, top=options.top, keyName=png_key_name(modelNames))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
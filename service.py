@@ -0,0 +1,311 @@
+#! /usr/bin/env python3
+
+"""
+Usage: ./service.py [--host 127.0.0.1] [--port 8080] [--processes N] [--cache-size 32]
+
+Local HTTP service answering questions about the CPU, storage and event models of scenarios
+as JSON, e.g. the total disk in 2027 for RelyOnMiniAOD.json and Run2024.json:
+
+ curl 'http://127.0.0.1:8080/query?models=RelyOnMiniAOD.json,Run2024.json&quantity=disk&year=2027'
+
+A scenario is a comma separated list of configuration files in the directory of the service
+(models=, empty for the base model), applied on top of BaseModel.json and RealisticModel.json.
+The requests are
+
+ /query       models, quantity and optionally year (default every year) and part, one of the
+              parts of the quantity or all of them with part=all (default the total)
+ /quantities  models: the years and the unit and parts of each quantity
+ /status      the size of the cache, its hits and misses and the scenarios being computed
+
+The quantities are cpu_required (MHS06) and cpu_time (THS06 * s) with the CPU activities as
+parts, disk and tape (PB, tape not increased by the tape fill factor, as sweep.py) with the
+tiers as parts, cpu_capacity, disk_capacity and tape_capacity, and events (billions) with the
+kinds of events as parts.
+
+The models of a scenario are evaluated once in a pool of --processes worker processes, which
+are given the merged base model when they start, and the results are kept in a cache of the
+--cache-size scenarios used last. The cache is keyed by the contents of the configuration
+files, base model included, so a changed file is evaluated again (the workers merge the base
+model again when its files have changed). Requests for a scenario being evaluated wait for
+that evaluation, while the other requests are answered from the cache in the meantime.
+
+The service needs python 3.
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from configure import BASE_MODELS, cache_key, configure, load_base
+from cpu_model import mega, run_cpu, tera
+from data_model import PETA, run_storage
+from events import events_by_year
+
+# Parts of the CPU and the CpuResult fields they are in
+CPU_PARTS = [('prompt', 'data'), ('rereco', 'rereco'), ('lhc_mc', 'lhc_mc'), ('hllhc_mc', 'hllhc_mc'),
+             ('analysis', 'analysis')]
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+_base = None
+_baseKey = None
+
+
+def scenario_summary(model):
+    """
+    :param model: The configuration dictionary
+    :return: dictionary of the years and, for each quantity, its unit, the names of its parts and lists [year] of
+             the total and [year][part] of the parts
+    """
+
+    cpuResult = run_cpu(model)
+    storageResult = run_storage(model)
+    kinds, YEARS, eventsByYear = events_by_year(model)
+    cube = storageResult.cube
+
+    def quantity(unit, total, parts=None, byPart=None):
+        return {'unit': unit, 'total': [float(value) for value in total], 'parts': parts or [],
+                'by_part': [[float(value) for value in row] for row in byPart] if parts else []}
+
+    def cpu_parts(kind, unit):
+        return [[getattr(cpuResult, field + '_cpu_' + kind)[year] / unit for part, field in CPU_PARTS] for year in YEARS]
+
+    cpuParts = [part for part, field in CPU_PARTS]
+    quantities = {
+        'cpu_required': quantity('MHS06', [cpuResult.total_cpu_required[year] / mega for year in YEARS],
+                                 cpuParts, cpu_parts('required', mega)),
+        'cpu_time': quantity('THS06 * s', [cpuResult.total_cpu_time[year] / tera for year in YEARS],
+                             cpuParts, cpu_parts('time', tera)),
+        'cpu_capacity': quantity('MHS06', [cpuResult.cpuCapacity[str(year)] / mega for year in YEARS]),
+        'events': quantity('billions', [sum(row) for row in eventsByYear], kinds, eventsByYear),
+    }
+    for name, medium, capacity in [('disk', 'disk', storageResult.diskCapacity),
+                                   ('tape', 'tape_unfilled', storageResult.tapeCapacity)]:
+        quantities[name] = quantity('PB', cube.total(medium, unit=PETA), cube.tiers,
+                                    cube.by_tier(medium, unit=PETA).tolist())
+        quantities[name + '_capacity'] = quantity('PB', [capacity[str(year)] / PETA for year in YEARS])
+
+    return {'years': YEARS, 'quantities': quantities}
+
+
+def answer(summary, quantity, year=None, part=None):
+    """
+    :param summary: dictionary from scenario_summary
+    :param quantity: name of the quantity
+    :param year: year, or None for every year
+    :param part: name of a part of the quantity, 'all' for all of them or None for the total
+    :return: dictionary of the unit and the values keyed by str(year), each a number or a dictionary keyed by part
+    """
+
+    if quantity not in summary['quantities']:
+        raise ValueError('Unknown quantity %s, not one of %s' % (quantity, ', '.join(sorted(summary['quantities']))))
+    entry = summary['quantities'][quantity]
+    years = summary['years']
+    if year is not None and year not in years:
+        raise ValueError('Year %d is not between %d and %d' % (year, years[0], years[-1]))
+    if part not in [None, 'all'] + entry['parts']:
+        raise ValueError('Unknown part %s of %s, not one of %s' % (part, quantity, ', '.join(entry['parts'])))
+
+    values = {}
+    for y, valueYear in enumerate(years):
+        if year is not None and valueYear != year:
+            continue
+        if part is None:
+            values[str(valueYear)] = entry['total'][y]
+        elif part == 'all':
+            values[str(valueYear)] = dict(zip(entry['parts'], entry['by_part'][y]))
+        else:
+            values[str(valueYear)] = entry['by_part'][y][entry['parts'].index(part)]
+    return {'unit': entry['unit'], 'values': values}
+
+
+def _init_worker(base, baseKey):
+    global _base, _baseKey
+    _base, _baseKey = base, baseKey
+
+
+def _summarize(modelNames, baseKey):
+    global _base, _baseKey
+    if baseKey != _baseKey:
+        _base, _baseKey = load_base(verbose=False), baseKey
+    return scenario_summary(configure(modelNames, base=_base, verbose=False))
+
+
+class ScenarioCache(object):
+    """
+    Summaries of the scenarios used last, evaluated in a pool of processes. The summary of a scenario being
+    evaluated is kept as the future of its evaluation, which all the requests for it wait for.
+    """
+
+    def __init__(self, executor, size):
+        self.executor = executor
+        self.size = size
+        self.entries = OrderedDict()
+        self.computing = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def summary(self, modelNames):
+        """
+        :param modelNames: list of configuration files
+        :return: dictionary from scenario_summary
+        """
+
+        baseKey = cache_key(BASE_MODELS)
+        key = (baseKey, cache_key(modelNames))
+        future = self.entries.get(key)
+        if future is None:
+            self.misses += 1
+            future = asyncio.get_running_loop().run_in_executor(self.executor, _summarize, modelNames, baseKey)
+            self.entries[key] = future
+            self.computing[key] = modelNames
+            future.add_done_callback(lambda done: self.computing.pop(key, None))
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+        try:
+            return await asyncio.shield(future)
+        except Exception:
+            # Failures are not kept, the files may be fixed
+            if self.entries.get(key) is future:
+                del self.entries[key]
+            raise
+
+    def status(self):
+        return {'size': len(self.entries), 'capacity': self.size, 'hits': self.hits, 'misses': self.misses,
+                'computing': sorted(','.join(modelNames) for modelNames in self.computing.values())}
+
+
+def model_names(params):
+    """
+    :param params: query parameters from parse_qs
+    :return: list of the configuration files of models=, which must be JSON files in the current directory
+    """
+
+    modelNames = [name for value in params.get('models', []) for name in value.split(',') if name]
+    for name in modelNames:
+        if os.path.basename(name) != name or not name.endswith('.json') or not os.path.isfile(name):
+            raise ValueError('Unknown configuration file %s' % name)
+    return modelNames
+
+
+class ModelService(object):
+    """
+    The HTTP requests and responses of the service
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    async def respond(self, method, target):
+        """
+        :return: HTTP status and the dictionary to send as JSON
+        """
+
+        if method != 'GET':
+            return 405, {'error': 'Only GET is supported'}
+        url = urlsplit(target)
+        params = parse_qs(url.query, keep_blank_values=True)
+
+        def param(name, convert=str):
+            values = params.get(name)
+            try:
+                return convert(values[-1]) if values else None
+            except ValueError:
+                raise ValueError('Bad value %s of %s' % (values[-1], name))
+
+        try:
+            if url.path == '/status':
+                return 200, self.cache.status()
+            if url.path not in ['/query', '/quantities']:
+                return 404, {'error': 'Unknown request %s, not one of /query, /quantities and /status' % url.path}
+
+            modelNames = model_names(params)
+            if url.path == '/query':
+                quantity = param('quantity')
+                if quantity is None:
+                    raise ValueError('quantity is needed')
+                year, part = param('year', int), param('part')
+                result = answer(await self.cache.summary(modelNames), quantity, year=year, part=part)
+                result.update({'models': modelNames, 'quantity': quantity, 'part': part})
+                return 200, result
+
+            summary = await self.cache.summary(modelNames)
+            return 200, {'models': modelNames, 'years': summary['years'],
+                         'quantities': {name: {'unit': entry['unit'], 'parts': entry['parts']}
+                                        for name, entry in summary['quantities'].items()}}
+        except ValueError as error:
+            return 400, {'error': str(error)}
+        except Exception as error:
+            return 500, {'error': '%s: %s' % (type(error).__name__, error)}
+
+    async def handle(self, reader, writer):
+        start = time.time()
+        method, target = '-', '-'
+        try:
+            request = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()).strip():  # The headers are not used
+                pass
+            if len(request) == 3:
+                method, target = request[:2]
+                status, result = await self.respond(method, target)
+            else:
+                status, result = 400, {'error': 'Bad request line'}
+
+            body = json.dumps(result, sort_keys=True).encode('utf-8')
+            writer.write(('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n'
+                          'Connection: close\r\n\r\n' % (status, REASONS[status], len(body))).encode('latin-1'))
+            writer.write(body)
+            await writer.drain()
+            print(method, target, status, '%.1f ms' % (1000 * (time.time() - start)))
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, processes=None, cacheSize=32):
+    """
+    Answer requests until interrupted
+
+    :param processes: number of worker processes (default is the number of cores)
+    :param cacheSize: number of scenarios kept
+    """
+
+    initargs = (load_base(verbose=False), cache_key(BASE_MODELS))
+    with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=initargs) as executor:
+        service = ModelService(ScenarioCache(executor, cacheSize))
+        server = await asyncio.start_server(service.handle, host, port)
+        print('Serving on http://%s:%d' % (host, port))
+        async with server:
+            await server.serve_forever()
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Local HTTP service answering questions about the models')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8080, help='port to listen on')
+    parser.add_argument('--processes', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--cache-size', type=int, default=32, help='number of scenarios kept')
+    options = parser.parse_args(args)
+    if options.cache_size < 1:
+        parser.error('--cache-size must be at least 1')
+
+    try:
+        asyncio.run(serve(options.host, options.port, options.processes, options.cache_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,310 @@
+#! /usr/bin/env python
+
+"""
+Usage: ./sites.py [--countries] [--resource cpu] [--output table.csv] config1.json,config2.json,...,configN.json
+
+Site resolved CPU, disk and tape.
+
+The global requirements are distributed over the sites with an allocation matrix. Its columns
+are the sources (the CPU required by each activity, and the disk and tape of each data tier)
+and its rows are (site, resource) pairs, so that one product
+
+ bySite[site x resource, year] = allocation[site x resource, source] . sources[source, year]
+
+gives the CPU, disk and tape of every site in every year. Every site belongs to one of
+SITE_TIERS and most sources go to only some of them, so the matrix is kept sparse. The
+countries are summed with a second sparse product. The sites can be given in the model as
+
+ "sites": {
+  "tier_shares": {
+   "cpu": {"Prompt Data": {"T0": 1.0}, "default": {"T1": 0.4, "T2": 0.6}},
+   "disk": {"default": {"T0": 0.2, "T1": 0.3, "T2": 0.5}},
+   "tape": {"RAW": {"T0": 0.5, "T1": 0.5}, "default": {"T1": 1.0}}
+  },
+  "sites": {
+   "T0_CH_CERN": {"tier": "T0", "country": "CH", "share": 1.0},
+   "T1_US_FNAL": {"tier": "T1", "country": "US", "cpu": 0.4, "disk": 0.4, "tape": {"2017": 0.4, "2025": 0.5}},
+   ...
+  }
+ }
+
+tier_shares gives the fraction of each source at each site tier (the CPU activities are those
+of the CPU plots, the disk and tape sources are the data tiers, "default" applies to the
+others). The share of a site is relative to the other sites of its tier, either one "share"
+for all resources or one for each. Any of the fractions can be a year dependent ramp.
+
+Without "sites" in the model, the sites are T0_CH_CERN and a US and an Other site at T1 and
+T2, using disk_fraction_T0, tape_fraction_T0, tier1_disk_fraction (also for the CPU outside of
+the T0) and us_fraction_T1T2, so that the US rows are the US disk and tape printed by data.py.
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import csv
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from capacity import RESOURCES
+from configure import configure, model_names_from_args
+from cpu_model import kilo, run_cpu
+from data_model import PETA, run_storage
+from utils import as_ramp
+
+SITE_TIERS = ['T0', 'T1', 'T2']
+
+# The CPU activities (as in the CPU plots) and the CpuResult fields of their CPU required
+CPU_SOURCES = [('Prompt Data', 'data_cpu_required'),
+               ('Non-Prompt Data', 'rereco_cpu_required'),
+               ('LHC MC', 'lhc_mc_cpu_required'),
+               ('HL-LHC MC', 'hllhc_mc_cpu_required'),
+               ('Analysis', 'analysis_cpu_required')]
+
+TITLES = {'cpu': 'CPU', 'disk': 'Disk', 'tape': 'Tape'}
+UNITS = {'cpu': 'kHS06', 'disk': 'PB', 'tape': 'PB'}
+SCALES = {'cpu': kilo, 'disk': 1.0, 'tape': 1.0}
+
+Site = namedtuple('Site', 'name, tier, country, shares')
+SiteResult = namedtuple('SiteResult', 'years, sites, countries, sources, bySite, byCountry')
+
+
+class SparseMatrix(object):
+    """
+    Matrix in compressed sparse row form whose entries can depend on the year
+    """
+
+    def __init__(self, rows, columns, values, shape):
+        """
+        :param rows: array of the row of each entry
+        :param columns: array of the column of each entry
+        :param values: array [entry] or [entry, year] of the values
+        :param shape: number of rows and columns
+        """
+
+        order = np.lexsort((columns, rows))
+        self.shape = shape
+        self.indices = np.asarray(columns, dtype=int)[order]
+        self.data = np.asarray(values, dtype=float)[order]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(np.asarray(rows, dtype=int),
+                                                                 minlength=shape[0]))])
+
+    def dot(self, dense):
+        """
+        :param dense: array [column, ...], with the year as its second axis if the entries depend on the year
+        :return: array [row, ...] of the product
+        """
+
+        result = np.zeros((self.shape[0],) + dense.shape[1:])
+        if not len(self.data):
+            return result
+        data = self.data.reshape(self.data.shape + (1,) * (dense.ndim - self.data.ndim))
+        products = data * dense[self.indices]
+        starts = self.indptr[:-1]
+        nonEmpty = starts < self.indptr[1:]
+        result[nonEmpty] = np.add.reduceat(products, starts[nonEmpty], axis=0)
+        return result
+
+
+def _by_year(values, years):
+    """
+    :param values: list of numbers or year dependent ramps
+    :return: array [value, year] of each value in each year (0 before the first year of a ramp)
+    """
+
+    byYear = np.empty((len(values), len(years)))
+    constant = [not isinstance(value, dict) for value in values]
+    byYear[constant] = np.array([float(value) for value in values if not isinstance(value, dict)])[:, None]
+    for i, value in enumerate(values):
+        if isinstance(value, dict):
+            stepped = as_ramp(value).step_array(years)[0]
+            byYear[i] = np.where(np.isnan(stepped), 0.0, stepped)
+    return byYear
+
+
+def default_sites(model):
+    """
+    :param model: The configuration dictionary
+    :return: the "sites" configuration equivalent to the fractions used by the printouts
+    """
+
+    diskT0 = model['disk_fraction_T0']
+    tapeT0 = model['tape_fraction_T0']
+    tier1 = model['tier1_disk_fraction']
+    us = model['us_fraction_T1T2']
+    sites = {'T0_CH_CERN': {'tier': 'T0', 'country': 'CH', 'share': 1.0}}
+    for tier in ['T1', 'T2']:
+        sites[tier + '_US'] = {'tier': tier, 'country': 'US', 'share': us}
+        sites[tier + '_Other'] = {'tier': tier, 'country': 'Other', 'share': 1.0 - us}
+
+    return {'tier_shares': {'cpu': {'Prompt Data': {'T0': 1.0}, 'default': {'T1': tier1, 'T2': 1.0 - tier1}},
+                            'disk': {'default': {'T0': diskT0, 'T1': (1.0 - diskT0) * tier1,
+                                                 'T2': (1.0 - diskT0) * (1.0 - tier1)}},
+                            'tape': {'default': {'T0': tapeT0, 'T1': 1.0 - tapeT0}}},
+            'sites': sites}
+
+
+def read_sites(model):
+    """
+    :param model: The configuration dictionary
+    :return: list of Site sorted by tier and name, and the tier_shares
+    """
+
+    config = model.get('sites') or default_sites(model)
+    sites = []
+    for name, site in config['sites'].items():
+        if site['tier'] not in SITE_TIERS:
+            raise ValueError('Site %s is in tier %s, not one of %s' % (name, site['tier'], ', '.join(SITE_TIERS)))
+        shares = {resource: site.get(resource, site.get('share', 0.0)) for resource in RESOURCES}
+        sites.append(Site(name=name, tier=site['tier'], country=site.get('country', ''), shares=shares))
+    sites.sort(key=lambda site: (SITE_TIERS.index(site.tier), site.name))
+    return sites, config['tier_shares']
+
+
+def source_table(cpuResult, storageResult):
+    """
+    :param cpuResult: CpuResult from run_cpu
+    :param storageResult: StorageResult from run_storage
+    :return: list of the sources as (resource, name) and array [source, year] of the CPU required in HS06 and
+             the disk and tape in PB
+    """
+
+    YEARS = storageResult.years
+    cube = storageResult.cube
+    sources = [('cpu', name) for name, field in CPU_SOURCES]
+    rows = [[getattr(cpuResult, field)[year] for year in YEARS] for name, field in CPU_SOURCES]
+    for resource, medium in [('disk', 'disk'), ('tape', 'tape_unfilled')]:
+        sources.extend((resource, tier) for tier in cube.tiers)
+        rows.extend(cube.by_tier(medium, unit=PETA).T.tolist())
+    return sources, np.array(rows)
+
+
+def allocation_matrix(sites, tierShares, sources, years):
+    """
+    :param sites: list of Site
+    :param tierShares: fraction of each source at each site tier, see read_sites
+    :param sources: list of (resource, name) from source_table
+    :param years: list of years
+    :return: SparseMatrix [site x resource, source] of the fraction of each source at each site, by year
+    """
+
+    tierOfSite = np.array([SITE_TIERS.index(site.tier) for site in sites])
+    rows, columns, values = [], [], []
+    for r, resource in enumerate(RESOURCES):
+        columnsOfResource = [j for j, source in enumerate(sources) if source[0] == resource]
+        if not columnsOfResource:
+            continue
+
+        # Fraction of each source at each site tier [siteTier, source, year]
+        shares = tierShares.get(resource, {})
+        levels = np.zeros((len(SITE_TIERS), len(columnsOfResource), len(years)))
+        for c, j in enumerate(columnsOfResource):
+            fractions = shares.get(sources[j][1], shares.get('default', {}))
+            levels[[SITE_TIERS.index(tier) for tier in fractions], c] = _by_year(list(fractions.values()), years)
+
+        # Share of each site within its tier [site, year]
+        weights = _by_year([site.shares[resource] for site in sites], years)
+        for t in range(len(SITE_TIERS)):
+            inTier = tierOfSite == t
+            total = weights[inTier].sum(axis=0)
+            weights[inTier] = np.where(total > 0, weights[inTier] / np.where(total > 0, total, 1.0), 0.0)
+
+        fractions = weights[:, None, :] * levels[tierOfSite]  # [site, source, year]
+        s, c = np.nonzero(fractions.any(axis=2))
+        rows.append(s * len(RESOURCES) + r)
+        columns.append(np.array(columnsOfResource)[c])
+        values.append(fractions[s, c])
+
+    return SparseMatrix(np.concatenate(rows), np.concatenate(columns), np.concatenate(values),
+                        (len(sites) * len(RESOURCES), len(sources)))
+
+
+def country_matrix(sites):
+    """
+    :return: sorted list of the countries and SparseMatrix [country, site] adding up their sites
+    """
+
+    countries = sorted(set(site.country for site in sites))
+    rows = [countries.index(site.country) for site in sites]
+    return countries, SparseMatrix(rows, list(range(len(sites))), np.ones(len(sites)), (len(countries), len(sites)))
+
+
+def run_sites(model, cpuResult=None, storageResult=None):
+    """
+    Distribute the CPU, disk and tape over the sites
+
+    :param model: The configuration dictionary
+    :param cpuResult: CpuResult from run_cpu, evaluated if not given
+    :param storageResult: StorageResult from run_storage, evaluated if not given
+    :return: SiteResult with the arrays [site, resource, year] and [country, resource, year] of the CPU
+             required in HS06 and the disk and tape in PB
+    """
+
+    if cpuResult is None:
+        cpuResult = run_cpu(model)
+    if storageResult is None:
+        storageResult = run_storage(model)
+    YEARS = storageResult.years
+
+    sites, tierShares = read_sites(model)
+    sources, table = source_table(cpuResult, storageResult)
+    allocation = allocation_matrix(sites, tierShares, sources, YEARS)
+    bySite = allocation.dot(table).reshape(len(sites), len(RESOURCES), len(YEARS))
+
+    countries, byCountry = country_matrix(sites)
+    byCountry = byCountry.dot(bySite.reshape(len(sites), -1)).reshape(len(countries), len(RESOURCES), len(YEARS))
+    return SiteResult(years=YEARS, sites=sites, countries=countries, sources=sources,
+                      bySite=bySite, byCountry=byCountry)
+
+
+def print_sites(result, resources=RESOURCES, countries=False):
+    """
+    Print a table of each resource by site (or by country) and year
+    """
+
+    names = result.countries if countries else [site.name for site in result.sites]
+    values = result.byCountry if countries else result.bySite
+    for resource in resources:
+        r = RESOURCES.index(resource)
+        print('\n%s by %s in %s\n' % (TITLES[resource], 'country' if countries else 'site', UNITS[resource]))
+        print(('Country;' if countries else 'Site;') + ';'.join(str(year) for year in result.years))
+        for name, row in zip(names, values[:, r]):
+            print(name, ' '.join('{:8.2f}'.format(value / SCALES[resource]) for value in row))
+
+
+def write_sites(result, fileName, countries=False):
+    with open(fileName, 'w') as tableFile:
+        writer = csv.writer(tableFile)
+        if countries:
+            writer.writerow(['country', 'resource', 'unit'] + result.years)
+            for country, values in zip(result.countries, result.byCountry):
+                for r, resource in enumerate(RESOURCES):
+                    writer.writerow([country, resource, UNITS[resource]] + list(values[r] / SCALES[resource]))
+        else:
+            writer.writerow(['site', 'tier', 'country', 'resource', 'unit'] + result.years)
+            for site, values in zip(result.sites, result.bySite):
+                for r, resource in enumerate(RESOURCES):
+                    writer.writerow([site.name, site.tier, site.country, resource, UNITS[resource]] +
+                                    list(values[r] / SCALES[resource]))
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Distribute the CPU, disk and tape over the sites')
+    parser.add_argument('models', nargs='*', help='comma separated list of configuration files')
+    parser.add_argument('--countries', action='store_true', help='sum the sites of each country')
+    parser.add_argument('--resource', choices=RESOURCES, action='append', default=None,
+                        help='print only this resource (may be repeated)')
+    parser.add_argument('--output', default=None, help='write the table as CSV to this file')
+    options = parser.parse_args(args)
+
+    model = configure(model_names_from_args(options.models))
+    result = run_sites(model)
+    if options.output:
+        write_sites(result, options.output, countries=options.countries)
+    else:
+        print_sites(result, resources=options.resource or RESOURCES, countries=options.countries)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,177 @@
+#! /usr/bin/env python
+
+"""
+Array engine for the disk and tape model.
+
+The volume produced is held as a [producedYear, dataType, tier] array and the number of copies
+kept (versions * replicas) as an [age, tier] matrix. The volume stored in every year is then
+computed for all years at once as a [year, producedYear, dataType, tier] array, reproducing the
+rules of the year by year loop data.py used to run.
+"""
+
+from __future__ import division, print_function
+
+import numpy as np
+
+from event_model import event_model
+from performance import performance_by_year
+from utils import Ramp, as_ramp
+
+DATA_TYPES = ['data', 'mc']
+DEFAULT_SCALING = Ramp({"2000": 1.0, "2050": 1.0})
+
+
+def produced_volume(model, years, tiers):
+    """
+    :param model: The configuration dictionary
+    :param years: list of years in which data is produced
+    :param tiers: list of tiers
+    :return: array [producedYear, dataType, tier] of bytes produced without versions or replicas
+    """
+
+    produced = np.zeros((len(years), len(DATA_TYPES), len(tiers)))
+    data = DATA_TYPES.index('data')
+    mc = DATA_TYPES.index('mc')
+
+    eventModel = event_model(model)
+    for p, year in enumerate(years):
+        dataEvents = eventModel.data_events(year)
+        mcEvents = eventModel.mc_events(year)
+        for t, tier in enumerate(tiers):
+            if tier not in model['mc_only_tiers']:
+                dummyCPU, tierSize = performance_by_year(model, year, tier, data_type='data')
+                produced[p, data, t] += tierSize * dataEvents
+            if tier not in model['data_only_tiers']:
+                for kind, events in mcEvents.items():
+                    dummyCPU, tierSize = performance_by_year(model, year, tier, data_type='mc', kind=kind)
+                    produced[p, mc, t] += tierSize * events
+
+    return produced
+
+
+def produced_types(model, tiers):
+    """
+    :return: boolean array [dataType, tier] of which tiers are produced for data and for MC
+    """
+
+    return np.array([[tier not in model['mc_only_tiers'] for tier in tiers],
+                     [tier not in model['data_only_tiers'] for tier in tiers]])
+
+
+def copies_by_age(model, tiers, replicas='disk_replicas'):
+    """
+    :param model: The configuration dictionary
+    :param tiers: list of tiers
+    :param replicas: 'disk_replicas' or 'tape_replicas' in the storage model
+    :return: array [age, tier] of versions * replicas padded with the last value, the number of ages given
+             for each tier and the lists of versions * replicas by tier
+    """
+
+    storageModel = model['storage_model']
+    copies = []
+    for tier in tiers:
+        tierCopies = [versions * replica for versions, replica in
+                      zip(storageModel['versions'][tier], storageModel[replicas][tier])]
+        if not tierCopies:
+            tierCopies = [0, 0, 0]
+        copies.append(tierCopies)
+
+    lengths = np.array([len(tierCopies) for tierCopies in copies])
+    matrix = np.zeros((lengths.max(), len(tiers)))
+    for t, tierCopies in enumerate(copies):
+        matrix[:len(tierCopies), t] = tierCopies
+        matrix[len(tierCopies):, t] = tierCopies[-1]
+
+    return matrix, lengths, copies
+
+
+def scale_by_year(model, years, tiers, scaling='disk_scaling'):
+    """
+    :return: array [producedYear, tier] of the time dependent scaling of the copies kept
+    """
+
+    scales = model['storage_model'].get(scaling, {})
+    scale = np.zeros((len(years), len(tiers)))
+    for t, tier in enumerate(tiers):
+        values = scales.get(tier, None) or DEFAULT_SCALING
+        scale[:, t] = as_ramp(values).step_array(years)[0]
+    return scale
+
+
+def last_running_years(model, years):
+    """
+    :return: array of the last year not in shutdown for each year (the year itself if running)
+    """
+
+    return event_model(model).last_running_years(years)
+
+
+def revision_index(years, producedYears, lastRunning, lengths):
+    """
+    Index into the copies by age used in each year for the data produced in each year.
+
+    Data older than the copies given for its tier keeps the last number of copies. Otherwise the
+    copies are those for its age at the last running year, so data is not aged during a shutdown.
+
+    :param years: array of years in which the storage is evaluated
+    :param producedYears: array of years in which data was produced
+    :param lastRunning: array of the last running year for each of years
+    :param lengths: number of ages given for each tier from copies_by_age
+    :return: integer array [year, producedYear, tier]
+    """
+
+    years = np.asarray(years)
+    producedYears = np.asarray(producedYears)
+    age = (years[:, None] - producedYears[None, :])[:, :, None]
+    runningAge = (np.asarray(lastRunning)[:, None] - producedYears[None, :])[:, :, None]
+
+    # Ages counted from the last running year can be negative for data produced during a
+    # shutdown. These count from the end of the list of copies, as python indexing does.
+    index = np.where(runningAge < 0, runningAge + lengths, runningAge)
+    index = np.where(age >= lengths, lengths - 1, index)
+    return np.clip(index, 0, lengths.max() - 1)
+
+
+def revisions(copies, index):
+    """
+    :param copies: array [age, tier] from copies_by_age
+    :param index: array [year, producedYear, tier] from revision_index
+    :return: array [year, producedYear, tier] of the number of copies kept
+    """
+
+    return copies[index, np.arange(copies.shape[1])]
+
+
+def stored_volume(produced, revs, scale, fill=1.0, years=None, producedYears=None):
+    """
+    Volume kept in each year of the data produced in each year
+
+    :param produced: array [producedYear, dataType, tier] from produced_volume
+    :param revs: array [year, producedYear, tier] from revisions
+    :param scale: array [producedYear, tier] from scale_by_year
+    :param fill: fill factor applied to the volume
+    :param years: array of the years of the first axis of revs
+    :param producedYears: array of the years of the first axis of produced
+    :return: array [year, producedYear, dataType, tier] and a boolean array of the same shape of what is kept at all
+    """
+
+    revs = revs[:, :, None, :]
+    stored = produced[None, :, :, :] * revs * fill * scale[None, :, None, :]
+    kept = (produced[None, :, :, :] != 0) & (revs != 0)
+    if years is not None and producedYears is not None:
+        # Can't save data for future years
+        kept &= (np.asarray(producedYears)[None, :] <= np.asarray(years)[:, None])[:, :, None, None]
+    stored = np.where(kept, stored, 0.0)
+    return stored, kept
+
+
+def sum_over_produced(stored):
+    """
+    :param stored: array [year, producedYear, ...]
+    :return: array [year, ...] summed over the year produced in order of production
+    """
+
+    total = np.zeros(stored.shape[:1] + stored.shape[2:])
+    for p in range(stored.shape[1]):
+        total += stored[:, p]
+    return total
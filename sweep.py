@@ -0,0 +1,135 @@
+#! /usr/bin/env python
+
+"""
+Usage: ./sweep.py [--processes N] [--output table.csv] scenario1 scenario2 ... scenarioN
+
+Run the CPU and storage models over many scenarios in a pool of processes. Each scenario is a
+comma separated list of configuration (JSON) files applied on top of BaseModel.json and
+RealisticModel.json, e.g.
+
+ ./sweep.py RelyOnMiniAOD.json RelyOnMiniAOD.json,Run2024.json RelyOnMiniAOD.json,2018changes.json
+
+The base model is read once and handed to each worker process when it starts. The totals per
+scenario and year are collected into one table, printed or written as CSV.
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import csv
+import multiprocessing
+import sys
+
+from configure import configure, load_base, png_key_name
+from cpu_model import mega, run_cpu, tera
+from data_model import PETA, run_storage
+
+TABLE_COLUMNS = ['scenario', 'year',
+                 'cpu_required', 'cpu_capacity', 'cpu_time', 'cpu_time_capacity',
+                 'disk', 'disk_capacity', 'tape', 'tape_capacity']
+
+_base = None
+
+
+def scenario_name(overlays):
+    """
+    :param overlays: list of configuration files
+    :return: name of the scenario in the same style as the PNG file names
+    """
+
+    return png_key_name(overlays).lstrip('_') or 'Base'
+
+
+def scenario_table(name, cpuResult, storageResult):
+    """
+    Collect the per year totals of one scenario
+
+    :param name: name of the scenario
+    :param cpuResult: CpuResult from run_cpu
+    :param storageResult: StorageResult from run_storage
+    :return: list of rows (dictionaries with TABLE_COLUMNS as keys). CPU in MHS06 and THS06 * s, disk and tape in PB
+    """
+
+    YEARS = storageResult.years
+    diskTotal = storageResult.cube.total('disk', unit=PETA)
+    tapeTotal = storageResult.cube.total('tape_unfilled', unit=PETA)
+
+    rows = []
+    for y, year in enumerate(YEARS):
+        rows.append({'scenario': name,
+                     'year': year,
+                     'cpu_required': cpuResult.total_cpu_required[year] / mega,
+                     'cpu_capacity': cpuResult.cpuCapacity[str(year)] / mega,
+                     'cpu_time': cpuResult.total_cpu_time[year] / tera,
+                     'cpu_time_capacity': cpuResult.cpuTimeCapacity[str(year)] / tera,
+                     'disk': diskTotal[y],
+                     'disk_capacity': storageResult.diskCapacity[str(year)] / PETA,
+                     'tape': tapeTotal[y],
+                     'tape_capacity': storageResult.tapeCapacity[str(year)] / PETA,
+                     })
+    return rows
+
+
+def _init_worker(base):
+    global _base
+    _base = base
+
+
+def _evaluate(overlays):
+    model = configure(overlays, base=_base, verbose=False)
+    return scenario_table(scenario_name(overlays), run_cpu(model), run_storage(model))
+
+
+def sweep(overlayLists, processes=None, base=None):
+    """
+    Evaluate the CPU and storage models for many scenarios in parallel
+
+    :param overlayLists: list of scenarios, each a list of configuration files
+    :param processes: number of worker processes (default is the number of cores)
+    :param base: the merged base model, read from BaseModel.json and RealisticModel.json if not given
+    :return: list of rows (see scenario_table) for all scenarios and years, in the order given
+    """
+
+    if base is None:
+        base = load_base(verbose=False)
+
+    pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(base,))
+    try:
+        tables = pool.map(_evaluate, overlayLists, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    return [row for table in tables for row in table]
+
+
+def print_table(rows):
+    print(' '.join(TABLE_COLUMNS))
+    for row in rows:
+        print(row['scenario'], row['year'],
+              ' '.join('{:.3f}'.format(row[column]) for column in TABLE_COLUMNS[2:]))
+
+
+def write_table(rows, fileName):
+    with open(fileName, 'w') as tableFile:
+        writer = csv.DictWriter(tableFile, fieldnames=TABLE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Run the CPU and storage models over many scenarios')
+    parser.add_argument('scenarios', nargs='+', help='comma separated list of configuration files, one per scenario')
+    parser.add_argument('--processes', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--output', default=None, help='write the table as CSV to this file')
+    options = parser.parse_args(args)
+
+    rows = sweep([scenario.split(',') for scenario in options.scenarios], processes=options.processes)
+    if options.output:
+        write_table(rows, options.output)
+    else:
+        print_table(rows)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
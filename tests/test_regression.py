@@ -0,0 +1,147 @@
+"""
+Regression tests of the CPU and storage tables against the printout of the original cpu.py and
+data.py.
+
+The files in baseline/ are what cpu.py and data.py printed for each scenario before the models
+were moved into cpu_model.run_cpu and data_model.run_storage (without the names of the
+configuration files and what the plots print). The tables printed by print_cpu and
+print_storage from the results of run_cpu and run_storage must agree with them to the printed
+precision. Python 2 and 3 order the tiers and the keys of dictionaries differently, so the
+columns of the tables and the printed dictionaries are compared by name.
+
+Run from the top directory with
+
+ python -m pytest tests
+
+or python -m unittest discover tests.
+"""
+
+from __future__ import division, print_function
+
+import ast
+import os
+import sys
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+TOP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(TOP, 'tests', 'baseline')
+sys.path.insert(0, TOP)
+
+from configure import configure  # noqa: E402
+from cpu import print_cpu  # noqa: E402
+from cpu_model import run_cpu  # noqa: E402
+from data import print_storage  # noqa: E402
+from data_model import run_storage  # noqa: E402
+
+# Name of the baseline files of each scenario, and its configuration files
+SCENARIOS = [('RelyOnMiniAOD', ['RelyOnMiniAOD.json']),
+             ('RelyOnMiniAOD_Run2024', ['RelyOnMiniAOD.json', 'Run2024.json'])]
+
+
+def normalized(text):
+    """
+    :param text: printout of print_cpu or print_storage
+    :return: list of its lines, with the rows of the tables whose headers are separated by ';' as sorted (column,
+             value) pairs and the printed dictionaries as sorted (key, value) pairs
+    """
+
+    lines = []
+    columns = None
+    for line in text.splitlines():
+        if line.startswith('{'):
+            lines.append(sorted(ast.literal_eval(line).items()))
+            columns = None
+        elif ';' in line:
+            columns = line.split(';')
+            lines.append(sorted(columns))
+        elif columns and len(line.split()) == len(columns):
+            lines.append(sorted(zip(columns, line.split())))
+        else:
+            lines.append(line)
+            columns = None
+    return lines
+
+
+def printed(function, *args):
+    """
+    :return: what function(*args) prints
+    """
+
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+        function(*args)
+        return sys.stdout.getvalue()
+    finally:
+        sys.stdout = stdout
+
+
+class TablesTest(unittest.TestCase):
+    """
+    The tables of every scenario in SCENARIOS against those in BASELINE
+    """
+
+    def setUp(self):
+        # The configuration files are read from the current directory
+        self.cwd = os.getcwd()
+        os.chdir(TOP)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def compare(self, kind, evaluate, printout):
+        for name, modelNames in SCENARIOS:
+            model = configure(modelNames, verbose=False)
+            with open(os.path.join(BASELINE, '%s_%s.txt' % (kind, name))) as baselineFile:
+                expected = normalized(baselineFile.read())
+            actual = normalized(printed(printout, model, evaluate(model)))
+            self.assertEqual(len(actual), len(expected), '%s tables of %s' % (kind, name))
+            for number, (actualLine, expectedLine) in enumerate(zip(actual, expected)):
+                self.assertEqual(actualLine, expectedLine, 'line %d of the %s tables of %s' % (number + 1, kind, name))
+
+    def test_cpu(self):
+        self.compare('cpu', run_cpu, print_cpu)
+
+    def test_storage(self):
+        self.compare('data', run_storage, print_storage)
+
+
+class WindowTest(unittest.TestCase):
+    """
+    run_cpu and run_storage for some years against the same years of the full evaluation
+    """
+
+    YEARS = [2026, 2027]
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        os.chdir(TOP)
+        self.model = configure(SCENARIOS[0][1], verbose=False)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def test_cpu(self):
+        full = run_cpu(self.model)
+        window = run_cpu(self.model, years=self.YEARS)
+        for year in self.YEARS:
+            self.assertEqual(window.total_cpu_required[year], full.total_cpu_required[year])
+            self.assertEqual(window.total_cpu_time[year], full.total_cpu_time[year])
+
+    def test_storage(self):
+        full = run_storage(self.model)
+        window = run_storage(self.model, years=self.YEARS)
+        rows = [full.years.index(year) for year in self.YEARS]
+        self.assertEqual(window.years, self.YEARS)
+        self.assertEqual(window.cube.produced().tolist(), full.cube.produced()[rows].tolist())
+        for medium in ['disk', 'tape', 'tape_unfilled']:
+            self.assertEqual(window.cube.by_tier(medium).tolist(), full.cube.by_tier(medium)[rows].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
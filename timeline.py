@@ -0,0 +1,290 @@
+#! /usr/bin/env python
+
+"""
+Usage: ./timeline.py [--periods 12] config1.json,config2.json,...,configN.json
+
+Sub-annual time axis for the CPU and storage models.
+
+A Timeline splits every year into periods (12 for months, 4 for quarters, or any divisor of 12)
+and the models are evaluated over [year, period] with monthly schedules, which can be given in
+the model as
+
+ "time_resolution": {
+  "run_schedule": [0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 0],
+  "rereco_schedule": [1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+  "mc_schedule": [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+  "analysis_schedule": [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+  "campaign_schedule": [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+  "capacity_month": 4
+ }
+
+The schedules are relative weights of each month (the values above are the defaults), or
+dictionaries of them keyed by the year from which they apply, e.g. to stop a run early in one
+year. The event model records each year's data following run_schedule, so that the months
+without running and the shutdown years have no data, and prompt reconstruction keeps up with
+it in the running_time of the year spread the same way. Re-reconstruction follows
+rereco_schedule instead of the fixed windows of the yearly model, the catch-up campaigns of the
+shutdowns campaign_schedule, and MC and analysis their own schedules (cpu_model.cpu_periods).
+The data of the current year arrives on disk and tape as it is recorded and the MC as it is
+made. The capacity of each year is installed in capacity_month (the pledge year starting in
+April) and the previous year's capacity is available before then.
+
+The CPU time of the periods of a year adds up to the CPU time of cpu.py, and the volume stored at
+the end of the last period of each year is that of data.py. The CPU required in a period is
+that of cpu.py while the activity runs at its yearly pace (prompt reconstruction in the running
+periods, MC and analysis with even schedules), except for the rereco.
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from configure import configure, model_names_from_args
+from cpu_model import cpu_periods, mega, run_cpu, seconds_per_year
+from data_model import PETA, storage_arrays, storage_capacity, storage_result
+from event_model import event_model
+from storage_engine import DATA_TYPES
+from utils import time_dependent_value
+
+MONTHS = 12
+
+DEFAULT_SCHEDULES = {
+    'run_schedule': [0, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 0],
+    'rereco_schedule': [1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+    'mc_schedule': [1] * MONTHS,
+    'analysis_schedule': [1] * MONTHS,
+    'campaign_schedule': [1] * MONTHS,
+}
+DEFAULT_CAPACITY_MONTH = 4
+
+# The categories of the CPU and their activities in cpu_model.cpu_periods
+CPU_CATEGORIES = ['Prompt Data', 'Non-Prompt Data', 'LHC MC', 'HL-LHC MC', 'Analysis']
+CPU_ACTIVITIES = {'Prompt Data': 'data', 'Non-Prompt Data': 'rereco', 'LHC MC': 'lhc_mc', 'HL-LHC MC': 'hllhc_mc',
+                  'Analysis': 'analysis'}
+
+PeriodResult = namedtuple('PeriodResult', [
+    'timeline', 'in_shutdown', 'data_events', 'mc_events', 'cpu_time', 'cpu_required', 'cpu_capacity',
+    'disk', 'tape', 'disk_capacity', 'tape_capacity',
+])
+
+
+class Timeline(object):
+    """
+    The periods of a range of years. Arrays over the timeline have the shape [year, period]
+    """
+
+    def __init__(self, YEARS, periodsPerYear=MONTHS):
+        if periodsPerYear < 1 or MONTHS % periodsPerYear:
+            raise ValueError('The number of periods per year must divide %d, not %s' % (MONTHS, periodsPerYear))
+        self.years = list(YEARS)
+        self.periodsPerYear = periodsPerYear
+        self.monthsPerPeriod = MONTHS // periodsPerYear
+        self.shape = (len(self.years), periodsPerYear)
+        self.seconds = seconds_per_year / periodsPerYear
+
+    def labels(self):
+        """
+        :return: list of period names ('2017', '2017Q1' or '2017-01' style) in time order
+        """
+
+        if self.periodsPerYear == 1:
+            return [str(year) for year in self.years]
+        if self.periodsPerYear == 4:
+            return ['%dQ%d' % (year, period + 1) for year in self.years for period in range(4)]
+        return ['%d-%02d' % (year, period * self.monthsPerPeriod + 1)
+                for year in self.years for period in range(self.periodsPerYear)]
+
+    def schedule(self, model, name):
+        """
+        :param model: The configuration dictionary
+        :param name: one of the schedules in DEFAULT_SCHEDULES
+        :return: array [year, period] of the fraction of each year's quantity in each period
+        """
+
+        schedule = model.get('time_resolution', {}).get(name, DEFAULT_SCHEDULES[name])
+        weights = np.zeros(self.shape)
+        for y, year in enumerate(self.years):
+            monthly = schedule
+            if isinstance(schedule, dict):
+                monthly, dummy = time_dependent_value(year, schedule)
+                if monthly is None:
+                    raise ValueError('%s has no schedule for %d' % (name, year))
+            if len(monthly) != MONTHS:
+                raise ValueError('%s needs %d monthly values, not %d' % (name, MONTHS, len(monthly)))
+            weights[y] = np.asarray(monthly, dtype=float).reshape(self.periodsPerYear, self.monthsPerPeriod).sum(axis=1)
+            if weights[y].sum() <= 0:
+                raise ValueError('%s has no weight in %d' % (name, year))
+        return weights / weights.sum(axis=1, keepdims=True)
+
+    def schedules(self, model):
+        """
+        :return: dictionary of the schedules as cpu_model.cpu_periods takes them ('run', 'rereco', ...)
+        """
+
+        return {name.replace('_schedule', ''): self.schedule(model, name) for name in DEFAULT_SCHEDULES}
+
+    def capacity_period(self, model):
+        """
+        :return: index of the period in which each year's capacity is installed
+        """
+
+        month = model.get('time_resolution', {}).get('capacity_month', DEFAULT_CAPACITY_MONTH)
+        return (month - 1) // self.monthsPerPeriod
+
+    def spread(self, values, fractions):
+        """
+        :param values: array [year] of yearly quantities
+        :param fractions: array [year, period] from schedule
+        :return: array [year, period]
+        """
+
+        return np.asarray(values, dtype=float)[:, None] * fractions
+
+    def cumulative(self, fractions):
+        """
+        :return: array [year, period] of the fraction done by the end of each period
+        """
+
+        return np.cumsum(fractions, axis=1)
+
+    def installed(self, model, capacity):
+        """
+        :param model: The configuration dictionary
+        :param capacity: dictionary of the capacity keyed by str(year), which may include the year before the first
+        :return: array [year, period] of the capacity available in each period
+        """
+
+        thisYear = np.array([capacity[str(year)] for year in self.years], dtype=float)
+        lastYear = np.array([capacity.get(str(year - 1), capacity[str(year)]) for year in self.years], dtype=float)
+        installed = np.arange(self.periodsPerYear) >= self.capacity_period(model)
+        return np.where(installed[None, :], thisYear[:, None], lastYear[:, None])
+
+
+def period_events(model, timeline):
+    """
+    :param model: The configuration dictionary
+    :param timeline: Timeline
+    :return: boolean array [year, period] of the periods in a shutdown, array [year, period] of data events
+             and dictionary {kind: array [year, period]} of MC events
+    """
+
+    events = event_model(model)
+    run = timeline.schedule(model, 'run_schedule')
+    mc = timeline.schedule(model, 'mc_schedule')
+    dataEvents = events.period_data_events(timeline.years, run)
+    yearlyMC = [events.mc_events(year) for year in timeline.years]
+    mcEvents = {kind: timeline.spread([mcYear[kind] for mcYear in yearlyMC], mc) for kind in events.kinds}
+    return events.in_shutdown_periods(timeline.years, run), dataEvents, mcEvents
+
+
+def period_cpu(model, cpuResult, timeline):
+    """
+    :param model: The configuration dictionary
+    :param cpuResult: CpuResult from run_cpu
+    :param timeline: Timeline
+    :return: dictionaries {category: array [year, period]} of CPU time (HS06 * s) and CPU required
+             (HS06), and the array [year, period] of CPU capacity
+    """
+
+    cpuTime, cpuRequired = cpu_periods(model, cpuResult, timeline.schedules(model))
+    return ({category: cpuTime[CPU_ACTIVITIES[category]] for category in CPU_CATEGORIES},
+            {category: cpuRequired[CPU_ACTIVITIES[category]] for category in CPU_CATEGORIES},
+            timeline.installed(model, cpuResult.cpuCapacity))
+
+
+def period_storage(model, arrays, storageResult, dataEvents, timeline):
+    """
+    Volume on disk and tape at the end of each period. Data from earlier years is kept as in the
+    yearly model, while data from the current year arrives as it is recorded (data) or following
+    the MC schedule (MC). The static disk and tape is there for the whole year.
+
+    :param model: The configuration dictionary
+    :param arrays: StorageArrays from storage_arrays
+    :param storageResult: StorageResult from storage_result
+    :param dataEvents: array [year, period] of the data events from period_events
+    :param timeline: Timeline
+    :return: arrays [year, period] of disk and tape in PB
+    """
+
+    YEARS = storageResult.years
+    index = np.array([YEARS.index(year) for year in timeline.years])
+    recorded = dataEvents.sum(axis=1, keepdims=True)
+    # [year, dataType, period]
+    arrived = np.stack([np.cumsum(dataEvents, axis=1) / np.where(recorded > 0, recorded, 1.0),
+                        timeline.cumulative(timeline.schedule(model, 'mc_schedule'))], axis=1)
+    assert len(DATA_TYPES) == arrived.shape[1]
+
+    cube = storageResult.cube
+    staticColumns = cube.index('tier', storageResult.static_tiers)
+
+    volumes = []
+    for stored, total, medium in [(arrays.onDisk, arrays.diskTotal, 'disk'),
+                                  (arrays.onTape, arrays.tapeTotal, 'tape_unfilled')]:
+        thisYear = stored[index, index].sum(axis=-1)  # [year, dataType]
+        earlier = total[index].sum(axis=-1) - thisYear
+        volume = (earlier[:, :, None] + thisYear[:, :, None] * arrived).sum(axis=1) / PETA
+        static = cube.by_tier(medium, unit=PETA)[index][:, staticColumns].sum(axis=1)
+        volumes.append(volume + static[:, None])
+
+    return volumes[0], volumes[1]
+
+
+def run_periods(model, periodsPerYear=MONTHS):
+    """
+    Evaluate the CPU and storage models on a sub-annual time axis
+
+    :param model: The configuration dictionary
+    :param periodsPerYear: number of periods in a year, a divisor of 12
+    :return: PeriodResult of arrays [year, period]
+    """
+
+    YEARS = list(range(model['start_year'], model['end_year'] + 1))
+    TIERS = list(model['tier_sizes'].keys())
+    timeline = Timeline(YEARS, periodsPerYear)
+
+    inShutdown, dataEvents, mcEvents = period_events(model, timeline)
+    cpuTime, cpuRequired, cpuCapacity = period_cpu(model, run_cpu(model), timeline)
+
+    arrays = storage_arrays(model, YEARS, TIERS)
+    capacity = storage_capacity(model, YEARS)
+    disk, tape = period_storage(model, arrays, storage_result(model, YEARS, TIERS, arrays, capacity), dataEvents,
+                                timeline)
+
+    return PeriodResult(timeline=timeline, in_shutdown=inShutdown, data_events=dataEvents, mc_events=mcEvents,
+                        cpu_time=cpuTime, cpu_required=cpuRequired, cpu_capacity=cpuCapacity,
+                        disk=disk, tape=tape,
+                        disk_capacity=timeline.installed(model, capacity[0]) / PETA,
+                        tape_capacity=timeline.installed(model, capacity[1]) / PETA)
+
+
+def print_periods(result):
+    print('Period ' + ' '.join(category.replace(' ', '') for category in CPU_CATEGORIES) +
+          ' Total Capacity (MHS06) Disk Capacity Tape Capacity (PB)')
+    total = sum(result.cpu_required[category] for category in CPU_CATEGORIES)
+    for label, y, p in zip(result.timeline.labels(),
+                           *np.unravel_index(np.arange(total.size), total.shape)):
+        print(label,
+              ' '.join('{:.3f}'.format(result.cpu_required[category][y, p] / mega) for category in CPU_CATEGORIES),
+              '{:.3f}'.format(total[y, p] / mega), '{:.3f}'.format(result.cpu_capacity[y, p] / mega),
+              '{:.2f}'.format(result.disk[y, p]), '{:.2f}'.format(result.disk_capacity[y, p]),
+              '{:.2f}'.format(result.tape[y, p]), '{:.2f}'.format(result.tape_capacity[y, p]))
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Evaluate the CPU and storage models by month or quarter')
+    parser.add_argument('models', nargs='*', help='comma separated list of configuration files')
+    parser.add_argument('--periods', type=int, default=MONTHS, help='periods per year: 12, 6, 4, 3, 2 or 1')
+    options = parser.parse_args(args)
+    if options.periods < 1 or MONTHS % options.periods:
+        parser.error('--periods must divide %d' % MONTHS)
+
+    model = configure(model_names_from_args(options.models))
+    print_periods(run_periods(model, options.periods))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,293 @@
+#! /usr/bin/env python
+
+"""
+Usage: ./uncertainty.py [--samples 10000] [--seed 1] [--percentiles 5,25,50,75,95] [--output bands.csv] [--no-plots]
+                        config1.json,config2.json,...,configN.json
+
+Monte Carlo uncertainty of the total CPU, disk and tape.
+
+The configuration files give distributions in an "uncertainties" section, keyed by the path of
+a value in the model (keys joined by dots, as sensitivity.py names them), e.g.
+
+ "uncertainties": {
+   "trigger_rate": {"distribution": "lognormal", "sigma": 0.1},
+   "cpu_time.mc.GENSIM": {"distribution": "uniform", "low": 0.8, "high": 1.3},
+   "improvement_factors.hardware": {"distribution": "normal", "sigma": 0.02}
+ }
+
+Each distribution is that of a factor multiplying every value under its path (all the years of
+a ramp), which is drawn once per sample:
+
+ normal      mean (default 1) and sigma
+ lognormal   median (default 1) and sigma of the logarithm
+ uniform     low and high
+ triangular  low, mode (default 1) and high
+
+The paths are trigger_rate, live_fraction, tier_sizes[.tier], cpu_time[.data_type[.tier]] and
+improvement_factors[.software_by_kind[.kind]|.hardware|.disk|.tape]. The factors are drawn for
+all samples at once from a generator seeded with --seed, so a run can be repeated.
+
+The models are evaluated once as configured and then for all the samples as arrays [sample,
+year]: the events scale with trigger_rate and live_fraction, the time per event with cpu_time
+and the compounded software improvements (cpu_model.cpu_activities evaluates the CPU of all
+samples at once), the volumes on disk and tape with the events and the size of each tier, and
+the capacity with the hardware, disk and tape improvement factors. The percentiles of the total
+CPU required (MHS06), disk and tape (PB) are printed by year next to the capacity and the
+fraction of samples above it, and drawn as UncertaintyCPU, UncertaintyDisk and UncertaintyTape.
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import csv
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from capacity import IMPROVEMENT_FACTORS, capacity_curves, resource_spec
+from configure import configure, model_names_from_args, png_key_name
+from cpu_model import cpu_activities, mega
+from cube import STATIC_TYPE
+from data_model import PETA, storage_arrays, storage_capacity, storage_result
+from event_model import event_model
+from performance import normalize_kind, performance_by_year
+from sensitivity import QUANTITIES, QUANTITY_TITLES, parameter_name
+
+DISTRIBUTIONS = ['normal', 'lognormal', 'uniform', 'triangular']
+UNCERTAIN_KEYS = ['trigger_rate', 'live_fraction', 'tier_sizes', 'cpu_time', 'improvement_factors']
+DEFAULT_PERCENTILES = [5, 25, 50, 75, 95]
+UNITS = {'cpu_required': 'MHS06', 'disk': 'PB', 'tape': 'PB'}
+
+# factors: array [sample, parameter]. totals and capacity: arrays [sample, quantity, year] in
+# the units of UNITS, capacity has a single sample unless an improvement factor is uncertain
+Uncertainty = namedtuple('Uncertainty', 'years, parameters, factors, totals, capacity')
+
+
+def uncertain_values(model):
+    """
+    :param model: The configuration dictionary
+    :return: list of the paths of the values (ramps or numbers) which can be given a distribution
+    """
+
+    paths = [('trigger_rate',), ('live_fraction',)]
+    paths += [('tier_sizes', tier) for tier in model['tier_sizes']]
+    paths += [('cpu_time', dataType, tier) for dataType in model['cpu_time'] for tier in model['cpu_time'][dataType]]
+    paths += [('improvement_factors', 'software_by_kind', kind)
+              for kind in model['improvement_factors']['software_by_kind']]
+    paths += [('improvement_factors', factor) for factor in sorted(set(IMPROVEMENT_FACTORS.values()))]
+    return paths
+
+
+def uncertainties(model):
+    """
+    :param model: The configuration dictionary
+    :return: list of (path, distribution) from the uncertainties of the model, sorted by path
+    """
+
+    values = uncertain_values(model)
+    result = []
+    for name, distribution in sorted(model.get('uncertainties', {}).items()):
+        path = tuple(name.split('.'))
+        if path[0] not in UNCERTAIN_KEYS:
+            raise ValueError('Uncertainty of %s: only %s can be uncertain' % (name, ', '.join(UNCERTAIN_KEYS)))
+        if not any(value[:len(path)] == path for value in values):
+            raise ValueError('Uncertainty of %s: not one of %s or a part of them' %
+                             (name, ', '.join(parameter_name(value) for value in values)))
+        if distribution.get('distribution') not in DISTRIBUTIONS:
+            raise ValueError('Uncertainty of %s: the distribution must be one of %s' %
+                             (name, ', '.join(DISTRIBUTIONS)))
+        result.append((path, distribution))
+    return result
+
+
+def draw_factors(distributions, samples, seed=None):
+    """
+    :param distributions: list of (path, distribution) from uncertainties
+    :param samples: number of samples
+    :param seed: seed of the random numbers, the same seed gives the same factors
+    :return: array [sample, parameter] of the factors
+    """
+
+    random = np.random.RandomState(seed)
+    factors = np.ones((samples, len(distributions)))
+    for p, (path, distribution) in enumerate(distributions):
+        kind = distribution['distribution']
+        if kind == 'normal':
+            factors[:, p] = random.normal(distribution.get('mean', 1.0), distribution['sigma'], samples)
+        elif kind == 'lognormal':
+            factors[:, p] = random.lognormal(np.log(distribution.get('median', 1.0)), distribution['sigma'], samples)
+        elif kind == 'uniform':
+            factors[:, p] = random.uniform(distribution['low'], distribution['high'], samples)
+        elif kind == 'triangular':
+            factors[:, p] = random.triangular(distribution['low'], distribution.get('mode', 1.0),
+                                              distribution['high'], samples)
+    return factors
+
+
+def run_uncertainty(model, samples=1000, seed=None):
+    """
+    Evaluate the total CPU, disk and tape for samples drawn from the uncertainties of the model
+
+    :param model: The configuration dictionary
+    :param samples: number of samples
+    :param seed: seed of the random numbers
+    :return: Uncertainty
+    """
+
+    YEARS = list(range(model['start_year'], model['end_year'] + 1))
+    years = np.array(YEARS)
+    distributions = uncertainties(model)
+    parameters = [path for path, distribution in distributions]
+    factors = draw_factors(distributions, samples, seed)
+
+    def factor(value):
+        """
+        :return: array [sample] of the product of the factors of the value at path value
+        """
+
+        covering = [p for p, path in enumerate(parameters) if value[:len(path)] == path]
+        return np.prod(factors[:, covering], axis=1)
+
+    # Events, all of which are proportional to the trigger rate and the live fraction
+    eventModel = event_model(model)
+    events = (factor(('trigger_rate',)) * factor(('live_fraction',)))[:, None]
+    dataEvents = events * np.array([eventModel.data_events(year) for year in YEARS])
+    lhcEvents = events * np.array([eventModel.mc_events(year)['2017'] for year in YEARS])
+    hllhcEvents = events * np.array([eventModel.mc_events(year)['2026'] for year in YEARS])
+
+    # CPU time per event. The software improvement is a product over the years from start_year,
+    # so a factor on it is raised to the number of those years
+    def cpu_time(tier, dataType, kind=None):
+        time = np.array([performance_by_year(model, year, tier, data_type=dataType, kind=kind)[0] for year in YEARS])
+        software = np.array([factor(('improvement_factors', 'software_by_kind', normalize_kind(year, kind)))
+                             for year in YEARS]).T
+        return time * factor(('cpu_time', dataType, tier))[:, None] / software ** (years - model['start_year'] + 1)
+
+    recoTime = cpu_time('RECO', 'data')
+    lhcSimTime = cpu_time('GENSIM', 'mc', '2017') + cpu_time('DIGI', 'mc', '2017') + cpu_time('RECO', 'mc', '2017')
+    hllhcSimTime = (cpu_time('GENSIM', 'mc', '2026') + cpu_time('DIGI', 'mc', '2026') +
+                    cpu_time('RECO', 'mc', '2026'))
+    cpu = cpu_activities(model, YEARS, recoTime, lhcSimTime, hllhcSimTime,
+                         dataEvents, lhcEvents, hllhcEvents).total_cpu_required / mega
+
+    # Disk and tape, the volume of each tier scaled by its size and the events, plus the static data
+    TIERS = list(model['tier_sizes'].keys())
+    arrays = storage_arrays(model, YEARS, TIERS)
+    cube = storage_result(model, YEARS, TIERS, arrays, storage_capacity(model, YEARS)).cube
+    sizes = events * np.array([factor(('tier_sizes', tier)) for tier in TIERS]).T  # [sample, tier]
+    storage = []
+    for total, medium in [(arrays.diskTotal, 'disk'), (arrays.tapeTotal, 'tape_unfilled')]:
+        static = cube.take(medium=medium, dataType=STATIC_TYPE).sum(axis=(1, 2))
+        storage.append((static + sizes.dot(total.sum(axis=1).T)) / PETA)
+
+    totals = np.stack([cpu] + storage, axis=1)
+
+    # Capacity, for each sample if its improvement factor is uncertain
+    capacity = []
+    for resource, unit in [('cpu', mega), ('disk', PETA), ('tape', PETA)]:
+        spec = resource_spec(model, resource)
+        scale = factor(('improvement_factors', IMPROVEMENT_FACTORS[resource]))
+        if (scale == 1).all():
+            curves = capacity_curves([spec], YEARS)
+        else:
+            curves = capacity_curves([spec._replace(factor=spec.factor * value) for value in scale.tolist()], YEARS)
+        capacity.append(curves / unit)
+    rows = max(len(curves) for curves in capacity)
+    capacity = np.stack([np.broadcast_to(curves, (rows, len(YEARS))) for curves in capacity], axis=1)
+
+    return Uncertainty(years=YEARS, parameters=parameters, factors=factors, totals=totals, capacity=capacity)
+
+
+def bands(result, percentiles=DEFAULT_PERCENTILES):
+    """
+    :param result: Uncertainty
+    :param percentiles: list of percentiles
+    :return: arrays [percentile, quantity, year] of the totals and of the capacity
+    """
+
+    return (np.percentile(result.totals, percentiles, axis=0),
+            np.percentile(result.capacity, percentiles, axis=0))
+
+
+def over_capacity(result):
+    """
+    :return: array [quantity, year] of the fraction of samples whose total is above the capacity
+    """
+
+    return (result.totals > result.capacity).mean(axis=0)
+
+
+def band_rows(result, percentiles=DEFAULT_PERCENTILES):
+    """
+    :return: list of rows (quantity, year, median capacity, fraction over capacity, the percentiles of the total)
+    """
+
+    totals, capacity = bands(result, percentiles)
+    median = np.percentile(result.capacity, 50, axis=0)
+    over = over_capacity(result)
+    rows = []
+    for q, quantity in enumerate(QUANTITIES):
+        for y, year in enumerate(result.years):
+            rows.append([quantity, year, median[q, y], over[q, y]] + list(totals[:, q, y]))
+    return rows
+
+
+def print_bands(result, percentiles=DEFAULT_PERCENTILES):
+    print('Parameters: ' + (', '.join(parameter_name(path) for path in result.parameters) or 'none'))
+    print('Quantity Year Capacity Over ' + ' '.join('p%g' % percentile for percentile in percentiles))
+    for row in band_rows(result, percentiles):
+        print(row[0], row[1], ' '.join('{:.3f}'.format(value) for value in row[2:]))
+
+
+def write_bands(result, fileName, percentiles=DEFAULT_PERCENTILES):
+    with open(fileName, 'w') as tableFile:
+        writer = csv.writer(tableFile)
+        writer.writerow(['quantity', 'year', 'capacity', 'over_capacity'] +
+                        ['p%g' % percentile for percentile in percentiles])
+        writer.writerows(band_rows(result, percentiles))
+
+
+def plot_bands(result, percentiles=DEFAULT_PERCENTILES, keyName='', minYear=None):
+    from plotting import plotBands, queued
+
+    totals, capacity = bands(result, percentiles)
+    median = np.percentile(result.capacity, 50, axis=0)
+    with queued():
+        for q, quantity in enumerate(QUANTITIES):
+            plotBands(result.years, list(percentiles), totals[:, q].tolist(), capacity=median[q].tolist(),
+                      name='Uncertainty' + QUANTITY_TITLES[quantity] + keyName + '.png',
+                      title='%s required, %d samples' % (QUANTITY_TITLES[quantity], len(result.totals)),
+                      ylabel=UNITS[quantity], minYear=minYear)
+
+
+def main(args):
+    parser = argparse.ArgumentParser(description='Percentile bands of the CPU, disk and tape from uncertain values')
+    parser.add_argument('models', nargs='*', help='comma separated list of configuration files')
+    parser.add_argument('--samples', type=int, default=10000, help='number of samples')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the random numbers')
+    parser.add_argument('--percentiles', default=','.join(str(p) for p in DEFAULT_PERCENTILES),
+                        help='comma separated list of the percentiles reported')
+    parser.add_argument('--output', default=None, help='write the percentiles as CSV to this file')
+    parser.add_argument('--no-plots', dest='plots', action='store_false', help='print the table only')
+    options = parser.parse_args(args)
+
+    percentiles = sorted(float(percentile) for percentile in options.percentiles.split(','))
+    if not all(0 <= percentile <= 100 for percentile in percentiles):
+        parser.error('--percentiles must be between 0 and 100')
+    if options.samples < 1:
+        parser.error('--samples must be at least 1')
+
+    modelNames = model_names_from_args(options.models)
+    model = configure(modelNames)
+    result = run_uncertainty(model, samples=options.samples, seed=options.seed)
+    if options.output:
+        write_bands(result, options.output, percentiles)
+    else:
+        print_bands(result, percentiles)
+    if options.plots:
+        plot_bands(result, percentiles, keyName=png_key_name(modelNames), minYear=model.get('minYearToPlot'))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
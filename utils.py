@@ -7,6 +7,203 @@ Common code between various models
 
 from __future__ import absolute_import, division, print_function
 
+import bisect
+import copy
+import numbers
+
+import numpy as np
+
+
+class Ramp(dict):
+    """
+    A dictionary of the form {"2016": x, "2020": y, ...} which keeps its years as sorted integers
+    so that it can be evaluated as a step function (time_dependent_value) or as a linear ramp
+    (interpolate_value) by bisection, for a single year or an array of years.
+
+    The sorted years are rebuilt when the dictionary is changed, and version counts the changes
+    so that anything derived from a Ramp can tell when it is out of date (see ramp_token).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(Ramp, self).__init__(*args, **kwargs)
+        self._compiled = None
+        self.version = 0
+
+    def _changed(self):
+        self._compiled = None
+        self.version = getattr(self, 'version', 0) + 1
+
+    def __setitem__(self, key, value):
+        super(Ramp, self).__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super(Ramp, self).__delitem__(key)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        super(Ramp, self).update(*args, **kwargs)
+        self._changed()
+
+    def setdefault(self, key, default=None):
+        value = super(Ramp, self).setdefault(key, default)
+        self._changed()
+        return value
+
+    def pop(self, *args):
+        value = super(Ramp, self).pop(*args)
+        self._changed()
+        return value
+
+    def popitem(self):
+        item = super(Ramp, self).popitem()
+        self._changed()
+        return item
+
+    def clear(self):
+        super(Ramp, self).clear()
+        self._changed()
+
+    def __deepcopy__(self, memo):
+        # The copy compiles its own years when it is first evaluated
+        return Ramp((key, copy.deepcopy(value, memo)) for key, value in self.items())
+
+    def compiled(self):
+        """
+        :return: sorted list of integer years, list of values in the same order, and both as arrays
+        """
+
+        if getattr(self, '_compiled', None) is None:
+            keys = sorted(self.keys(), key=int)
+            years = [int(key) for key in keys]
+            values = [self[key] for key in keys]
+            self._compiled = (years, values, np.array(years), np.array(values, dtype=float))
+        return self._compiled
+
+    def step(self, year):
+        """
+        :return: value of the last year not after year, and that year. (None, None) if there is none
+        """
+
+        years, values = self.compiled()[:2]
+        i = bisect.bisect_right(years, int(year)) - 1
+        if i < 0:
+            return None, None
+        return values[i], years[i]
+
+    def interpolate(self, year):
+        """
+        :return: value for year, interpolated linearly between the years around it
+        """
+
+        years, values = self.compiled()[:2]
+        i = bisect.bisect_left(years, year)
+        if i < len(years) and years[i] == year:  # We found the exact value
+            return values[i]
+        if i == 0 or i == len(years):
+            raise KeyError('Year %s is outside of the range %s-%s' % (year, years[0], years[-1]))
+        pastYear, futureYear = years[i - 1], years[i]
+        return values[i - 1] + (year - pastYear) * (values[i] - values[i - 1]) / (futureYear - pastYear)
+
+    def step_array(self, years):
+        """
+        :param years: array of years
+        :return: arrays of the step function values (nan before the first year) and the years they come from
+        """
+
+        rampYears, rampValues = self.compiled()[2:]
+        years = np.asarray(years)
+        index = np.searchsorted(rampYears, years, side='right') - 1
+        valid = index >= 0
+        index = np.where(valid, index, 0)
+        return np.where(valid, rampValues[index], np.nan), np.where(valid, rampYears[index], 0)
+
+    def interpolate_array(self, years):
+        """
+        :param years: array of years, all within the range of the ramp
+        :return: array of interpolated values
+        """
+
+        rampYears, rampValues = self.compiled()[2:]
+        years = np.asarray(years)
+        if years.size and (years.min() < rampYears[0] or years.max() > rampYears[-1]):
+            raise KeyError('Years %s-%s are outside of the range %s-%s' %
+                           (years.min(), years.max(), rampYears[0], rampYears[-1]))
+        if len(rampYears) == 1:
+            return np.full(years.shape, rampValues[0])
+        index = np.searchsorted(rampYears, years, side='left')
+        exact = (index < len(rampYears)) & (rampYears[np.minimum(index, len(rampYears) - 1)] == years)
+        future = np.clip(index, 1, len(rampYears) - 1)
+        past = future - 1
+        interpolated = (rampValues[past] + (years - rampYears[past]) * (rampValues[future] - rampValues[past]) /
+                        (rampYears[future] - rampYears[past]))
+        return np.where(exact, rampValues[np.minimum(index, len(rampYears) - 1)], interpolated)
+
+
+def is_ramp(values):
+    """
+    :return: True for dictionaries with only years as keys and numbers as values
+    """
+
+    return (isinstance(values, dict) and len(values) > 0 and
+            all(str(key).isdigit() for key in values.keys()) and
+            all(isinstance(value, numbers.Number) and not isinstance(value, bool) for value in values.values()))
+
+
+def as_ramp(values):
+    """
+    :return: values as a Ramp
+    """
+
+    return values if isinstance(values, Ramp) else Ramp(values)
+
+
+def ramp_token(values):
+    """
+    :param values: a Ramp or a plain dictionary of year dependent values
+    :return: an object which compares equal as long as values has not changed
+    """
+
+    if isinstance(values, Ramp):
+        return RampToken(values, values.version)
+    return tuple(sorted(values.items()))
+
+
+class RampToken(object):
+    """
+    Identity and version of a Ramp. Holding the Ramp itself makes sure its id is not reused.
+    """
+
+    __slots__ = ('ramp', 'version')
+
+    def __init__(self, ramp, version):
+        self.ramp = ramp
+        self.version = version
+
+    def __eq__(self, other):
+        return isinstance(other, RampToken) and self.ramp is other.ramp and self.version == other.version
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def compile_ramps(model):
+    """
+    Replace all the dictionaries of the form {"2016": x, "2020": y, ...} in the model by Ramps, in place
+
+    :param model: The configuration dictionary
+    :return: the model
+    """
+
+    for key, value in model.items():
+        if isinstance(value, dict):
+            if is_ramp(value):
+                if not isinstance(value, Ramp):
+                    model[key] = Ramp(value)
+            else:
+                compile_ramps(value)
+    return model
+
 
 def time_dependent_value(year=2016, values=None):
     """
@@ -16,6 +213,9 @@ def time_dependent_value(year=2016, values=None):
 
     """
 
+    if isinstance(values, Ramp):
+        return values.step(year)
+
     values = values or {}
     value = None
     lastYear = None
@@ -38,6 +238,9 @@ def interpolate_value(ramp, year):
      and returns x for year=2016, y for year=2020, and an interpolated value for 2017, 2018, 2019
     """
 
+    if isinstance(ramp, Ramp):
+        return ramp.interpolate(year)
+
     pastYear = 0
     futureYear = 3000
     value = None